@@ -1,6 +1,3 @@
 """Chainlit starter application with voice input and document QA."""
 
 __version__ = "0.1.0"
-
-# Import handlers to make them available
-from . import handlers  # noqa: F401
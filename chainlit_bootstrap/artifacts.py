@@ -0,0 +1,104 @@
+"""Content-addressed store for large chat artifacts (transcripts, parsed conversations).
+
+Audio results used to carry the full transcript in the message metadata and in
+the ``CollapsibleSection`` element props, so it was serialized into the
+``steps`` and ``elements`` rows, pushed over the websocket and reloaded with
+every thread. Instead, the text is written once under its SHA-256 and messages
+carry only the reference (``<sha256>.txt`` or ``<sha256>.json``). The
+collapsible section fetches ``/artifacts/<ref>`` when it is first opened.
+
+Identical content (e.g. the same recording uploaded twice) is stored once.
+"""
+
+import json
+import logging
+import os
+import re
+import tempfile
+from hashlib import sha256
+from pathlib import Path
+from typing import Any
+
+from fastapi import Depends, HTTPException
+from fastapi.responses import FileResponse
+
+from chainlit.auth import get_current_user
+from chainlit.server import app as chainlit_app
+
+logger = logging.getLogger(__name__)
+
+# Get artifact directory from environment
+_artifact_dir_str = os.getenv("ARTIFACT_DIR", "./.local/data/artifacts/")
+ARTIFACT_DIR = Path(_artifact_dir_str).resolve()
+
+_MEDIA_TYPES = {"txt": "text/plain; charset=utf-8", "json": "application/json"}
+_REF_PATTERN = re.compile(r"^([0-9a-f]{64})\.(txt|json)$")
+
+
+def _path(ref: str) -> Path | None:
+    match = _REF_PATTERN.match(ref)
+    if match is None:
+        return None
+    # Two-character shards keep directories small as artifacts accumulate
+    return ARTIFACT_DIR / match.group(1)[:2] / ref
+
+
+def _put(data: bytes, extension: str) -> str:
+    ref = f"{sha256(data).hexdigest()}.{extension}"
+    path = _path(ref)
+    if path.exists():
+        return ref
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    logger.debug(f"Stored artifact {ref} ({len(data)} bytes)")
+    return ref
+
+
+def put_text(text: str) -> str:
+    """Store ``text`` once and return its reference."""
+    return _put(text.encode("utf-8"), "txt")
+
+
+def put_json(value: Any) -> str:
+    """Store ``value`` as JSON once and return its reference."""
+    return _put(
+        json.dumps(value, ensure_ascii=False, sort_keys=True).encode("utf-8"), "json"
+    )
+
+
+async def artifact_endpoint(
+    ref: str, current_user=Depends(get_current_user)
+) -> FileResponse:
+    """Serve an artifact; references are content hashes, so responses never change."""
+    path = _path(ref)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return FileResponse(
+        path,
+        media_type=_MEDIA_TYPES[ref.rsplit(".", 1)[1]],
+        headers={
+            "Cache-Control": "private, max-age=31536000, immutable",
+            "ETag": f'"{ref.split(".", 1)[0]}"',
+        },
+    )
+
+
+def mount_artifact_route() -> None:
+    """Add ``GET /artifacts/{ref}`` to Chainlit's server (idempotent)."""
+    if any(
+        getattr(route, "path", None) == "/artifacts/{ref}"
+        for route in chainlit_app.router.routes
+    ):
+        return
+    chainlit_app.add_api_route(
+        "/artifacts/{ref}", artifact_endpoint, methods=["GET"], include_in_schema=False
+    )
+    # Chainlit serves its UI from a catch-all route; ours has to match first
+    chainlit_app.router.routes.insert(0, chainlit_app.router.routes.pop())
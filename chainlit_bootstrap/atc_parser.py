@@ -4,7 +4,9 @@ import json
 import logging
 from typing import Dict, List
 
+from .completion_cache import completion_cache_label
 from .llm import llm
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -92,57 +94,70 @@ def parse_atc_conversation(transcript: str) -> List[Dict[str, str]]:
     try:
         # Build the prompt
         prompt = PROMPT_TEMPLATE.format(
-            FEW_SHOT_EXAMPLES=FEW_SHOT_EXAMPLES,
-            transcript=transcript.strip()
+            FEW_SHOT_EXAMPLES=FEW_SHOT_EXAMPLES, transcript=transcript.strip()
         )
 
         # Call LLM with temperature=0 for consistent parsing
         logger.debug("Calling LLM for ATC conversation parsing")
-        response = llm.complete(prompt)
-        
-        # Extract text from response (llama_index CompletionResponse has .text attribute)
-        if hasattr(response, 'text'):
-            response_text = response.text.strip()
-        else:
-            response_text = str(response).strip()
-        
-        # Try to extract JSON if wrapped in code blocks
-        if "```json" in response_text:
-            start = response_text.find("```json") + 7
-            end = response_text.find("```", start)
-            response_text = response_text[start:end].strip()
-        elif "```" in response_text:
-            start = response_text.find("```") + 3
-            end = response_text.find("```", start)
-            response_text = response_text[start:end].strip()
-
-        # Parse JSON
-        try:
-            parsed_conversation = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed: {e}")
-            logger.error(f"Response text: {response_text[:500]}")
-            raise ValueError(f"Failed to parse LLM response as JSON: {e}")
-
-        # Validate structure
-        if not isinstance(parsed_conversation, list):
-            raise ValueError("LLM response is not a list")
-
-        # Validate each item has required keys
-        for idx, item in enumerate(parsed_conversation):
-            if not isinstance(item, dict):
-                raise ValueError(f"Item {idx} is not a dictionary")
-            if "role" not in item or "message" not in item:
-                raise ValueError(f"Item {idx} missing 'role' or 'message' key")
-            if item["role"] not in ["atc", "pilot"]:
-                logger.warning(f"Unexpected role '{item['role']}' in item {idx}, normalizing")
-                # Normalize role to valid values
-                item["role"] = "atc" if item["role"].lower() in ["atc", "controller", "tower", "ground"] else "pilot"
-
-        logger.info(f"Successfully parsed {len(parsed_conversation)} conversation messages")
+        with (
+            completion_cache_label("parse"),
+            span("atc_parser.llm", prompt_chars=len(prompt)),
+        ):
+            response = llm.complete(prompt)
+
+        with span("atc_parser.validate") as validate_span:
+            # Extract text from response (llama_index CompletionResponse has .text attribute)
+            if hasattr(response, "text"):
+                response_text = response.text.strip()
+            else:
+                response_text = str(response).strip()
+
+            # Try to extract JSON if wrapped in code blocks
+            if "```json" in response_text:
+                start = response_text.find("```json") + 7
+                end = response_text.find("```", start)
+                response_text = response_text[start:end].strip()
+            elif "```" in response_text:
+                start = response_text.find("```") + 3
+                end = response_text.find("```", start)
+                response_text = response_text[start:end].strip()
+
+            # Parse JSON
+            try:
+                parsed_conversation = json.loads(response_text)
+            except json.JSONDecodeError as e:
+                logger.error(f"JSON parsing failed: {e}")
+                logger.error(f"Response text: {response_text[:500]}")
+                raise ValueError(f"Failed to parse LLM response as JSON: {e}")
+
+            # Validate structure
+            if not isinstance(parsed_conversation, list):
+                raise ValueError("LLM response is not a list")
+
+            # Validate each item has required keys
+            for idx, item in enumerate(parsed_conversation):
+                if not isinstance(item, dict):
+                    raise ValueError(f"Item {idx} is not a dictionary")
+                if "role" not in item or "message" not in item:
+                    raise ValueError(f"Item {idx} missing 'role' or 'message' key")
+                if item["role"] not in ["atc", "pilot"]:
+                    logger.warning(
+                        f"Unexpected role '{item['role']}' in item {idx}, normalizing"
+                    )
+                    # Normalize role to valid values
+                    item["role"] = (
+                        "atc"
+                        if item["role"].lower()
+                        in ["atc", "controller", "tower", "ground"]
+                        else "pilot"
+                    )
+            validate_span.set_attribute("messages", len(parsed_conversation))
+
+        logger.info(
+            f"Successfully parsed {len(parsed_conversation)} conversation messages"
+        )
         return parsed_conversation
 
     except Exception as e:
         logger.error(f"Failed to parse ATC conversation: {e}", exc_info=True)
         raise ValueError(f"ATC conversation parsing failed: {str(e)}")
-
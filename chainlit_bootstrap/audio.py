@@ -7,10 +7,16 @@ import os
 import shutil
 import uuid
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import TYPE_CHECKING, Dict
 
-from openai import OpenAI
+from .metrics import CACHE_LOOKUPS
+from .resilience import ResilientTransport
+from .tracing import span
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 logger = logging.getLogger(__name__)
 
@@ -19,8 +25,22 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-# Initialize OpenAI client
-_openai_client = OpenAI(api_key=OPENAI_API_KEY)
+
+@lru_cache(maxsize=1)
+def _get_openai_client() -> "OpenAI":
+    """Create the OpenAI client on first transcription (the SDK is slow to import).
+
+    Whisper requests go through the rate governor and the resilience layer, which
+    owns deadlines and retries.
+    """
+    from openai import DefaultHttpxClient, OpenAI
+
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        max_retries=0,
+        http_client=DefaultHttpxClient(transport=ResilientTransport("whisper")),
+    )
+
 
 # Get audio persist directory from environment
 # Resolve relative paths to absolute paths
@@ -29,7 +49,9 @@ AUDIO_PERSIST_DIR = Path(_audio_persist_dir_str).resolve()
 AUDIO_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
 
 # Get transcript cache directory
-_transcript_cache_dir_str = os.getenv("TRANSCRIPT_CACHE_DIR", "./.local/cache/transcripts/")
+_transcript_cache_dir_str = os.getenv(
+    "TRANSCRIPT_CACHE_DIR", "./.local/cache/transcripts/"
+)
 TRANSCRIPT_CACHE_DIR = Path(_transcript_cache_dir_str).resolve()
 TRANSCRIPT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -73,10 +95,10 @@ def is_audio_file(mime: str, filename: str) -> bool:
 def _compute_file_md5(file_path: str) -> str:
     """
     Compute MD5 hash of a file's content.
-    
+
     Args:
         file_path: Path to the file
-        
+
     Returns:
         MD5 hash as hexadecimal string
     """
@@ -90,10 +112,10 @@ def _compute_file_md5(file_path: str) -> str:
 def _get_cached_transcript(md5_hash: str) -> str | None:
     """
     Retrieve cached transcript for a given MD5 hash.
-    
+
     Args:
         md5_hash: MD5 hash of the audio file
-        
+
     Returns:
         Cached transcript text if found, None otherwise
     """
@@ -109,10 +131,12 @@ def _get_cached_transcript(md5_hash: str) -> str | None:
     return None
 
 
-def _save_transcript_to_cache(md5_hash: str, transcription: str, original_filename: str) -> None:
+def _save_transcript_to_cache(
+    md5_hash: str, transcription: str, original_filename: str
+) -> None:
     """
     Save transcript to cache.
-    
+
     Args:
         md5_hash: MD5 hash of the audio file
         transcription: Transcribed text
@@ -153,27 +177,43 @@ def transcribe_audio(file_path: str, original_filename: str) -> Dict[str, str]:
     stored_path = None
     try:
         # Compute MD5 hash of the audio file for caching
-        md5_hash = _compute_file_md5(file_path)
+        with span("audio.hash"):
+            md5_hash = _compute_file_md5(file_path)
         logger.info(f"Computed MD5 hash for {original_filename}: {md5_hash}")
-        
+
         # Check cache first
-        cached_transcription = _get_cached_transcript(md5_hash)
+        with span("audio.cache_lookup") as lookup_span:
+            cached_transcription = _get_cached_transcript(md5_hash)
+            lookup_span.set_attribute("hit", cached_transcription is not None)
+        CACHE_LOOKUPS.inc(
+            cache="transcript", result="miss" if cached_transcription is None else "hit"
+        )
         if cached_transcription is not None:
-            logger.info(f"Using cached transcript for {original_filename} (MD5: {md5_hash})")
+            logger.info(
+                f"Using cached transcript for {original_filename} (MD5: {md5_hash})"
+            )
             transcription_text = cached_transcription
         else:
-            # Transcribe using OpenAI Whisper API
-            logger.info(f"Transcribing {original_filename} with OpenAI API (MD5: {md5_hash})")
-            with open(file_path, "rb") as audio_file:
-                transcript_response = _openai_client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                )
+            # Transcribe using OpenAI Whisper API (the span covers the upload too)
+            logger.info(
+                f"Transcribing {original_filename} with OpenAI API (MD5: {md5_hash})"
+            )
+            with span("audio.whisper", bytes=os.path.getsize(file_path)):
+                with open(file_path, "rb") as audio_file:
+                    transcript_response = (
+                        _get_openai_client().audio.transcriptions.create(
+                            model="whisper-1",
+                            file=audio_file,
+                        )
+                    )
             transcription_text = transcript_response.text
-            
+
             # Save to cache
-            _save_transcript_to_cache(md5_hash, transcription_text, original_filename)
-        
+            with span("audio.cache_store"):
+                _save_transcript_to_cache(
+                    md5_hash, transcription_text, original_filename
+                )
+
         # Generate unique filename for storage
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_id = uuid.uuid4().hex[:8]
@@ -181,8 +221,15 @@ def transcribe_audio(file_path: str, original_filename: str) -> Dict[str, str]:
         stored_filename = f"{timestamp}_{unique_id}_{original_filename}"
         stored_path = AUDIO_PERSIST_DIR / stored_filename
 
-        # Copy audio file to persistent storage
-        shutil.copy2(file_path, stored_path)
+        # Copy audio file to persistent storage; the rename keeps the archiver
+        # from picking up a partial copy
+        with span("audio.store_file"):
+            tmp_path = stored_path.with_name(f".tmp-{stored_filename}")
+            try:
+                shutil.copy2(file_path, tmp_path)
+                os.replace(tmp_path, stored_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
         logger.info(f"Audio file saved to {stored_path}")
 
         logger.info(
@@ -206,4 +253,3 @@ def transcribe_audio(file_path: str, original_filename: str) -> Dict[str, str]:
             except Exception:
                 pass
         raise
-
@@ -0,0 +1,238 @@
+"""Archival transcode of persisted audio to a compact speech format.
+
+:func:`transcribe_audio` keeps a verbatim copy of every upload in
+``AUDIO_PERSIST_DIR`` for re-processing. ATC recordings are narrowband mono
+speech, so a speech codec stores them many times smaller without hurting
+intelligibility or re-transcription. With ``AUDIO_ARCHIVE_ENABLED=1`` each new
+copy is transcoded in a process pool (off the event loop and the job workers)
+to ``<name>.opus.ogg`` (Opus, mono 16 kHz, VoIP mode) when ffmpeg is
+installed, or to ``<name>.ulaw.wav`` (G.711 mu-law, mono 8 kHz, WAV uploads
+only) with NumPy otherwise. Both are accepted by Whisper.
+
+A sweep every ``AUDIO_ARCHIVE_SWEEP_SECONDS`` archives copies that were missed
+(e.g. by a restart) and deletes originals whose archive is older than
+``AUDIO_ARCHIVE_GRACE_SECONDS``. Until then both are kept, and the original
+stays the file referenced by the chat history; retention treats an archive as
+part of its original. Each transcode logs and exports (``/metrics``) the
+compression ratio and the CPU seconds spent per minute of audio. The
+transcode itself is in :mod:`.audio_codec`.
+"""
+
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .audio import AUDIO_PERSIST_DIR
+from .audio_codec import ARCHIVE_SUFFIXES, ArchiveResult, transcode
+from .metrics import (
+    AUDIO_ARCHIVE_BYTES,
+    AUDIO_ARCHIVE_CPU_SECONDS_PER_MINUTE,
+    AUDIO_ARCHIVE_FILES,
+    AUDIO_ARCHIVE_RATIO,
+    GC_DELETED,
+    GC_RECLAIMED_BYTES,
+)
+
+logger = logging.getLogger(__name__)
+
+AUDIO_ARCHIVE_ENABLED = os.getenv("AUDIO_ARCHIVE_ENABLED", "0").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# opus (needs ffmpeg with libopus), ulaw (ffmpeg, or NumPy for WAV uploads), or auto
+AUDIO_ARCHIVE_CODEC = os.getenv("AUDIO_ARCHIVE_CODEC", "auto").strip().lower()
+
+# Transcoder processes
+AUDIO_ARCHIVE_WORKERS = int(os.getenv("AUDIO_ARCHIVE_WORKERS", "1"))
+
+# How long the original is kept next to its archive
+AUDIO_ARCHIVE_GRACE_SECONDS = float(
+    os.getenv("AUDIO_ARCHIVE_GRACE_SECONDS", str(7 * 24 * 3600))
+)
+
+# Seconds between sweeps (the first runs a minute after startup)
+AUDIO_ARCHIVE_SWEEP_SECONDS = float(os.getenv("AUDIO_ARCHIVE_SWEEP_SECONDS", "3600"))
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+def is_archive(path: Path) -> bool:
+    return path.name.endswith(tuple(ARCHIVE_SUFFIXES.values()))
+
+
+def original_path(path: Path) -> Path:
+    """The persisted upload an archive was made from (``path`` itself if it isn't one)."""
+    for suffix in ARCHIVE_SUFFIXES.values():
+        if path.name.endswith(suffix):
+            return path.with_name(path.name[: -len(suffix)])
+    return path
+
+
+def find_archive(path: Path) -> Path | None:
+    for suffix in ARCHIVE_SUFFIXES.values():
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def select_codec(source: Path) -> tuple[str, str | None] | None:
+    """The codec and ffmpeg binary to archive ``source`` with, or None if none applies."""
+    ffmpeg = shutil.which(FFMPEG_BINARY)
+    codec = AUDIO_ARCHIVE_CODEC
+    if codec == "auto":
+        codec = "opus" if ffmpeg else "ulaw"
+    if codec not in ARCHIVE_SUFFIXES:
+        raise ValueError(f"Unknown AUDIO_ARCHIVE_CODEC: {codec!r}")
+    if ffmpeg is None and (codec == "opus" or source.suffix.lower() != ".wav"):
+        return None
+    return codec, ffmpeg
+
+
+# -- Scheduling (server process) ----------------------------------------------
+
+_pool: ProcessPoolExecutor | None = None
+_pending: set[Path] = set()
+_failed: set[Path] = set()
+_tasks: set[asyncio.Task] = set()
+_sweep_task: asyncio.Task | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Spawned workers get this sys.path; `chainlit run` removes the app's
+        # directory after loading it, so the package wouldn't be importable
+        root = str(Path(__file__).resolve().parent.parent)
+        if root not in sys.path:
+            sys.path.append(root)
+        # Not fork: the server process runs threads. Workers only import the
+        # package and audio_codec, which load nothing from the app
+        _pool = ProcessPoolExecutor(
+            max_workers=AUDIO_ARCHIVE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def archive_file(path: Path) -> ArchiveResult | None:
+    """Transcode ``path`` in the process pool and record the result."""
+    selected = select_codec(path)
+    if selected is None:
+        logger.info(
+            f"Not archiving {path.name}: {FFMPEG_BINARY} not found (only WAV is archived without it)"
+        )
+        AUDIO_ARCHIVE_FILES.inc(codec="none", outcome="unsupported")
+        _failed.add(path)
+        return None
+    codec, ffmpeg = selected
+    _pending.add(path)
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            _get_pool(), transcode, str(path), None, codec, ffmpeg
+        )
+    except Exception as e:
+        logger.warning(f"Failed to archive {path.name}: {e}")
+        AUDIO_ARCHIVE_FILES.inc(codec=codec, outcome="failed")
+        _failed.add(path)
+        return None
+    finally:
+        _pending.discard(path)
+    logger.info(f"Archived {path.name}: {result.summary()}")
+    AUDIO_ARCHIVE_FILES.inc(codec=codec, outcome="archived")
+    AUDIO_ARCHIVE_BYTES.inc(result.original_bytes, codec=codec, kind="original")
+    AUDIO_ARCHIVE_BYTES.inc(result.archived_bytes, codec=codec, kind="archived")
+    AUDIO_ARCHIVE_RATIO.observe(result.ratio, codec=codec)
+    AUDIO_ARCHIVE_CPU_SECONDS_PER_MINUTE.observe(
+        result.cpu_seconds_per_audio_minute, codec=codec
+    )
+    return result
+
+
+def schedule_archive(audio_path: str) -> None:
+    """Archive a newly persisted upload in the background (if AUDIO_ARCHIVE_ENABLED)."""
+    if not AUDIO_ARCHIVE_ENABLED:
+        return
+    path = Path(audio_path)
+    if path in _pending:
+        return
+    task = asyncio.create_task(archive_file(path))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def _scan() -> tuple[list[Path], list[tuple[Path, int]]]:
+    """Originals still to archive, and originals past their grace period (with sizes)."""
+    unarchived, expired = [], []
+    now = time.time()
+    for path in AUDIO_PERSIST_DIR.iterdir():
+        if path.name.startswith(".") or is_archive(path) or not path.is_file():
+            continue
+        archive = find_archive(path)
+        if archive is None:
+            if path not in _pending and path not in _failed:
+                unarchived.append(path)
+        elif now - archive.stat().st_mtime >= AUDIO_ARCHIVE_GRACE_SECONDS:
+            expired.append((path, path.stat().st_size))
+    return unarchived, expired
+
+
+def _remove_originals(expired: list[tuple[Path, int]]) -> int:
+    reclaimed = 0
+    for path, size in expired:
+        with contextlib.suppress(FileNotFoundError):
+            path.unlink()
+            reclaimed += size
+            GC_DELETED.inc(store="audio", reason="archived")
+            GC_RECLAIMED_BYTES.inc(size, store="audio", reason="archived")
+    return reclaimed
+
+
+async def _sweep_loop() -> None:
+    await asyncio.sleep(60)
+    while True:
+        try:
+            unarchived, expired = await asyncio.to_thread(_scan)
+            reclaimed = await asyncio.to_thread(_remove_originals, expired)
+            if unarchived or expired:
+                logger.info(
+                    f"Audio archive sweep: archiving {len(unarchived)} files, removed "
+                    f"{len(expired)} archived originals ({reclaimed / 2**20:.1f} MiB)"
+                )
+            # One at a time, so the sweep never queues ahead of new uploads
+            for path in unarchived:
+                await archive_file(path)
+        except Exception as e:
+            logger.warning(f"Audio archive sweep failed: {e}", exc_info=True)
+        await asyncio.sleep(AUDIO_ARCHIVE_SWEEP_SECONDS)
+
+
+def start_archiver() -> None:
+    """Sweep AUDIO_PERSIST_DIR periodically in the background (if AUDIO_ARCHIVE_ENABLED)."""
+    global _sweep_task
+    if not AUDIO_ARCHIVE_ENABLED or _sweep_task is not None:
+        return
+    _sweep_task = asyncio.create_task(_sweep_loop())
+
+
+async def stop_archiver() -> None:
+    global _sweep_task, _pool
+    tasks = [*_tasks, *([_sweep_task] if _sweep_task is not None else [])]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _sweep_task = None
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,282 @@
+"""Archive transcoding, run in the archiver's worker processes.
+
+Spawned workers unpickle :func:`transcode` by importing this module, so it
+only uses the standard library (NumPy is imported when a mu-law encode needs
+it) and nothing from the package that loads the app: no handlers, no API
+clients, no directories created on import.
+"""
+
+import os
+import resource
+import struct
+import subprocess
+import time
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+
+# Opus bitrate; 12-16k is plenty for narrowband radio speech
+AUDIO_ARCHIVE_BITRATE = os.getenv("AUDIO_ARCHIVE_BITRATE", "16k")
+
+ARCHIVE_SUFFIXES = {"opus": ".opus.ogg", "ulaw": ".ulaw.wav"}
+
+_ULAW_RATE = 8000
+_OPUS_RATE = 16000
+_CHUNK_FRAMES = 1 << 18
+# Temporary files start with a dot; sweeps skip them and retention collects leftovers
+_TMP_PREFIX = ".tmp-"
+
+
+@dataclass
+class ArchiveResult:
+    """Outcome of transcoding one file."""
+
+    source: str
+    archive: str
+    codec: str
+    original_bytes: int
+    archived_bytes: int
+    audio_seconds: float
+    cpu_seconds: float
+
+    @property
+    def ratio(self) -> float:
+        return self.original_bytes / self.archived_bytes if self.archived_bytes else 0.0
+
+    @property
+    def cpu_seconds_per_audio_minute(self) -> float:
+        return (
+            self.cpu_seconds / (self.audio_seconds / 60) if self.audio_seconds else 0.0
+        )
+
+    def summary(self) -> str:
+        return (
+            f"{self.original_bytes / 2**20:.2f} MiB -> {self.archived_bytes / 2**20:.2f} MiB "
+            f"({self.codec}, {self.ratio:.1f}x), {self.audio_seconds / 60:.1f} min of audio, "
+            f"{self.cpu_seconds_per_audio_minute:.3f} CPU s/min"
+        )
+
+
+def transcode(
+    source: str, target_dir: str | None, codec: str, ffmpeg: str | None
+) -> ArchiveResult:
+    """Write the archive of ``source`` (next to it unless ``target_dir`` is given)."""
+    source_path = Path(source)
+    directory = Path(target_dir) if target_dir else source_path.parent
+    target = directory / (source_path.name + ARCHIVE_SUFFIXES[codec])
+    tmp = directory / (_TMP_PREFIX + target.name)
+    cpu_started = time.process_time()
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    try:
+        if ffmpeg is not None:
+            _transcode_ffmpeg(ffmpeg, source_path, tmp, codec)
+        else:
+            _encode_ulaw_wav(source_path, tmp)
+        audio_seconds = _ogg_duration(tmp) if codec == "opus" else _wav_duration(tmp)
+        if audio_seconds <= 0:
+            raise ValueError("transcoded audio is empty")
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = (
+        time.process_time()
+        - cpu_started
+        + children_after.ru_utime
+        - children.ru_utime
+        + children_after.ru_stime
+        - children.ru_stime
+    )
+    return ArchiveResult(
+        source=str(source_path),
+        archive=str(target),
+        codec=codec,
+        original_bytes=source_path.stat().st_size,
+        archived_bytes=target.stat().st_size,
+        audio_seconds=audio_seconds,
+        cpu_seconds=cpu_seconds,
+    )
+
+
+def _transcode_ffmpeg(ffmpeg: str, source: Path, target: Path, codec: str) -> None:
+    if codec == "opus":
+        output = [
+            "-ar",
+            str(_OPUS_RATE),
+            "-c:a",
+            "libopus",
+            "-b:a",
+            AUDIO_ARCHIVE_BITRATE,
+            "-application",
+            "voip",
+            "-f",
+            "ogg",
+        ]
+    else:
+        output = ["-ar", str(_ULAW_RATE), "-c:a", "pcm_mulaw", "-f", "wav"]
+    command = [
+        ffmpeg,
+        "-nostdin",
+        "-hide_banner",
+        "-loglevel",
+        "error",
+        "-y",
+        "-i",
+        str(source),
+        "-vn",
+        "-map_metadata",
+        "-1",
+        "-ac",
+        "1",
+        *output,
+        str(target),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {completed.stderr.strip()[-500:]}")
+
+
+def _encode_ulaw_wav(source: Path, target: Path) -> None:
+    """Downmix, low-pass, resample to 8 kHz and mu-law encode a PCM WAV, chunk by chunk."""
+    import numpy as np
+
+    with wave.open(str(source), "rb") as reader, open(target, "wb") as out:
+        channels, width, rate = (
+            reader.getnchannels(),
+            reader.getsampwidth(),
+            reader.getframerate(),
+        )
+        out_rate = min(rate, _ULAW_RATE)
+        step = rate / out_rate
+        kernel = None
+        if rate != out_rate:
+            # Windowed-sinc low-pass below the new Nyquist frequency, long enough
+            # to keep the 300-3400 Hz speech band flat
+            half = int(16 * step)
+            taps = np.arange(-half, half + 1)
+            cutoff = 0.47 * out_rate / rate
+            kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+            kernel /= kernel.sum()
+        delay = 0 if kernel is None else len(kernel) // 2
+        history = np.zeros(0 if kernel is None else len(kernel) - 1)
+        # Filtered samples still needed for interpolation, and the source index of
+        # the first (the filter delays its output by half its length)
+        buffer, buffer_start, next_output = np.zeros(0), -delay, 0
+
+        def resample(samples):
+            nonlocal history, buffer, buffer_start, next_output
+            if kernel is None:
+                return samples
+            padded = np.concatenate([history, samples])
+            history = padded[len(padded) - len(history) :]
+            buffer = np.concatenate([buffer, np.convolve(padded, kernel, mode="valid")])
+            last = buffer_start + len(buffer) - 1
+            count = max(int(last / step) - next_output + 1, 0)
+            positions = (next_output + np.arange(count)) * step - buffer_start
+            resampled = np.interp(positions, np.arange(len(buffer)), buffer)
+            next_output += count
+            drop = min(int(next_output * step) - buffer_start, len(buffer))
+            buffer, buffer_start = buffer[drop:], buffer_start + drop
+            return resampled
+
+        out.write(_ulaw_wav_header(out_rate, 0))
+        written = 0
+        total_frames = reader.getnframes()
+        while frames := reader.readframes(_CHUNK_FRAMES):
+            encoded = _ulaw_encode(
+                np, resample(_pcm_to_mono(np, frames, width, channels))
+            )
+            out.write(encoded)
+            written += len(encoded)
+        # Flush the filter, then trim to the source duration
+        tail = resample(np.zeros(delay))
+        remaining = max(int(total_frames * out_rate / rate) - written, 0)
+        encoded = _ulaw_encode(np, tail[:remaining])
+        out.write(encoded)
+        written += len(encoded)
+        if written % 2:
+            # RIFF chunks are word-aligned
+            out.write(b"\0")
+        out.seek(0)
+        out.write(_ulaw_wav_header(out_rate, written))
+
+
+def _pcm_to_mono(np, frames: bytes, width: int, channels: int):
+    """Interleaved PCM frames as mono float samples in [-1, 1)."""
+    if width == 1:
+        samples = np.frombuffer(frames, np.uint8).astype(np.float64) - 128
+    elif width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((raw[:, 0] | raw[:, 1] << 8 | raw[:, 2] << 16) << 8 >> 8).astype(
+            np.float64
+        )
+    elif width in (2, 4):
+        samples = np.frombuffer(frames, f"<i{width}").astype(np.float64)
+    else:
+        raise ValueError(f"unsupported sample width: {width} bytes")
+    return samples.reshape(-1, channels).mean(axis=1) / 2 ** (8 * width - 1)
+
+
+def _ulaw_encode(np, samples) -> bytes:
+    """G.711 mu-law: sign, 3-bit segment and 4-bit mantissa, inverted."""
+    pcm = np.clip(np.round(samples * 32768), -32768, 32767).astype(np.int32)
+    sign = np.where(pcm < 0, 0x80, 0)
+    magnitude = np.minimum(np.abs(pcm), 32635) + 0x84
+    exponent = np.frexp(magnitude)[1] - 8
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | exponent << 4 | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def _ulaw_wav_header(rate: int, data_bytes: int) -> bytes:
+    # WAVE_FORMAT_MULAW, mono, 8 bits; non-PCM formats carry a fact chunk
+    fmt = struct.pack("<HHIIHHH", 7, 1, rate, rate, 1, 8, 0)
+    riff_bytes = 4 + 8 + len(fmt) + 12 + 8 + data_bytes + data_bytes % 2
+    return b"".join(
+        [
+            b"RIFF",
+            struct.pack("<I", riff_bytes),
+            b"WAVE",
+            b"fmt ",
+            struct.pack("<I", len(fmt)),
+            fmt,
+            b"fact",
+            struct.pack("<II", 4, data_bytes),
+            b"data",
+            struct.pack("<I", data_bytes),
+        ]
+    )
+
+
+def _wav_duration(path: Path) -> float:
+    with open(path, "rb") as f:
+        if f.read(12)[8:] != b"WAVE":
+            raise ValueError("not a WAV file")
+        rate = block_align = 0
+        while header := f.read(8):
+            chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(size + size % 2)
+                rate, block_align = (
+                    struct.unpack("<I", fmt[4:8])[0],
+                    struct.unpack("<H", fmt[12:14])[0],
+                )
+            elif chunk_id == b"data":
+                return size / block_align / rate if rate and block_align else 0.0
+            else:
+                f.seek(size + size % 2, os.SEEK_CUR)
+    return 0.0
+
+
+def _ogg_duration(path: Path) -> float:
+    """Opus duration from the last page's granule position, less the pre-skip."""
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        f.seek(max(path.stat().st_size - 65536, 0))
+        tail = f.read()
+    opus_head, last_page = head.find(b"OpusHead"), tail.rfind(b"OggS")
+    if opus_head < 0 or last_page < 0:
+        raise ValueError("not an Ogg Opus file")
+    pre_skip = struct.unpack("<H", head[opus_head + 10 : opus_head + 12])[0]
+    granule = struct.unpack("<q", tail[last_page + 6 : last_page + 14])[0]
+    # Opus granule positions always count 48 kHz samples
+    return max(granule - pre_skip, 0) / 48000
@@ -0,0 +1,440 @@
+"""Local, content-addressed blob storage for Chainlit elements (audio, files).
+
+Chainlit hands every persisted element to the storage client under a logical
+object key (``<user id>/<element id>/<name>``). Here the bytes are stored once
+per distinct content, under their SHA-256 in two levels of shard directories
+(``objects/ab/cd/<sha256>``), and ``index.db`` maps each object key to its
+digest. The number of keys pointing at a digest is its reference count: the
+object file is removed, along with any shard directories left empty, when the
+last key is deleted.
+
+Uploads accept ``bytes``/``str`` or an (async) iterable of byte chunks, are
+hashed while they are written to a temporary file, and are moved into place
+with an atomic rename, so memory stays flat for large recordings and readers
+never see a partial object.
+
+Read URLs are content-addressed (``/blobs/<sha256>``) and served by
+:func:`blob_endpoint`: HTTP Range requests (seeking in ``cl.Audio``), a strong
+ETag (the digest) with ``304 Not Modified`` revalidation, and long-lived
+immutable caching, since the URL changes whenever the content does. Servers
+that implement the ASGI ``http.response.pathsend`` extension send the file
+without copying it through Python; otherwise it is streamed in
+``BLOB_CHUNK_BYTES`` chunks.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import AsyncIterable, Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from fastapi import Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from chainlit.auth import get_current_user
+from chainlit.data import get_data_layer
+from chainlit.data.storage_clients.base import BaseStorageClient
+from chainlit.server import app as chainlit_app
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk when streaming a file into the store
+BLOB_CHUNK_BYTES = int(os.getenv("BLOB_CHUNK_BYTES", str(1024 * 1024)))
+
+# Browser cache lifetime for blobs; URLs embed the content hash, so they never go stale
+BLOB_CACHE_MAX_AGE_SECONDS = int(
+    os.getenv("BLOB_CACHE_MAX_AGE_SECONDS", str(365 * 24 * 3600))
+)
+
+_DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+BlobData = bytes | str | Iterable[bytes] | AsyncIterable[bytes]
+
+
+@dataclass
+class StoredBlob:
+    """Where an object key's content lives."""
+
+    object_key: str
+    digest: str
+    size: int
+    mime: str
+    path: Path
+    created_at: float = 0.0
+
+
+async def iter_file(
+    path: str | Path, chunk_size: int = BLOB_CHUNK_BYTES
+) -> AsyncIterable[bytes]:
+    """Read ``path`` in chunks without blocking the event loop."""
+    with open(path, "rb") as source:
+        while chunk := await asyncio.to_thread(source.read, chunk_size):
+            yield chunk
+
+
+class LocalFileStorageClient(BaseStorageClient):
+    """Content-addressed blob store on the local filesystem."""
+
+    # Lets the data layer pass element files as chunk iterators instead of bytes
+    supports_streaming = True
+
+    def __init__(self, base_path: Path):
+        """Initialize local file storage client.
+
+        Args:
+            base_path: Base directory path for storing files
+        """
+        self.base_path = Path(base_path)
+        self.objects_dir = self.base_path / "objects"
+        self.tmp_dir = self.base_path / "tmp"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.base_path / "index.db"
+        # Serializes index updates with the file moves and unlinks they imply;
+        # BEGIN IMMEDIATE does the same across processes
+        self._lock = threading.Lock()
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    object_key TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mime TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_blobs_digest ON blobs (digest)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; updates use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.index_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def object_path(self, digest: str) -> Path:
+        """Path of the object file holding content with ``digest``."""
+        return self.objects_dir / digest[:2] / digest[2:4] / digest
+
+    # -- Blocking operations (run in a worker thread) -------------------------
+
+    def _release(self, conn: sqlite3.Connection, digest: str) -> int:
+        """Remove ``digest``'s object if no key references it any more; returns bytes freed."""
+        if conn.execute(
+            "SELECT 1 FROM blobs WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return 0
+        path = self.object_path(digest)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return 0
+        for directory in (path.parent, path.parent.parent):
+            try:
+                directory.rmdir()
+            except OSError:
+                # Not empty: another object shares the shard
+                break
+        return size
+
+    def _commit(
+        self, object_key: str, tmp_path: Path, digest: str, size: int, mime: str
+    ) -> None:
+        with self._lock, contextlib.closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT digest FROM blobs WHERE object_key = ?", (object_key,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO blobs (object_key, digest, size, mime, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (object_key, digest, size, mime, time.time()),
+                )
+                path = self.object_path(digest)
+                if path.exists():
+                    tmp_path.unlink()
+                else:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(tmp_path, path)
+                if row and row["digest"] != digest:
+                    self._release(conn, row["digest"])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def remove_key(self, object_key: str) -> int | None:
+        """Drop ``object_key`` (blocking). Returns bytes freed, or None if it was unknown."""
+        with self._lock, contextlib.closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT digest FROM blobs WHERE object_key = ?", (object_key,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute("DELETE FROM blobs WHERE object_key = ?", (object_key,))
+                freed = self._release(conn, row["digest"])
+                conn.execute("COMMIT")
+                return freed
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def import_legacy_files(self, object_keys: set[str]) -> int:
+        """Index files from the pre-index flat layout that ``object_keys`` still use.
+
+        Before the index, element files were stored as plain files at their
+        object key (``<user id>/<element id>/<name>``). Each one found under a
+        referenced key is hashed, moved into the object store and indexed under
+        that key, so reads and garbage collection treat it like any other blob.
+        Blocking; returns the number of files imported.
+        """
+        reserved = {self.index_path.name + suffix for suffix in ("", "-wal", "-shm")}
+        imported = 0
+        for path in sorted(self.base_path.rglob("*")):
+            if path.is_relative_to(self.objects_dir) or path.is_relative_to(
+                self.tmp_dir
+            ):
+                continue
+            if path.parent == self.base_path and path.name in reserved:
+                continue
+            object_key = path.relative_to(self.base_path).as_posix()
+            if object_key not in object_keys or not path.is_file():
+                continue
+            if self._lookup(object_key) is not None:
+                continue
+            digest = hashlib.sha256()
+            with path.open("rb") as f:
+                while chunk := f.read(BLOB_CHUNK_BYTES):
+                    digest.update(chunk)
+            mime = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            self._commit(
+                object_key, path, digest.hexdigest(), path.stat().st_size, mime
+            )
+            # Drop the per-user and per-element directories left empty
+            parent = path.parent
+            while parent != self.base_path:
+                try:
+                    parent.rmdir()
+                except OSError:
+                    break
+                parent = parent.parent
+            imported += 1
+        return imported
+
+    def list_blobs(self) -> list[StoredBlob]:
+        """Every indexed object key (blocking; for maintenance in a worker thread)."""
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM blobs").fetchall()
+        return [
+            StoredBlob(
+                object_key=row["object_key"],
+                digest=row["digest"],
+                size=row["size"],
+                mime=row["mime"],
+                path=self.object_path(row["digest"]),
+                created_at=row["created_at"],
+            )
+            for row in rows
+        ]
+
+    def _find(self, digest: str, owner: str | None) -> StoredBlob | None:
+        """A key holding ``digest``, restricted to keys under ``owner/`` if given."""
+        query = "SELECT * FROM blobs WHERE digest = ?"
+        parameters: tuple[Any, ...] = (digest,)
+        if owner is not None:
+            # Chainlit's object keys start with the owning user's id
+            query += " AND substr(object_key, 1, ?) = ?"
+            parameters += (len(owner) + 1, f"{owner}/")
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(query + " LIMIT 1", parameters).fetchone()
+        if row is None:
+            return None
+        return StoredBlob(
+            object_key=row["object_key"],
+            digest=digest,
+            size=row["size"],
+            mime=row["mime"],
+            path=self.object_path(digest),
+        )
+
+    def _lookup(self, object_key: str) -> StoredBlob | None:
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM blobs WHERE object_key = ?", (object_key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return StoredBlob(
+            object_key=object_key,
+            digest=row["digest"],
+            size=row["size"],
+            mime=row["mime"],
+            path=self.object_path(row["digest"]),
+        )
+
+    # -- Storage client interface ---------------------------------------------
+
+    async def _write_tmp(self, data: BlobData) -> tuple[Path, str, int]:
+        """Stream ``data`` into a temporary file; returns its path, SHA-256 and size."""
+        fd, tmp_name = await asyncio.to_thread(tempfile.mkstemp, dir=self.tmp_dir)
+        tmp_path = Path(tmp_name)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                if isinstance(data, str):
+                    data = data.encode("utf-8")
+                if isinstance(data, (bytes, bytearray, memoryview)):
+                    digest.update(data)
+                    size = len(data)
+                    await asyncio.to_thread(tmp.write, data)
+                elif isinstance(data, AsyncIterable):
+                    async for chunk in data:
+                        size += await self._write_chunk(tmp, digest, chunk)
+                else:
+                    for chunk in data:
+                        size += await self._write_chunk(tmp, digest, chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    @staticmethod
+    async def _write_chunk(tmp: BinaryIO, digest: Any, chunk: bytes) -> int:
+        digest.update(chunk)
+        await asyncio.to_thread(tmp.write, chunk)
+        return len(chunk)
+
+    async def upload_file(
+        self,
+        object_key: str,
+        data: BlobData,
+        mime: str = "application/octet-stream",
+        overwrite: bool = True,
+        content_disposition: str | None = None,
+    ) -> dict[str, Any]:
+        """Store ``data`` under ``object_key``; identical content is kept once."""
+        if not overwrite:
+            existing = await self.stat(object_key)
+            if existing is not None:
+                return await self._describe(existing)
+
+        tmp_path, digest, size = await self._write_tmp(data)
+        await asyncio.to_thread(self._commit, object_key, tmp_path, digest, size, mime)
+        logger.debug(f"Stored blob {object_key} ({size} bytes, sha256 {digest[:12]})")
+        return await self._describe(
+            StoredBlob(object_key, digest, size, mime, self.object_path(digest))
+        )
+
+    async def _describe(self, blob: StoredBlob) -> dict[str, Any]:
+        return {
+            "object_key": blob.object_key,
+            "url": f"/blobs/{blob.digest}",
+            "path": str(blob.path),
+            "size": blob.size,
+            "mime": blob.mime,
+            "digest": blob.digest,
+        }
+
+    async def stat(self, object_key: str) -> StoredBlob | None:
+        """The stored object for ``object_key``, or None if there is none."""
+        return await asyncio.to_thread(self._lookup, object_key)
+
+    async def delete_file(self, object_key: str) -> bool:
+        """Drop ``object_key``; the content is removed once no key references it."""
+        try:
+            return await asyncio.to_thread(self.remove_key, object_key) is not None
+        except Exception as e:
+            logger.warning(f"Failed to delete blob {object_key}: {e}")
+            return False
+
+    async def find(self, digest: str, owner: str | None = None) -> StoredBlob | None:
+        """The stored object with ``digest`` (visible to ``owner``), or None."""
+        return await asyncio.to_thread(self._find, digest, owner)
+
+    async def get_read_url(self, object_key: str) -> str:
+        """Content-addressed URL for ``object_key``, served by :func:`blob_endpoint`."""
+        blob = await self.stat(object_key)
+        if blob is None:
+            raise FileNotFoundError(object_key)
+        return f"/blobs/{blob.digest}"
+
+    async def close(self) -> None:
+        """Close the storage client (no-op for local storage)."""
+        pass
+
+
+class BlobFileResponse(FileResponse):
+    # Fewer, larger reads than Starlette's 64 KiB when pathsend is unavailable
+    chunk_size = BLOB_CHUNK_BYTES
+
+
+async def blob_endpoint(
+    digest: str, request: Request, current_user=Depends(get_current_user)
+) -> Response:
+    """Serve a stored blob by digest, with Range, ETag and immutable caching."""
+    storage = getattr(get_data_layer(), "storage_provider", None)
+    if not _DIGEST_PATTERN.match(digest) or not isinstance(
+        storage, LocalFileStorageClient
+    ):
+        raise HTTPException(status_code=404, detail="Not found")
+    # With login enabled, users only read blobs attached to their own threads
+    owner = getattr(current_user, "id", None) if current_user else None
+    blob = await storage.find(digest, owner)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    etag = f'"{digest}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={BLOB_CACHE_MAX_AGE_SECONDS}, immutable",
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if (
+        etag in (tag.strip() for tag in if_none_match.split(","))
+        or if_none_match.strip() == "*"
+    ):
+        return Response(status_code=304, headers=headers)
+    return BlobFileResponse(
+        blob.path,
+        media_type=blob.mime,
+        headers=headers,
+        filename=blob.object_key.rsplit("/", 1)[-1],
+        content_disposition_type="inline",
+    )
+
+
+def mount_blob_route() -> None:
+    """Add ``GET /blobs/{digest}`` to Chainlit's server (idempotent)."""
+    if any(
+        getattr(route, "path", None) == "/blobs/{digest}"
+        for route in chainlit_app.router.routes
+    ):
+        return
+    chainlit_app.add_api_route(
+        "/blobs/{digest}",
+        blob_endpoint,
+        methods=["GET", "HEAD"],
+        include_in_schema=False,
+    )
+    # Chainlit serves its UI from a catch-all route; ours has to match first
+    chainlit_app.router.routes.insert(0, chainlit_app.router.routes.pop())
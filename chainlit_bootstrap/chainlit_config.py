@@ -0,0 +1,46 @@
+"""Settings the app needs from Chainlit, applied to its configuration in memory.
+
+Chainlit reads ``.chainlit/config.toml`` when it is imported (writing a default
+file on the very first run). Instead of rewriting that file on every start, the
+overlay below is computed once and merged into the loaded ``chainlit.config``
+object. ``chainlit run -w`` re-imports ``app.py`` after reloading the file, which
+applies the overlay again, so the file only changes when someone edits it.
+
+Authentication is not part of the overlay: the mode (no-login, local header
+auto-login or Google OAuth) is selected from the environment by the callbacks
+that ``auth.py`` registers.
+"""
+
+import logging
+from typing import Any
+
+from chainlit.config import config
+
+logger = logging.getLogger(__name__)
+
+# Per config section (features, ui, project): values merged over the file's
+CONFIG_OVERLAY: dict[str, dict[str, Any]] = {
+    # Voice input; Chainlit's generated config ships with audio disabled
+    "features": {"audio": {"enabled": True}},
+}
+
+
+def _merge(base: Any, patch: Any) -> Any:
+    if isinstance(base, dict) and isinstance(patch, dict):
+        merged = dict(base)
+        for key, value in patch.items():
+            merged[key] = _merge(merged.get(key), value)
+        return merged
+    return patch
+
+
+def apply_config_overlay(overlay: dict[str, dict[str, Any]] = CONFIG_OVERLAY) -> None:
+    """Merge ``overlay`` into Chainlit's loaded configuration, without touching files."""
+    for section, patch in overlay.items():
+        current = getattr(config, section)
+        setattr(
+            config,
+            section,
+            type(current).model_validate(_merge(current.model_dump(), patch)),
+        )
+    logger.debug(f"Applied Chainlit config overlay: {overlay}")
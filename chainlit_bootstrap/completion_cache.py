@@ -0,0 +1,310 @@
+"""Two-tier cache of deterministic LLM completions.
+
+Responses are keyed on a SHA-256 of the model parameters (model, temperature,
+max tokens, extra kwargs) and the full message list, so only byte-identical
+requests hit. Entries live in a size-bounded in-memory LRU and in a size-bounded
+SQLite file shared by workers on the same host; both tiers evict least recently
+used entries once over budget.
+
+Only requests at temperature 0 without tools are cached. Call sites that need a
+fresh completion (for example a retry after an unusable answer) opt out with
+:func:`bypass_completion_cache`.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# Bytes of serialized responses kept in process memory
+LLM_CACHE_MEMORY_BYTES = int(os.getenv("LLM_CACHE_MEMORY_BYTES", str(16 * 1024 * 1024)))
+
+_llm_cache_path_str = os.getenv("LLM_CACHE_PATH", "./.local/data/llm_cache.db")
+LLM_CACHE_PATH = Path(_llm_cache_path_str).resolve()
+
+# Bytes of serialized responses kept on disk; 0 disables the disk tier
+LLM_CACHE_DISK_BYTES = int(os.getenv("LLM_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+
+# Bump when the stored response format changes
+_CACHE_FORMAT_VERSION = 1
+
+_cache_enabled: ContextVar[bool] = ContextVar("completion_cache_enabled", default=True)
+_cache_label: ContextVar[str] = ContextVar(
+    "completion_cache_label", default="completion"
+)
+
+
+@contextlib.contextmanager
+def bypass_completion_cache() -> Iterator[None]:
+    """Neither read nor write the completion cache for LLM calls inside the block."""
+    token = _cache_enabled.set(False)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+@contextlib.contextmanager
+def completion_cache_label(label: str) -> Iterator[None]:
+    """Report cache lookups inside the block under ``label`` in the metrics."""
+    token = _cache_label.set(label)
+    try:
+        yield
+    finally:
+        _cache_label.reset(token)
+
+
+def cache_active() -> bool:
+    """Whether LLM calls in the current context may use the cache."""
+    return LLM_CACHE_ENABLED and _cache_enabled.get()
+
+
+def completion_key(
+    kind: str, model_kwargs: dict[str, Any], messages: list[dict[str, Any]]
+) -> str:
+    """Stable key for a request; ``kind`` separates endpoints with different outputs."""
+    payload = json.dumps(
+        {
+            "version": _CACHE_FORMAT_VERSION,
+            "kind": kind,
+            "params": model_kwargs,
+            "messages": messages,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CompletionCacheStats:
+    """Hit, miss and size counters for the completion cache."""
+
+    memory_hits: int
+    disk_hits: int
+    misses: int
+    stores: int
+    evictions: int
+    memory_entries: int
+    memory_bytes: int
+    disk_bytes: int
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+class CompletionCache:
+    """Memory LRU in front of an optional SQLite tier, each with its own byte budget."""
+
+    def __init__(
+        self, memory_bytes: int, disk_path: Path | None, disk_bytes: int
+    ) -> None:
+        self.memory_budget = memory_bytes
+        self.disk_budget = disk_bytes
+        self.disk_path = disk_path if disk_bytes > 0 else None
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+        # The disk tier's database is created on first use, not at import
+        self._disk_ready = False
+        self._disk_init_lock = threading.Lock()
+
+    def _disk_available(self) -> bool:
+        """Whether the disk tier is in use, preparing its database on the first call."""
+        if self._disk_ready or self.disk_path is None:
+            return self._disk_ready
+        with self._disk_init_lock:
+            if not self._disk_ready and self.disk_path is not None:
+                try:
+                    self._init_disk()
+                    self._disk_ready = True
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(
+                        f"Completion cache disk tier disabled ({self.disk_path}): {e}"
+                    )
+                    self.disk_path = None
+        return self._disk_ready
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.disk_path, timeout=10)
+
+    def _init_disk(self) -> None:
+        self.disk_path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completion_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS completion_cache_accessed "
+                "ON completion_cache (accessed_at)"
+            )
+            (total,) = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM completion_cache"
+            ).fetchone()
+        self._disk_bytes = total
+
+    def _remember(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.memory_budget:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = value
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._evictions += 1
+
+    def _disk_get(self, key: str) -> str | None:
+        with contextlib.closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT value FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE completion_cache SET accessed_at = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        return None if row is None else row[0]
+
+    def _disk_put(self, key: str, value: str) -> None:
+        size = len(value)
+        if size > self.disk_budget:
+            return
+        with contextlib.closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT size FROM completion_cache WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO completion_cache (key, value, size, accessed_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    value = excluded.value, size = excluded.size, accessed_at = excluded.accessed_at
+                """,
+                (key, value, size, time.time()),
+            )
+            with self._lock:
+                self._disk_bytes += size - (row[0] if row else 0)
+                over = self._disk_bytes - self.disk_budget
+            if over > 0:
+                self._evict_disk(conn, over)
+
+    def _evict_disk(self, conn: sqlite3.Connection, over: int) -> None:
+        # Trim an extra tenth of the budget so eviction is not run on every write
+        target = over + self.disk_budget // 10
+        freed = 0
+        doomed = []
+        for key, size in conn.execute(
+            "SELECT key, size FROM completion_cache ORDER BY accessed_at"
+        ):
+            if freed >= target:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM completion_cache WHERE key = ?", doomed)
+        with self._lock:
+            self._disk_bytes -= freed
+            self._evictions += len(doomed)
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        """Return a cached response, promoting disk hits into memory."""
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+        if value is not None:
+            CACHE_LOOKUPS.inc(cache=_cache_label.get(), result="hit")
+            return json.loads(value)
+        if self._disk_available():
+            try:
+                value = self._disk_get(key)
+            except sqlite3.Error as e:
+                logger.warning(f"Completion cache disk read failed: {e}")
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self._disk_hits += 1
+                CACHE_LOOKUPS.inc(cache=_cache_label.get(), result="hit")
+                return json.loads(value)
+        with self._lock:
+            self._misses += 1
+        CACHE_LOOKUPS.inc(cache=_cache_label.get(), result="miss")
+        return None
+
+    def put(self, key: str, response: dict[str, Any]) -> None:
+        """Store a response in both tiers."""
+        value = json.dumps(response)
+        self._remember(key, value)
+        if self._disk_available():
+            try:
+                self._disk_put(key, value)
+            except sqlite3.Error as e:
+                logger.warning(f"Completion cache disk write failed: {e}")
+        with self._lock:
+            self._stores += 1
+
+    async def aget(self, key: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key: str, response: dict[str, Any]) -> None:
+        await asyncio.to_thread(self.put, key, response)
+
+    def stats(self) -> CompletionCacheStats:
+        with self._lock:
+            return CompletionCacheStats(
+                memory_hits=self._memory_hits,
+                disk_hits=self._disk_hits,
+                misses=self._misses,
+                stores=self._stores,
+                evictions=self._evictions,
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_bytes,
+                disk_bytes=self._disk_bytes,
+            )
+
+
+completion_cache = CompletionCache(
+    LLM_CACHE_MEMORY_BYTES, LLM_CACHE_PATH, LLM_CACHE_DISK_BYTES
+)
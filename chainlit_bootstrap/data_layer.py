@@ -0,0 +1,400 @@
+"""SQLite persistence for Chainlit threads: schema, indexes and connection tuning.
+
+Chainlit's ``SQLAlchemyDataLayer`` issues plain SQL against ``users``,
+``threads``, ``steps``, ``elements`` and ``feedbacks`` but never creates them.
+:func:`ensure_schema` creates the tables (and columns added by newer Chainlit
+releases) plus secondary indexes for the data layer's hot queries:
+
+- thread list: ``threads.userId`` and the ``MAX(steps.createdAt)`` join
+- thread load: steps by ``threadId`` ordered by ``createdAt``, elements by
+  ``threadId``, feedbacks by ``forId``
+- step/thread deletes: elements and feedbacks by ``forId``
+
+The tuned data layer also answers unfiltered thread lists (the sidebar) from
+the ``threads`` rows alone; Chainlit's implementation loads every step of the
+user's threads to support keyword and feedback filters. Element files (audio
+uploads) are streamed to storage clients that accept chunks, instead of being
+read into memory whole.
+
+All statements use ``IF NOT EXISTS``, so running it against an existing
+database migrates it in place. The applied ``SCHEMA_VERSION`` is stored in
+``PRAGMA user_version``: once a database is current, later checks are a single
+header read, and each process checks a given file only once. In tuned mode (``DATA_LAYER_TUNED``, the default)
+the database uses WAL, so readers don't block the writer, every connection
+waits up to ``SQLITE_BUSY_TIMEOUT_SECONDS`` for the write lock instead of
+failing with "database is locked", and the connection pool is sized explicitly.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from chainlit.data.sql_alchemy import SQLAlchemyDataLayer
+from chainlit.data.storage_clients.base import BaseStorageClient
+from chainlit.data.utils import queue_until_user_message
+from chainlit.element import Element
+from chainlit.types import (
+    PageInfo,
+    PaginatedResponse,
+    Pagination,
+    ThreadDict,
+    ThreadFilter,
+)
+
+from .blob_storage import iter_file
+
+logger = logging.getLogger(__name__)
+
+# WAL, busy timeouts, pragmas and a sized pool; "0" keeps SQLAlchemy's defaults
+DATA_LAYER_TUNED = os.getenv("DATA_LAYER_TUNED", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# Seconds a connection waits for another writer before "database is locked"
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "15"))
+
+# Pooled connections kept open, and extra connections allowed under load
+DATA_LAYER_POOL_SIZE = int(os.getenv("DATA_LAYER_POOL_SIZE", "5"))
+DATA_LAYER_MAX_OVERFLOW = int(os.getenv("DATA_LAYER_MAX_OVERFLOW", "10"))
+
+# Page cache per connection, in KiB
+SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "16384"))
+
+# Bump when TABLES, COLUMNS or INDEXES change; older databases are migrated once
+SCHEMA_VERSION = 1
+
+TABLES = {
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            "id" TEXT PRIMARY KEY,
+            "identifier" TEXT NOT NULL UNIQUE,
+            "createdAt" TEXT,
+            "metadata" TEXT
+        )
+    """,
+    "threads": """
+        CREATE TABLE IF NOT EXISTS threads (
+            "id" TEXT PRIMARY KEY,
+            "createdAt" TEXT,
+            "name" TEXT,
+            "userId" TEXT,
+            "userIdentifier" TEXT,
+            "tags" TEXT,
+            "metadata" TEXT
+        )
+    """,
+    "steps": """
+        CREATE TABLE IF NOT EXISTS steps (
+            "id" TEXT PRIMARY KEY,
+            "name" TEXT NOT NULL,
+            "type" TEXT NOT NULL,
+            "threadId" TEXT NOT NULL,
+            "parentId" TEXT,
+            "command" TEXT,
+            "modes" TEXT,
+            "streaming" INTEGER,
+            "waitForAnswer" INTEGER,
+            "isError" INTEGER,
+            "metadata" TEXT,
+            "tags" TEXT,
+            "input" TEXT,
+            "output" TEXT,
+            "createdAt" TEXT,
+            "start" TEXT,
+            "end" TEXT,
+            "generation" TEXT,
+            "showInput" TEXT,
+            "defaultOpen" INTEGER,
+            "autoCollapse" INTEGER,
+            "language" TEXT,
+            "indent" INTEGER
+        )
+    """,
+    "elements": """
+        CREATE TABLE IF NOT EXISTS elements (
+            "id" TEXT PRIMARY KEY,
+            "threadId" TEXT,
+            "type" TEXT,
+            "url" TEXT,
+            "chainlitKey" TEXT,
+            "name" TEXT NOT NULL,
+            "display" TEXT,
+            "objectKey" TEXT,
+            "size" TEXT,
+            "page" INTEGER,
+            "language" TEXT,
+            "forId" TEXT,
+            "mime" TEXT,
+            "autoPlay" INTEGER,
+            "playerConfig" TEXT,
+            "props" TEXT
+        )
+    """,
+    "feedbacks": """
+        CREATE TABLE IF NOT EXISTS feedbacks (
+            "id" TEXT PRIMARY KEY,
+            "forId" TEXT NOT NULL,
+            "threadId" TEXT NOT NULL,
+            "value" INTEGER NOT NULL,
+            "comment" TEXT
+        )
+    """,
+}
+
+# Columns written by newer Chainlit releases, added to databases created without them
+COLUMNS = [
+    ("steps", "command", "TEXT"),
+    ("steps", "modes", "TEXT"),
+    ("steps", "autoCollapse", "INTEGER"),
+    ("elements", "autoPlay", "INTEGER"),
+    ("elements", "playerConfig", "TEXT"),
+    ("elements", "props", "TEXT"),
+]
+
+INDEXES = {
+    "idx_threads_user": 'CREATE INDEX IF NOT EXISTS idx_threads_user ON threads ("userId")',
+    "idx_steps_thread_created": (
+        'CREATE INDEX IF NOT EXISTS idx_steps_thread_created ON steps ("threadId", "createdAt")'
+    ),
+    "idx_elements_thread": 'CREATE INDEX IF NOT EXISTS idx_elements_thread ON elements ("threadId")',
+    "idx_elements_for": 'CREATE INDEX IF NOT EXISTS idx_elements_for ON elements ("forId")',
+    "idx_feedbacks_for": 'CREATE INDEX IF NOT EXISTS idx_feedbacks_for ON feedbacks ("forId")',
+}
+
+
+# Chainlit's thread query without the step and element fetch that follows it
+_THREAD_LIST_QUERY = """
+    SELECT
+        t."id" AS thread_id,
+        t."createdAt" AS thread_createdat,
+        t."name" AS thread_name,
+        t."userId" AS user_id,
+        t."userIdentifier" AS user_identifier,
+        t."tags" AS thread_tags,
+        t."metadata" AS thread_metadata,
+        MAX(s."createdAt") AS updatedAt
+    FROM threads t
+    LEFT JOIN steps s ON t."id" = s."threadId"
+    WHERE t."userId" = :user_id
+    GROUP BY t."id"
+    ORDER BY updatedAt DESC NULLS LAST
+    LIMIT :limit
+"""
+
+
+@dataclass
+class SchemaState:
+    """Outcome of the schema check for this process, reported by ``/metrics``."""
+
+    version: int = 0
+    migrated: bool = False
+    # Time spent creating or migrating tables (0 when the file was already current)
+    migration_seconds: float = 0.0
+    # Cost of one readiness check (open + version read), which sessions no longer pay
+    check_seconds: float = 0.0
+
+
+schema_state = SchemaState()
+_ready: set[Path] = set()
+_ready_lock = threading.Lock()
+
+
+def _apply_schema(conn: sqlite3.Connection) -> None:
+    for ddl in TABLES.values():
+        conn.execute(ddl)
+    for table, column, sql_type in COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {sql_type}')
+            logger.info(f"Added column {table}.{column}")
+    for ddl in INDEXES.values():
+        conn.execute(ddl)
+    conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+
+def ensure_schema(db_path: Path, tuned: bool = DATA_LAYER_TUNED) -> bool:
+    """Bring ``db_path`` to ``SCHEMA_VERSION`` once; returns whether it migrated."""
+    key = db_path.resolve()
+    with _ready_lock:
+        if key in _ready:
+            return False
+        started = time.perf_counter()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(
+            sqlite3.connect(
+                db_path, timeout=SQLITE_BUSY_TIMEOUT_SECONDS, isolation_level=None
+            )
+        ) as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            schema_state.check_seconds = time.perf_counter() - started
+            migrated = version < SCHEMA_VERSION
+            if migrated:
+                if tuned:
+                    # Persistent: stored in the database file, applies to every later connection
+                    conn.execute("PRAGMA journal_mode=WAL")
+                # Another worker may be migrating; the write lock serializes us behind it
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if (
+                        conn.execute("PRAGMA user_version").fetchone()[0]
+                        < SCHEMA_VERSION
+                    ):
+                        _apply_schema(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                # Refresh planner statistics for the new indexes
+                conn.execute("PRAGMA optimize")
+                logger.info(
+                    f"Migrated {db_path.name} from schema version {version} to {SCHEMA_VERSION}"
+                )
+                schema_state.migration_seconds = time.perf_counter() - started
+        schema_state.version = max(version, SCHEMA_VERSION)
+        schema_state.migrated = migrated
+        _ready.add(key)
+        return migrated
+
+
+def _configure_connection(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL keeps the database consistent on power loss with NORMAL; only the last
+    # commits may be lost, which is acceptable for chat history
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_SECONDS * 1000)}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+
+class TunedSQLAlchemyDataLayer(SQLAlchemyDataLayer):
+    """``SQLAlchemyDataLayer`` on SQLite with WAL-friendly pragmas and a sized pool."""
+
+    def __init__(
+        self, db_path: Path, storage_provider: BaseStorageClient | None = None
+    ) -> None:
+        conninfo = f"sqlite+aiosqlite:///{db_path}"
+        connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_SECONDS}
+        super().__init__(
+            conninfo=conninfo,
+            connect_args=connect_args,
+            storage_provider=storage_provider,
+        )
+        # The parent's engine has not connected yet; replace it with a tuned one
+        self.engine = create_async_engine(
+            conninfo,
+            connect_args=connect_args,
+            pool_size=DATA_LAYER_POOL_SIZE,
+            max_overflow=DATA_LAYER_MAX_OVERFLOW,
+            pool_timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+        )
+        event.listen(self.engine.sync_engine, "connect", _configure_connection)
+        self.async_session = sessionmaker(
+            bind=self.engine, expire_on_commit=False, class_=AsyncSession
+        )
+
+    @queue_until_user_message()
+    async def create_element(self, element: Element):
+        # Chainlit reads element files into memory before uploading; stream them
+        # instead when the storage client accepts chunks (see blob_storage.py)
+        if not (
+            element.path
+            and element.for_id
+            and getattr(self.storage_provider, "supports_streaming", False)
+        ):
+            return await SQLAlchemyDataLayer.create_element.__wrapped__(self, element)
+
+        user_id = await self._get_user_id_by_thread(element.thread_id) or "unknown"
+        object_key = f"{user_id}/{element.id}" + (
+            f"/{element.name}" if element.name else ""
+        )
+        if not element.mime:
+            element.mime = "application/octet-stream"
+        uploaded_file = await self.storage_provider.upload_file(
+            object_key=object_key,
+            data=iter_file(element.path),
+            mime=element.mime,
+            overwrite=True,
+        )
+
+        element_dict = element.to_dict()
+        element_dict["url"] = uploaded_file.get("url")
+        element_dict["objectKey"] = uploaded_file.get("object_key")
+        # Same row Chainlit writes (see SQLAlchemyDataLayer.create_element)
+        values = {
+            key: value for key, value in element_dict.items() if value is not None
+        }
+        if "props" in values:
+            values["props"] = json.dumps(values["props"])
+        columns = ", ".join(f'"{column}"' for column in values)
+        placeholders = ", ".join(f":{column}" for column in values)
+        updates = ", ".join(
+            f'"{column}" = :{column}' for column in values if column != "id"
+        )
+        await self.execute_sql(
+            query=f"INSERT INTO elements ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates};",
+            parameters=values,
+        )
+
+    async def list_threads(
+        self, pagination: Pagination, filters: ThreadFilter
+    ) -> PaginatedResponse:
+        # Search and feedback filters match on steps; only those need them loaded
+        if filters.search or filters.feedback or not filters.userId:
+            return await super().list_threads(pagination, filters)
+        rows = await self.execute_sql(
+            query=_THREAD_LIST_QUERY,
+            parameters={"user_id": filters.userId, "limit": self.user_thread_limit},
+        )
+        threads = [
+            ThreadDict(
+                id=row["thread_id"],
+                createdAt=row["thread_createdat"],
+                name=row["thread_name"],
+                userId=row["user_id"],
+                userIdentifier=row["user_identifier"],
+                tags=row["thread_tags"],
+                metadata=row["thread_metadata"],
+                steps=[],
+                elements=[],
+            )
+            for row in (rows if isinstance(rows, list) else [])
+        ]
+        # Same cursor semantics as Chainlit: the page starts after the cursor's thread
+        ids = [thread["id"] for thread in threads]
+        start = ids.index(pagination.cursor) + 1 if pagination.cursor in ids else 0
+        end = start + pagination.first
+        page = threads[start:end]
+        return PaginatedResponse(
+            pageInfo=PageInfo(
+                hasNextPage=len(threads) > end,
+                startCursor=page[0]["id"] if page else None,
+                endCursor=page[-1]["id"] if page else None,
+            ),
+            data=page,
+        )
+
+
+def create_data_layer(
+    db_path: Path, storage_provider: BaseStorageClient | None = None
+) -> SQLAlchemyDataLayer:
+    """The Chainlit data layer for ``db_path``, tuned unless DATA_LAYER_TUNED=0."""
+    if DATA_LAYER_TUNED:
+        return TunedSQLAlchemyDataLayer(db_path, storage_provider)
+    return SQLAlchemyDataLayer(
+        conninfo=f"sqlite+aiosqlite:///{db_path}", storage_provider=storage_provider
+    )
@@ -0,0 +1,324 @@
+"""Process-wide rate governor for upstream APIs (LLM, embeddings, Whisper, Tavily).
+
+Every upstream has a token bucket (requests per second plus a burst allowance).
+When a bucket is empty, callers queue and are admitted in this order:
+
+1. Priority class: ``INTERACTIVE`` requests (chat, questions) always go before
+   ``BATCH`` requests (audio parsing, document ingestion).
+2. Within a class, weighted fair queuing per user: each request gets a virtual
+   finish tag ``max(virtual_time, user's last tag) + cost / weight``, so a user
+   with many queued requests cannot starve a user with one.
+
+The caller's user and priority class come from a context variable set with
+:func:`governor_context`, so OpenAI and Tavily calls deep inside LlamaIndex are
+attributed without threading arguments through. OpenAI clients are governed at
+the HTTP layer with :class:`GovernedTransport` / :class:`AsyncGovernedTransport`,
+wrapped by the resilience transports in ``resilience.py``.
+Both sync (worker thread) and async callers share the same queues.
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+ANONYMOUS_USER = "anonymous"
+
+# Requests per second and burst size per upstream; 0 requests/s disables the limit
+DEFAULT_RATE_LIMITS = {
+    "llm": (5.0, 10),
+    "embeddings": (10.0, 20),
+    "whisper": (1.0, 3),
+    "tavily": (1.0, 2),
+}
+
+# Overrides as "name=rate:burst,..." e.g. "llm=2:4,whisper=0.5:1"
+UPSTREAM_RATE_LIMITS = os.getenv("UPSTREAM_RATE_LIMITS", "")
+
+# Queue wait samples kept per upstream for percentile metrics
+_WAIT_SAMPLES = 1024
+
+# Waits longer than this are logged
+_SLOW_WAIT_SECONDS = 1.0
+
+_governor_context: ContextVar[tuple[str, int]] = ContextVar(
+    "governor_context", default=(ANONYMOUS_USER, INTERACTIVE)
+)
+
+
+@contextlib.contextmanager
+def governor_context(
+    user_id: str | None = None, priority: int | None = None
+) -> Iterator[None]:
+    """Attribute upstream calls made inside the block to a user and priority class."""
+    current_user, current_priority = _governor_context.get()
+    token = _governor_context.set(
+        (
+            user_id or current_user,
+            current_priority if priority is None else priority,
+        )
+    )
+    try:
+        yield
+    finally:
+        _governor_context.reset(token)
+
+
+class _Waiter:
+    """A queued request, granted either through a thread event or an asyncio future."""
+
+    __slots__ = (
+        "priority",
+        "user",
+        "tag",
+        "granted",
+        "abandoned",
+        "_event",
+        "_loop",
+        "_future",
+    )
+
+    def __init__(self, priority: int, user: str, tag: float) -> None:
+        self.priority = priority
+        self.user = user
+        self.tag = tag
+        self.granted = False
+        self.abandoned = False
+        self._event: threading.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._future: asyncio.Future | None = None
+
+    def grant(self) -> None:
+        self.granted = True
+        if self._event is not None:
+            self._event.set()
+        if self._future is not None:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+@dataclass
+class UpstreamStats:
+    """Admission metrics for one upstream."""
+
+    name: str
+    granted: int
+    waiting: int
+    wait_seconds_total: float
+    wait_seconds_p50: float
+    wait_seconds_p95: float
+    wait_seconds_max: float
+
+
+class UpstreamLimiter:
+    """Token bucket with priority classes and per-user weighted fair queuing."""
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._queue: list[tuple[int, float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = dict.fromkeys(PRIORITY_NAMES, 0.0)
+        self._user_tags: dict[tuple[int, str], float] = {}
+        self._granted = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_samples: deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _enqueue(self, user: str, priority: int, weight: float, cost: float) -> _Waiter:
+        with self._lock:
+            start = max(
+                self._virtual_time[priority], self._user_tags.get((priority, user), 0.0)
+            )
+            tag = start + cost / weight
+            self._user_tags[(priority, user)] = tag
+            waiter = _Waiter(priority, user, tag)
+            heapq.heappush(self._queue, (priority, tag, next(self._sequence), waiter))
+            return waiter
+
+    def _dispatch(self) -> float:
+        """Grant queued requests while tokens last; return seconds until the next token."""
+        with self._lock:
+            self._refill(time.monotonic())
+            while self._queue and self._tokens >= 1:
+                _, tag, _, waiter = heapq.heappop(self._queue)
+                if waiter.abandoned:
+                    continue
+                self._tokens -= 1
+                self._virtual_time[waiter.priority] = tag
+                if self._user_tags.get((waiter.priority, waiter.user)) == tag:
+                    # The user has nothing else queued; forget them
+                    del self._user_tags[(waiter.priority, waiter.user)]
+                waiter.grant()
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter.granted:
+                # Granted just as the caller gave up; return the token
+                self._tokens = min(self.burst, self._tokens + 1)
+            waiter.abandoned = True
+
+    def _record_wait(self, waited: float, waiter: _Waiter) -> None:
+        with self._lock:
+            self._granted += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._wait_samples.append(waited)
+        if waited >= _SLOW_WAIT_SECONDS:
+            logger.info(
+                f"Waited {waited:.2f}s for {self.name} "
+                f"({PRIORITY_NAMES[waiter.priority]}, user={waiter.user})"
+            )
+
+    def acquire_sync(self, weight: float = 1.0, cost: float = 1.0) -> float:
+        """Block the calling thread until admitted. Returns the queue wait in seconds."""
+        if self.unlimited:
+            return 0.0
+        user, priority = _governor_context.get()
+        started = time.monotonic()
+        waiter = self._enqueue(user, priority, weight, cost)
+        waiter._event = threading.Event()
+        try:
+            while True:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                waiter._event.wait(delay)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.monotonic() - started
+        self._record_wait(waited, waiter)
+        return waited
+
+    async def acquire(self, weight: float = 1.0, cost: float = 1.0) -> float:
+        """Wait in the event loop until admitted. Returns the queue wait in seconds."""
+        if self.unlimited:
+            return 0.0
+        user, priority = _governor_context.get()
+        started = time.monotonic()
+        waiter = self._enqueue(user, priority, weight, cost)
+        waiter._loop = asyncio.get_running_loop()
+        waiter._future = waiter._loop.create_future()
+        try:
+            while True:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(delay):
+                        await asyncio.shield(waiter._future)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.monotonic() - started
+        self._record_wait(waited, waiter)
+        return waited
+
+    def stats(self) -> UpstreamStats:
+        with self._lock:
+            samples = sorted(self._wait_samples)
+            waiting = sum(1 for *_, waiter in self._queue if not waiter.abandoned)
+            return UpstreamStats(
+                name=self.name,
+                granted=self._granted,
+                waiting=waiting,
+                wait_seconds_total=self._wait_total,
+                wait_seconds_p50=statistics.median(samples) if samples else 0.0,
+                wait_seconds_p95=samples[int(0.95 * (len(samples) - 1))]
+                if samples
+                else 0.0,
+                wait_seconds_max=self._wait_max,
+            )
+
+
+def _parse_rate_limits(spec: str) -> dict[str, tuple[float, int]]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        try:
+            name, values = item.split("=", 1)
+            rate, _, burst = values.partition(":")
+            limits[name.strip()] = (
+                float(rate),
+                int(burst) if burst else max(1, int(float(rate))),
+            )
+        except ValueError:
+            logger.warning(f"Ignoring malformed UPSTREAM_RATE_LIMITS entry: {item!r}")
+    return limits
+
+
+class Governor:
+    """Registry of upstream limiters."""
+
+    def __init__(self, limits: dict[str, tuple[float, int]]) -> None:
+        self._limiters = {
+            name: UpstreamLimiter(name, rate, burst)
+            for name, (rate, burst) in limits.items()
+        }
+
+    def limiter(self, upstream: str) -> UpstreamLimiter:
+        return self._limiters[upstream]
+
+    def stats(self) -> list[UpstreamStats]:
+        return [limiter.stats() for limiter in self._limiters.values()]
+
+
+governor = Governor(_parse_rate_limits(UPSTREAM_RATE_LIMITS))
+
+
+class GovernedTransport(httpx.HTTPTransport):
+    """Sync httpx transport that waits for the governor before each request."""
+
+    def __init__(self, upstream: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._limiter = governor.limiter(upstream)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._limiter.acquire_sync()
+        return super().handle_request(request)
+
+
+class AsyncGovernedTransport(httpx.AsyncHTTPTransport):
+    """Async httpx transport that waits for the governor before each request."""
+
+    def __init__(self, upstream: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._limiter = governor.limiter(upstream)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._limiter.acquire()
+        return await super().handle_async_request(request)
@@ -1,33 +1,66 @@
-"""Chainlit event handlers."""
+"""Chainlit event handlers.
+
+Heavy dependencies (llama-index, chromadb, matplotlib) are imported inside the
+handlers that need them, so the server starts without loading them; see
+``warmup.py`` for loading them in the background once it is up.
+"""
+
+from __future__ import annotations
 
 import asyncio
+import json
 import logging
 import random
-import uuid
-
-import chromadb
-from llama_index.core import Document, VectorStoreIndex
-from llama_index.core.memory import ChatMemoryBuffer
-from llama_index.vector_stores.chroma import ChromaVectorStore
+from typing import TYPE_CHECKING
 
 import chainlit as cl
+from chainlit.data import get_data_layer
+from chainlit.types import ThreadDict
 
+from .artifacts import mount_artifact_route, put_json, put_text
 from .assistants import AssistantDescriptor, discover_assistants
-from .atc_parser import parse_atc_conversation
-from .audio import is_audio_file, transcribe_audio
-from .charts import histogram_from_values
-from .llm import embeddings, llm, text_splitter
+from .audio import is_audio_file
+from .audio_archive import start_archiver, stop_archiver
+from .blob_storage import mount_blob_route
+from .governor import BATCH, INTERACTIVE, governor_context
+from .jobs import FAILED, STAGE_PARSE, STAGE_TRANSCRIBE, get_audio_jobs
+from .metrics import track_chat_start, track_request
+from .monitoring import start_monitoring, stop_monitoring
+from .profiling import (
+    PROFILE_DIR,
+    arm_profiler,
+    is_profile_admin,
+    profiled,
+    start_stall_detector,
+    stop_stall_detector,
+)
+from .retention import start_gc, stop_gc
 from .search import (
     TavilyNotConfiguredError,
     is_web_search_configured,
     run_web_search,
 )
+from .semantic_cache import CachedAnswer, answer_cache, document_set_hash
+from .session_state import MEMORY_TOKEN_LIMIT, session_state
+from .tracing import collect_spans, render_span_steps, span
+from .warmup import start_prewarm, stop_prewarm
+
+if TYPE_CHECKING:
+    from llama_index.core import VectorStoreIndex
+    from llama_index.core.chat_engine import CondensePlusContextChatEngine
+    from llama_index.core.memory import ChatMemoryBuffer
+
+    from .ingestion import IngestionPipeline, IngestionResult
+    from .retrieval import BM25Index
 
 logger = logging.getLogger(__name__)
 
 # Initialize assistant registry at module level
 _assistant_registry = discover_assistants()
 
+# Background tasks (audio job followers) kept alive until they finish
+_background_tasks: set[asyncio.Task] = set()
+
 
 def _format_parsed_conversation(parsed_conversation: list) -> str:
     """
@@ -54,182 +87,364 @@ def _format_parsed_conversation(parsed_conversation: list) -> str:
 
 async def _process_audio_file(file: cl.File) -> bool:
     """
-    Process an uploaded audio file by transcribing it with OpenAI Whisper API
-    and parsing it into structured ATC conversation format.
+    Queue an uploaded audio file for transcription with OpenAI Whisper API and
+    parsing into structured ATC conversation format.
+
+    The work runs on the background job queue; progress and the result are posted
+    to the chat by a follower task, so the session is not blocked meanwhile.
 
     Args:
         file: Chainlit File object representing the uploaded audio file
 
     Returns:
-        True if successful, False otherwise
+        True if the file was queued, False otherwise
     """
-    logger.info(f"Starting audio processing for file: {file.name}, path: {file.path}")
-    progress_msg = cl.Message(content=f"🎤 Processing audio file `{file.name}`...")
+    logger.info(f"Queueing audio processing for file: {file.name}, path: {file.path}")
+    progress_msg = cl.Message(
+        content=f"🎤 Audio file `{file.name}` queued for processing..."
+    )
     await progress_msg.send()
 
     try:
-        # Step 1: Transcribe the audio file (wrap sync function in async)
-        logger.info(f"Calling transcribe_audio for {file.path}")
-        result = await cl.make_async(transcribe_audio)(file.path, file.name)
-        transcription_text = result["transcription"]
-        logger.info(f"Transcription successful: {len(transcription_text)} characters")
-
-        # Step 2: Parse the transcript into structured conversation
-        parsed_conversation = None
-        parsing_error = None
-        try:
-            logger.info("Parsing transcript into ATC conversation format")
-            parsed_conversation = await cl.make_async(parse_atc_conversation)(transcription_text)
-            logger.info(f"Successfully parsed {len(parsed_conversation)} conversation messages")
-        except Exception as e:
-            logger.warning(f"Failed to parse ATC conversation: {e}")
-            parsing_error = str(e)
-            # Continue even if parsing fails - we'll still show the raw transcript
+        # Copies the upload into the job queue's input directory
+        with span("audio.upload", file_name=file.name):
+            job_id = await get_audio_jobs().enqueue(
+                file.path, file.name, cl.context.session.thread_id, _current_user_id()
+            )
+    except Exception as e:
+        logger.error(f"Failed to queue audio file {file.name}: {e}", exc_info=True)
+        progress_msg.content = f"❌ Failed to queue audio file `{file.name}`: {str(e)}"
+        await progress_msg.update()
+        return False
+
+    _spawn_background(_follow_audio_job(job_id, progress_msg))
+    return True
+
+
+def _current_user_id() -> str:
+    """Identify the session's user for fair scheduling of upstream calls."""
+    user = cl.user_session.get("user")
+    if user is not None:
+        return user.identifier
+    return cl.user_session.get("id") or "anonymous"
+
+
+def _spawn_background(coro) -> None:
+    """Run a coroutine in the background, keeping a reference until it finishes."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _follow_audio_job(
+    job_id: str, progress_msg: cl.Message | None = None
+) -> None:
+    """Mirror an audio job's progress into the chat and post its result once."""
+    if progress_msg is None:
+        progress_msg = cl.Message(content="🎤 Resuming audio processing...")
+        await progress_msg.send()
+
+    audio_jobs = get_audio_jobs()
+    job = None
+    async for job in audio_jobs.watch(job_id):
+        retry_note = (
+            f" (attempt {job.attempts}/{audio_jobs.max_attempts})"
+            if job.attempts > 1
+            else ""
+        )
+        if job.stage == STAGE_TRANSCRIBE:
+            progress_msg.content = (
+                f"🎤 Transcribing audio file `{job.file_name}`...{retry_note}"
+            )
+        elif job.stage == STAGE_PARSE:
+            progress_msg.content = (
+                f"🧠 Parsing conversation in `{job.file_name}`...{retry_note}"
+            )
+        else:
+            continue
+        await progress_msg.update()
+
+    if (
+        job is None
+        or not job.is_finished
+        or not await audio_jobs.claim_delivery(job_id)
+    ):
+        return
+
+    if job.status == FAILED:
+        progress_msg.content = (
+            f"❌ Failed to transcribe audio file `{job.file_name}`: {job.error}\n\n"
+            "Please ensure:\n"
+            "- The file is a valid audio format (.mp3, .wav, .m4a)\n"
+            "- The file is not corrupted\n"
+            "- OpenAI API key is configured correctly"
+        )
+        await progress_msg.update()
+        return
 
-        # Create audio element for playback
+    await _send_audio_result(job.result)
+    progress_msg.content = (
+        f"✅ Audio file `{job.file_name}` transcribed and parsed successfully!"
+    )
+    await progress_msg.update()
+
+
+async def _send_audio_result(result: dict) -> None:
+    """Post the transcript, parsed conversation and audio player for a finished job."""
+    with collect_spans() as spans:
+        await _build_and_send_audio_result(result)
+    await render_span_steps(result.get("trace", []) + spans, "Audio pipeline timings")
+
+
+async def _build_and_send_audio_result(result: dict) -> None:
+    transcription_text = result["transcription"]
+    parsed_conversation = result.get("parsed_conversation")
+    parsing_error = result.get("parsing_error")
+
+    # Create audio element for playback
+    with span("audio.elements"):
         audio_element = cl.Audio(
             path=result["audio_path"],
-            name=file.name,
+            name=result["original_filename"],
             display="inline",
         )
 
-        # Build response content with collapsible transcript and parsed conversation
-        response_parts = []
+    # Build response content with collapsible transcript and parsed conversation
+    response_parts = []
 
-        # Audio player section
-        response_parts.append("🎤 **Audio Transcription Complete**\n")
+    # Audio player section
+    response_parts.append("🎤 **Audio Transcription Complete**\n")
 
-        # Parsed conversation section (show this prominently)
-        if parsed_conversation:
-            response_parts.append("### Parsed Conversation\n")
+    # Parsed conversation section (show this prominently)
+    if parsed_conversation:
+        response_parts.append("### Parsed Conversation\n")
+        with span("audio.format", messages=len(parsed_conversation)):
             formatted_conversation = _format_parsed_conversation(parsed_conversation)
-            response_parts.append(formatted_conversation)
-            response_parts.append("")  # Empty line for spacing
-        elif parsing_error:
-            response_parts.append(
-                f"### Parsed Conversation\n"
-                f"⚠️ Failed to parse conversation: {parsing_error}\n"
-            )
-        else:
-            response_parts.append(
-                "### Parsed Conversation\n"
-                "⚠️ Could not parse conversation.\n"
-            )
+        response_parts.append(formatted_conversation)
+        response_parts.append("")  # Empty line for spacing
+    elif parsing_error:
+        response_parts.append(
+            f"### Parsed Conversation\n"
+            f"⚠️ Failed to parse conversation: {parsing_error}\n"
+        )
+    else:
+        response_parts.append(
+            "### Parsed Conversation\n⚠️ Could not parse conversation.\n"
+        )
+
+    # Raw transcript section (collapsible using custom element)
+    response_content = "\n".join(response_parts)
+
+    # The transcript and parsed conversation are stored once by content hash;
+    # the message and the collapsible section carry only references, and the
+    # section fetches the text when it is opened
+    transcript_content = str(transcription_text) if transcription_text else ""
+    with span("audio.artifacts"):
+        transcript_ref = await asyncio.to_thread(put_text, transcript_content)
+        parsed_ref = (
+            await asyncio.to_thread(put_json, parsed_conversation)
+            if parsed_conversation
+            else None
+        )
 
-        # Raw transcript section (collapsible using custom element)
-        response_content = "\n".join(response_parts)
-        
-        # Create collapsible section custom element for raw transcript
-        # Ensure transcription_text is a string and not None
-        transcript_content = str(transcription_text) if transcription_text else ""
-        logger.info(f"Creating collapsible element with content length: {len(transcript_content)}")
-        
+    with span("audio.elements"):
         collapsible_element = cl.CustomElement(
             name="CollapsibleSection",
             props={
                 "title": "Raw Transcript",
-                "content": transcript_content
-            }
+                "artifact": transcript_ref,
+            },
         )
 
-        # Prepare metadata
-        metadata = {
-            "transcription": transcription_text,
-            "audio_path": result["audio_path"],
-            "audio_format": result["format"],
-            "original_filename": result["original_filename"],
-        }
-        if parsed_conversation:
-            metadata["parsed_conversation"] = parsed_conversation
-
-        response_msg = cl.Message(
-            content=response_content,
-            elements=[audio_element, collapsible_element],
-            metadata=metadata,
-        )
+    # Prepare metadata
+    metadata = {
+        "transcription_ref": transcript_ref,
+        "audio_path": result["audio_path"],
+        "audio_format": result["format"],
+        "original_filename": result["original_filename"],
+    }
+    if parsed_ref:
+        metadata["parsed_conversation_ref"] = parsed_ref
+
+    response_msg = cl.Message(
+        content=response_content,
+        elements=[audio_element, collapsible_element],
+        metadata=metadata,
+    )
+    # Sending persists the elements (blob storage) and the step through the data layer
+    with span("audio.persist"):
         await response_msg.send()
 
-        progress_msg.content = f"✅ Audio file `{file.name}` transcribed and parsed successfully!"
-        await progress_msg.update()
 
-        return True
+async def _ingest_with_step(
+    pipeline: IngestionPipeline, file: cl.File
+) -> IngestionResult | None:
+    """Ingest one file inside its own progress step. Returns None on failure."""
+    from .ingestion import EmptyDocumentError
 
-    except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        logger.error(f"Failed to process audio file {file.name}: {e}\n{error_trace}")
-        error_msg = (
-            f"❌ Failed to transcribe audio file `{file.name}`: {str(e)}\n\n"
-            "Please ensure:\n"
-            "- The file is a valid audio format (.mp3, .wav, .m4a)\n"
-            "- The file is not corrupted\n"
-            "- OpenAI API key is configured correctly\n\n"
-            f"Error details: {type(e).__name__}"
-        )
-        progress_msg.content = error_msg
-        await progress_msg.update()
-        return False
+    async with cl.Step(name=f"Ingest {file.name}", type="tool") as step:
+        step.input = file.name
+        try:
+            result = await pipeline.ingest_file(file.path, file.name)
+        except EmptyDocumentError:
+            step.is_error = True
+            step.output = (
+                f"File `{file.name}` is empty. Please upload a file with content."
+            )
+            return None
+        except UnicodeDecodeError:
+            step.is_error = True
+            step.output = (
+                f"Could not read file `{file.name}`. Please ensure it's a text file."
+            )
+            return None
+        except Exception as e:
+            logger.error(f"Failed to ingest {file.name}: {e}", exc_info=True)
+            step.is_error = True
+            step.output = f"Failed to process file `{file.name}`: {str(e)}"
+            return None
+        step.output = result.summary()
+        return result
 
 
-async def _process_file(file: cl.File) -> bool:
+async def _process_files(files: list[cl.File]) -> bool:
     """
-    Process an uploaded file and set up the vector store index.
+    Ingest uploaded text files into the session's vector store index.
 
-    Currently only text files are supported. PDF support requires additional libraries like pypdf.
-    Returns True if successful.
+    All files are read, split and embedded concurrently and inserted into a single
+    session index, so documents from earlier uploads remain searchable. Currently
+    only text files are supported. PDF support requires additional libraries like pypdf.
+    Returns True if at least one file was ingested.
     """
-    msg = cl.Message(content=f"Processing `{file.name}`...")
+    from .ingestion import IngestionPipeline, create_session_index
+    from .retrieval import BM25Index
+
+    names = ", ".join(f"`{file.name}`" for file in files)
+    msg = cl.Message(content=f"Processing {names}...")
     await msg.send()
 
-    try:
-        with open(file.path, encoding="utf-8") as f:
-            text = f.read()
-        if not text.strip():
-            await cl.Message(
-                content=f"Error: File `{file.name}` is empty. Please upload a file with content."
-            ).send()
-            return False
-    except UnicodeDecodeError:
-        await cl.Message(
-            content=f"Error: Could not read file `{file.name}`. Please ensure it's a text file."
-        ).send()
-        return False
-    except Exception as e:
-        await cl.Message(
-            content=f"Error: Failed to read file `{file.name}`: {str(e)}"
-        ).send()
+    index = await _get_session_index()
+    lexical_index: BM25Index | None = cl.user_session.get("lexical_index")
+    if index is None:
+        index = create_session_index()
+        lexical_index = BM25Index()
+    pipeline = IngestionPipeline(index, lexical_index)
+
+    # Bulk embedding requests yield to interactive questions from other users
+    with governor_context(priority=BATCH):
+        results = await asyncio.gather(*(_ingest_with_step(pipeline, f) for f in files))
+    ingested = [result for result in results if result is not None]
+    if not ingested:
+        msg.content = f"Processing {names} failed."
+        await msg.update()
         return False
 
-    # Create LlamaIndex Document
-    document = Document(text=text, metadata={"source": file.name})
-
-    # Create ChromaDB collection for this session
-    chroma_client = chromadb.Client()
-    collection_name = f"session_{uuid.uuid4().hex[:8]}"
-    chroma_collection = chroma_client.get_or_create_collection(name=collection_name)
-
-    # Create vector store and index
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
-    index = VectorStoreIndex.from_documents(
-        [document],
-        vector_store=vector_store,
-        embed_model=embeddings,
-        transformations=[text_splitter],
-    )
+    file_names: list[str] = cl.user_session.get("file_names") or []
+    file_names.extend(result.file_name for result in ingested)
+    content_hashes: list[str] = cl.user_session.get("content_hashes") or []
+    content_hashes.extend(result.content_hash for result in ingested)
 
-    msg.content = f"Processing `{file.name}` done. You can now ask questions!"
+    cl.user_session.set("index", index)
+    cl.user_session.set("lexical_index", lexical_index)
+    cl.user_session.set("file_names", file_names)
+    cl.user_session.set("file_name", ", ".join(file_names))
+    cl.user_session.set("content_hashes", content_hashes)
+    # Answers cached for the previous document set no longer apply
+    cl.user_session.set("document_hash", document_set_hash(content_hashes))
+
+    await _save_session_snapshot(index, file_names, content_hashes)
+
+    total_chunks = sum(result.chunks for result in ingested)
+    msg.content = (
+        f"Processing {names} done ({len(ingested)}/{len(files)} files, "
+        f"{total_chunks} chunks). You can now ask questions!"
+    )
     await msg.update()
+    return True
+
+
+async def _save_session_snapshot(
+    index: VectorStoreIndex, file_names: list[str], content_hashes: list[str]
+) -> None:
+    """
+    Snapshot the session index to disk and link it to the current thread.
+
+    Failures are logged and otherwise ignored: the live index keeps working, the
+    thread just can't be resumed without re-uploading its documents.
+    """
+    from .snapshots import delete_index_snapshot, new_snapshot_id, save_index_snapshot
+
+    thread_id = cl.context.session.thread_id
+    snapshot_id = new_snapshot_id(thread_id)
+    try:
+        await asyncio.to_thread(
+            save_index_snapshot, index, snapshot_id, file_names, content_hashes
+        )
+    except Exception as e:
+        logger.warning(f"Failed to snapshot session index: {e}", exc_info=True)
+        return
+
+    previous = cl.user_session.get("index_snapshot")
+    cl.user_session.set("index_snapshot", snapshot_id)
+
+    data_layer = get_data_layer()
+    if data_layer and thread_id:
+        try:
+            with span("db.update_thread"):
+                await data_layer.update_thread(
+                    thread_id=thread_id, metadata={"index_snapshot": snapshot_id}
+                )
+        except Exception as e:
+            logger.warning(f"Failed to link index snapshot to thread {thread_id}: {e}")
+
+    if previous and previous != snapshot_id:
+        await asyncio.to_thread(delete_index_snapshot, previous)
+
+
+async def _get_session_index() -> VectorStoreIndex | None:
+    """
+    Return the session index, rehydrating it from its snapshot if needed.
+
+    Resumed threads only carry the snapshot id; the index is loaded the first time
+    it is actually needed, from memory-mapped vectors and without re-embedding.
+    """
+    index: VectorStoreIndex | None = cl.user_session.get("index")
+    if index is not None:
+        return index
+
+    snapshot_id = cl.user_session.get("index_snapshot")
+    if not snapshot_id:
+        return None
+
+    from .snapshots import load_index_snapshot
 
+    try:
+        loaded = await asyncio.to_thread(load_index_snapshot, snapshot_id)
+    except Exception as e:
+        logger.error(f"Failed to load index snapshot {snapshot_id}: {e}", exc_info=True)
+        loaded = None
+    if loaded is None:
+        # Don't retry a missing or broken snapshot on every message
+        cl.user_session.set("index_snapshot", None)
+        return None
+
+    index, lexical_index, manifest = loaded
     cl.user_session.set("index", index)
-    cl.user_session.set("file_name", file.name)
-    return True
+    cl.user_session.set("lexical_index", lexical_index)
+    cl.user_session.set("file_names", manifest.file_names)
+    cl.user_session.set("file_name", ", ".join(manifest.file_names))
+    cl.user_session.set("content_hashes", manifest.content_hashes)
+    cl.user_session.set("document_hash", document_set_hash(manifest.content_hashes))
+    return index
 
 
 def _get_general_memory() -> ChatMemoryBuffer:
     """Return or initialize the general chat memory for the session."""
+    from llama_index.core.memory import ChatMemoryBuffer
+
     memory: ChatMemoryBuffer | None = cl.user_session.get("general_memory")
     if memory is None:
-        memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
+        memory = ChatMemoryBuffer.from_defaults(token_limit=MEMORY_TOKEN_LIMIT)
         cl.user_session.set("general_memory", memory)
     return memory
 
@@ -243,62 +458,187 @@ async def _respond_with_general_chat(user_input: str) -> None:
         return
 
     memory = _get_general_memory()
-    
+
     # Create a simple chat engine with memory
     from llama_index.core.chat_engine import SimpleChatEngine
-    
+
+    from .llm import llm
+
     chat_engine = SimpleChatEngine.from_defaults(
         llm=llm,
         memory=memory,
     )
-    
+
     # Stream the response
     response = cl.Message(content="")
     await response.send()
-    
-    # Use stream_chat() wrapped in make_async since astream_chat() 
+
+    # Use stream_chat() wrapped in make_async since astream_chat()
     # returns a coroutine instead of an async iterator for SimpleChatEngine
     # We need to run the synchronous generator iteration in a thread to avoid blocking
     full_response = ""
-    
+
     def _collect_tokens():
         """Collect all tokens from the stream in a thread."""
         tokens = []
-        for token in chat_engine.stream_chat(user_input):
+        for token in chat_engine.stream_chat(user_input).response_gen:
             tokens.append(token)
         return tokens
-    
+
     tokens = await asyncio.to_thread(_collect_tokens)
-    
+
     # Stream the collected tokens asynchronously with throttling
     # Update every few tokens to avoid "Too many packets in payload" error
     update_interval = 5  # Update every 5 tokens
     for idx, token in enumerate(tokens):
-        if hasattr(token, 'delta'):
+        if hasattr(token, "delta"):
             full_response += token.delta
-        elif hasattr(token, 'response'):
+        elif hasattr(token, "response"):
             # If token has a response attribute, use it
             full_response = str(token.response)
         else:
             full_response += str(token)
-        
+
         # Only update periodically to avoid overwhelming WebSocket
         if (idx + 1) % update_interval == 0 or idx == len(tokens) - 1:
             response.content = full_response
             await response.update()
             # Small delay to prevent overwhelming the WebSocket
             await asyncio.sleep(0.01)
-    
+
     # Final update to ensure complete response is shown
     if full_response:
         response.content = full_response
         await response.update()
 
 
+def _get_document_chat_engine(index: VectorStoreIndex) -> CondensePlusContextChatEngine:
+    """Return or initialize the document QA chat engine for the session."""
+    chat_engine = cl.user_session.get("chat_engine")
+    if chat_engine is None:
+        from llama_index.core.chat_engine import CondensePlusContextChatEngine
+        from llama_index.core.memory import ChatMemoryBuffer
+
+        from .llm import llm
+        from .retrieval import BM25Index, HybridRetriever
+
+        # Reuse history restored from the session state store, if any
+        memory: ChatMemoryBuffer | None = cl.user_session.get("document_memory")
+        if memory is None:
+            memory = ChatMemoryBuffer.from_defaults(token_limit=MEMORY_TOKEN_LIMIT)
+        # Fuse dense retrieval with BM25 so exact tokens like runways,
+        # frequencies and tail numbers are matched reliably
+        retriever = HybridRetriever(
+            index,
+            cl.user_session.get("lexical_index") or BM25Index(),
+            similarity_top_k=3,
+        )
+        chat_engine = CondensePlusContextChatEngine.from_defaults(
+            retriever=retriever,
+            llm=llm,
+            memory=memory,
+        )
+        cl.user_session.set("chat_engine", chat_engine)
+        cl.user_session.set("document_memory", memory)
+    return chat_engine
+
+
+def _source_elements(sources: list[str]) -> list[cl.Text]:
+    """Build side-panel text elements for retrieved source chunks."""
+    return [
+        cl.Text(content=text, name=f"source_{source_idx}", display="side")
+        for source_idx, text in enumerate(sources)
+    ]
+
+
+def _with_source_footer(answer: str, elements: list[cl.Text]) -> str:
+    if not elements:
+        return answer
+    source_names = [text_el.name for text_el in elements]
+    return f"{answer}\nSources: {', '.join(source_names)}"
+
+
+async def _replay_cached_answer(user_input: str, cached: CachedAnswer) -> None:
+    """Stream a cached answer with its sources and record the turn in chat memory."""
+    text_elements = _source_elements(cached.sources)
+    response = cl.Message(content="", elements=text_elements)
+    await response.stream_token(cached.answer)
+    response.content = _with_source_footer(cached.answer, text_elements)
+    await response.send()
+
+    memory: ChatMemoryBuffer | None = cl.user_session.get("document_memory")
+    if memory is not None:
+        from llama_index.core.llms import ChatMessage, MessageRole
+
+        memory.put(ChatMessage(role=MessageRole.USER, content=user_input))
+        memory.put(ChatMessage(role=MessageRole.ASSISTANT, content=cached.answer))
+
+
+async def _respond_with_document_qa(index: VectorStoreIndex, user_input: str) -> None:
+    """Answer a question about the uploaded documents, using the semantic cache when possible."""
+    chat_engine = _get_document_chat_engine(index)
+
+    document_hash = cl.user_session.get("document_hash")
+    # The engine condenses follow-ups ("what about the second one?") with the
+    # chat history, so only a conversation's first question stands on its own
+    memory: ChatMemoryBuffer | None = cl.user_session.get("document_memory")
+    standalone = memory is None or not memory.get_all()
+    question_embedding = None
+    if answer_cache.enabled and document_hash and standalone:
+        from .llm import embeddings
+
+        question_embedding = await embeddings.aget_query_embedding(user_input)
+        cached = answer_cache.lookup(document_hash, question_embedding)
+        if cached is not None:
+            await _replay_cached_answer(user_input, cached)
+            return
+
+    # Stream the response
+    response = cl.Message(content="")
+    await response.send()
+
+    full_response = ""
+    token_count = 0
+
+    streaming_response = await chat_engine.astream_chat(user_input)
+
+    # Source nodes are retrieved before generation starts
+    sources = [node.text for node in streaming_response.source_nodes]
+    text_elements = _source_elements(sources)
+
+    async for delta in streaming_response.async_response_gen():
+        if delta:
+            full_response += delta
+            token_count += 1
+
+        # Throttle updates: update every 5 tokens to avoid "Too many packets" error
+        # Also update on first token to show immediate feedback
+        update_interval = 5
+        if token_count == 1 or token_count % update_interval == 0:
+            response.content = full_response
+            await response.update()
+            # Small delay to prevent overwhelming the WebSocket
+            await asyncio.sleep(0.01)
+
+    # Final update with source elements to ensure the complete response is shown
+    # (in case the last update didn't happen due to throttling)
+    response.content = _with_source_footer(full_response, text_elements)
+    if text_elements:
+        response.elements = text_elements
+    await response.update()
+
+    if question_embedding is not None and full_response:
+        answer_cache.store(
+            document_hash,
+            question_embedding,
+            CachedAnswer(question=user_input, answer=full_response, sources=sources),
+        )
+
+
 def _parse_assistant_command(user_input: str) -> tuple[str | None, str]:
     """
     Parse assistant-related commands from user input.
-    
+
     Returns:
         Tuple of (command_type, remainder) where:
         - command_type: "list", "switch", "direct", or None
@@ -306,14 +646,16 @@ def _parse_assistant_command(user_input: str) -> tuple[str | None, str]:
     """
     if not user_input:
         return None, ""
-    
+
     trimmed = user_input.strip()
     lower_trimmed = trimmed.lower()
-    
+
     # /assistant list
-    if lower_trimmed == "/assistant list" or lower_trimmed.startswith("/assistant list "):
+    if lower_trimmed == "/assistant list" or lower_trimmed.startswith(
+        "/assistant list "
+    ):
         return "list", ""
-    
+
     # /assistant <name>
     if lower_trimmed.startswith("/assistant "):
         parts = trimmed.split(maxsplit=2)
@@ -321,7 +663,7 @@ def _parse_assistant_command(user_input: str) -> tuple[str | None, str]:
             assistant_name = parts[1]
             return "switch", assistant_name
         return "switch", ""
-    
+
     # /<command> <message> - direct assistant command
     if trimmed.startswith("/"):
         parts = trimmed.split(maxsplit=1)
@@ -330,7 +672,7 @@ def _parse_assistant_command(user_input: str) -> tuple[str | None, str]:
         if assistant:
             remainder = parts[1] if len(parts) > 1 else ""
             return "direct", f"{command} {remainder}".strip()
-    
+
     return None, trimmed
 
 
@@ -355,6 +697,37 @@ def _extract_search_query(user_input: str) -> str | None:
     return None
 
 
+def _parse_profile_command(user_input: str) -> int | None:
+    """Return the number of requests to profile if the user issued a /profile command."""
+    if not user_input:
+        return None
+
+    parts = user_input.strip().split()
+    if not parts or parts[0].lower() != "/profile":
+        return None
+    if len(parts) == 1:
+        return 1
+    try:
+        return max(0, int(parts[1]))
+    except ValueError:
+        return 1
+
+
+async def _respond_to_profile_command(requests: int) -> None:
+    if not is_profile_admin(cl.user_session.get("user")):
+        await cl.Message(content="❌ `/profile` is only available to admins.").send()
+        return
+    arm_profiler(requests)
+    if requests:
+        content = (
+            f"🔬 Profiling the next {requests} request(s). "
+            f"Folded stacks are written to `{PROFILE_DIR}`."
+        )
+    else:
+        content = "🔬 Profiling disarmed."
+    await cl.Message(content=content).send()
+
+
 def _parse_chart_request(user_input: str) -> int | None:
     """Return the requested sample size if the user issued a /chart command."""
     if not user_input:
@@ -378,12 +751,12 @@ def _parse_chart_request(user_input: str) -> int | None:
 
 async def _respond_with_demo_chart(sample_size: int) -> None:
     """Render a Seaborn histogram and return it as a Chainlit attachment."""
+    from .charts import histogram_from_values
+
     rng = random.Random(sample_size)
     values = [rng.gauss(mu=0, sigma=1) for _ in range(sample_size)]
 
-    chart = histogram_from_values(
-        values, title=f"Demo distribution (n={sample_size})"
-    )
+    chart = histogram_from_values(values, title=f"Demo distribution (n={sample_size})")
 
     await cl.Message(
         content=(
@@ -430,48 +803,50 @@ async def _respond_with_web_search(query: str) -> None:
         url = result.get("url") or ""
         snippet = result.get("content") or result.get("snippet") or ""
         if url:
-            formatted_results.append(
-                f"{idx}. **[{title}]({url})**\n{snippet}".strip()
-            )
+            formatted_results.append(f"{idx}. **[{title}]({url})**\n{snippet}".strip())
         else:
             formatted_results.append(f"{idx}. **{title}**\n{snippet}".strip())
 
-    progress.content = "🔎 **Web search results:**\n\n" + "\n\n".join(
-        formatted_results
-    )
+    progress.content = "🔎 **Web search results:**\n\n" + "\n\n".join(formatted_results)
     await progress.update()
 
 
+@cl.on_app_startup
+async def on_app_startup():
+    """Start background workers, resuming audio jobs interrupted by a restart."""
+    # Creates the data layer and migrates its schema once, off the event loop
+    await asyncio.to_thread(get_data_layer)
+    mount_artifact_route()
+    mount_blob_route()
+    # Creates the job directory and database off the event loop
+    audio_jobs = await asyncio.to_thread(get_audio_jobs)
+    await audio_jobs.start()
+    await start_monitoring()
+    start_stall_detector()
+    start_prewarm()
+    start_gc()
+    start_archiver()
+
+
+@cl.on_app_shutdown
+async def on_app_shutdown():
+    """Stop background workers; unfinished jobs resume on the next start."""
+    stop_stall_detector()
+    await stop_prewarm()
+    await stop_gc()
+    await stop_archiver()
+    await stop_monitoring()
+    await get_audio_jobs().stop()
+
+
 @cl.on_chat_start
 async def on_chat_start():
-    """Initialize chat session and ensure database is initialized."""
-    # Log audio config state for debugging (config should already be set via TOML)
-    try:
-        import chainlit.config as cfg
-        if hasattr(cfg.config, 'features') and hasattr(cfg.config.features, 'audio'):
-            audio_enabled = cfg.config.features.audio.enabled
-            logger.info(f"Audio feature config state: enabled={audio_enabled}")
-            if not audio_enabled:
-                logger.warning(
-                    "Audio feature is disabled in config. "
-                    "Check chainlit.toml [features.audio] enabled setting."
-                )
-    except Exception as e:
-        logger.debug(f"Could not check audio config in on_chat_start: {e}")
-    
-    # Trigger database initialization to ensure tables exist before Chainlit queries them
-    try:
-        data_layer = cl.data_layer
-        if data_layer:
-            try:
-                await data_layer.list_threads(user_id="__init__", pagination=None, filters=None)
-            except Exception:
-                # Tables will be created on next access if this fails (expected on first run)
-                pass
-    except Exception:
-        # Database will be initialized when actually needed
-        pass
+    """Initialize the chat session (the database schema is migrated at startup)."""
+    with track_chat_start():
+        await _start_chat()
+
 
+async def _start_chat() -> None:
     index = cl.user_session.get("index")
     if index:
         file_name = cl.user_session.get("file_name", "document")
@@ -493,7 +868,7 @@ async def on_chat_start():
         "if you want me to answer questions about that document, or upload an audio file "
         "(.mp3, .wav, .m4a) to get it transcribed automatically."
     )
-    
+
     # Add assistant information
     if assistants:
         assistant_list = "\n".join(
@@ -504,73 +879,98 @@ async def on_chat_start():
             "Use `/assistant <name>` to switch assistants, or `/<command> <message>` "
             "to use a specific assistant directly."
         )
-    
+
     if is_web_search_configured():
-        welcome_message += (
-            "\n\nNeed the latest info? Type `/search your question` to run a live Tavily web search."
-        )
-    welcome_message += (
-        "\n\nWant a visual? Type `/chart 200` (or another size) to see a Seaborn histogram."
-    )
+        welcome_message += "\n\nNeed the latest info? Type `/search your question` to run a live Tavily web search."
+    welcome_message += "\n\nWant a visual? Type `/chart 200` (or another size) to see a Seaborn histogram."
 
     await cl.Message(content=welcome_message).send()
+    await session_state.persist()
+
+
+@cl.on_chat_resume
+async def on_chat_resume(thread: ThreadDict):
+    """Restore a previous thread; its document index is rehydrated on first use."""
+    metadata = thread.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+
+    await session_state.restore()
+
+    # Post results of audio jobs that finished (or are still running) while away
+    for job in await get_audio_jobs().undelivered(thread["id"]):
+        _spawn_background(_follow_audio_job(job.id))
+
+    snapshot_id = metadata.get("index_snapshot")
+    if snapshot_id and not cl.user_session.get("index_snapshot"):
+        cl.user_session.set("index_snapshot", snapshot_id)
+    logger.info(f"Resumed thread {thread.get('id')} (index snapshot: {snapshot_id})")
 
 
 async def _process_audio_element(audio_element: cl.Audio) -> bool:
     """
     Process an Audio element by transcribing it with OpenAI Whisper API.
-    
+
     Args:
         audio_element: Chainlit Audio element
-        
+
     Returns:
         True if successful, False otherwise
     """
-    logger.info(f"Processing Audio element: name={audio_element.name}, path={audio_element.path}")
-    
+    logger.info(
+        f"Processing Audio element: name={audio_element.name}, path={audio_element.path}"
+    )
+
     # Create a temporary File-like object for compatibility with _process_audio_file
-    # We'll pass the path and name directly to transcribe_audio
+    # We'll pass the path and name directly to the audio job queue
     class AudioFileWrapper:
         def __init__(self, audio_elem: cl.Audio):
             self.name = audio_elem.name
             self.path = audio_elem.path
             self.mime = audio_elem.mime or ""
-    
+
     file_wrapper = AudioFileWrapper(audio_element)
     return await _process_audio_file(file_wrapper)
 
 
 @cl.on_message
 async def main(message: cl.Message):
+    """Handle incoming messages, keeping session state in sync with other workers."""
+    await session_state.restore()
+    try:
+        async with profiled("handlers.main"):
+            with (
+                governor_context(_current_user_id(), INTERACTIVE),
+                span("handlers.main", thread_id=cl.context.session.thread_id),
+            ):
+                await _handle_message(message)
+    finally:
+        await session_state.persist()
+
+
+async def _handle_message(message: cl.Message):
     """Handle incoming messages and document QA."""
     # Handle file uploads if present
     if message.elements:
-        audio_processed = False
+        text_files: list[cl.File] = []
         logger.info(f"Message has {len(message.elements)} elements")
         for element in message.elements:
             logger.info(f"Element type: {type(element).__name__}, element: {element}")
-            
+
             # Check for Audio elements first (Chainlit creates these for audio uploads)
             if isinstance(element, cl.Audio):
-                logger.info(f"Audio element detected: name={element.name}, path={element.path}, mime={element.mime}")
+                logger.info(
+                    f"Audio element detected: name={element.name}, path={element.path}, mime={element.mime}"
+                )
                 try:
-                    success = await _process_audio_element(element)
+                    with track_request("audio"):
+                        success = await _process_audio_element(element)
                     logger.info(f"Audio processing result: success={success}")
-                    audio_processed = True
-                    # If no text content with audio file, return early
-                    if not message.content or not message.content.strip():
-                        logger.info("No text content, returning early after audio processing")
-                        return
-                    # Continue processing text content if present
-                    break
                 except Exception as e:
-                    logger.error(f"Exception during audio processing: {e}", exc_info=True)
-                    # Still mark as processed to prevent fallthrough
-                    audio_processed = True
-                    if not message.content or not message.content.strip():
-                        return
-                    break
-            
+                    logger.error(
+                        f"Exception during audio processing: {e}", exc_info=True
+                    )
+
             elif isinstance(element, cl.File):
                 # Check if it's an audio file first
                 is_audio = is_audio_file(element.mime or "", element.name)
@@ -580,55 +980,44 @@ async def main(message: cl.Message):
                 )
                 if is_audio:
                     try:
-                        success = await _process_audio_file(element)
+                        with track_request("audio"):
+                            success = await _process_audio_file(element)
                         logger.info(f"Audio processing result: success={success}")
-                        audio_processed = True
-                        # If no text content with audio file, return early
-                        if not message.content or not message.content.strip():
-                            logger.info("No text content, returning early after audio processing")
-                            return
-                        # Continue processing text content if present
-                        break
                     except Exception as e:
-                        logger.error(f"Exception during audio processing: {e}", exc_info=True)
-                        # Still mark as processed to prevent fallthrough
-                        audio_processed = True
-                        if not message.content or not message.content.strip():
-                            return
-                        break
+                        logger.error(
+                            f"Exception during audio processing: {e}", exc_info=True
+                        )
                 else:
-                    # Process as text file
-                    success = await _process_file(element)
-                    if success:
-                        await cl.Message(
-                            content="✅ File processed successfully! You can now ask questions about the document."
-                        ).send()
-                    else:
-                        await cl.Message(
-                            content="❌ Failed to process the file. Please ensure it's a valid text file and try again."
-                        ).send()
-
-                    # If no text content with file, return early
-                    if not message.content or not message.content.strip():
-                        return
-                    break
-        
-        # If we processed an audio file and there's no text content, return early
-        if audio_processed and (not message.content or not message.content.strip()):
-            logger.info("Returning early after audio processing (no text content)")
+                    # Text files are ingested together into one session index
+                    text_files.append(element)
+
+        if text_files:
+            with track_request("document_ingest"):
+                success = await _process_files(text_files)
+            if success:
+                await cl.Message(
+                    content="✅ Files processed successfully! You can now ask questions about the documents."
+                ).send()
+            else:
+                await cl.Message(
+                    content="❌ Failed to process the files. Please ensure they are valid text files and try again."
+                ).send()
+
+        # If no text content came with the files, we're done
+        if not message.content or not message.content.strip():
+            logger.info("Returning early after file processing (no text content)")
             return
 
     user_content = message.content or ""
 
     # Handle assistant commands
     cmd_type, cmd_remainder = _parse_assistant_command(user_content)
-    
+
     if cmd_type == "list":
         assistants = _assistant_registry.list_all()
         if assistants:
             assistant_list = "\n".join(
-                f"- `/{a.command}`: **{a.name}** - {a.description}"
-                for a in assistants
+                f"- `/{a.command}`: **{a.name}** - {a.description}" for a in assistants
             )
             await cl.Message(
                 content=f"**Available Assistants:**\n\n{assistant_list}"
@@ -636,14 +1025,14 @@ async def main(message: cl.Message):
         else:
             await cl.Message(content="No assistants are currently registered.").send()
         return
-    
+
     if cmd_type == "switch":
         if not cmd_remainder:
             await cl.Message(
                 content="Please specify an assistant name. Use `/assistant list` to see available assistants."
             ).send()
             return
-        
+
         assistant = _assistant_registry.get(cmd_remainder)
         if assistant:
             cl.user_session.set("active_assistant", assistant.command)
@@ -655,13 +1044,13 @@ async def main(message: cl.Message):
                 content=f"❌ Assistant '{cmd_remainder}' not found. Use `/assistant list` to see available assistants."
             ).send()
         return
-    
+
     if cmd_type == "direct":
         # Extract command and message
         parts = cmd_remainder.split(maxsplit=1)
         command = parts[0]
         assistant_message = parts[1] if len(parts) > 1 else ""
-        
+
         assistant = _assistant_registry.get(command)
         if assistant:
             # Build session context
@@ -670,21 +1059,29 @@ async def main(message: cl.Message):
                 "file_name": cl.user_session.get("file_name"),
                 "index": cl.user_session.get("index"),
             }
-            
+
             # Call assistant handler
-            response = await assistant.handle_message(assistant_message, context)
-            await cl.Message(content=response).send()
+            with track_request("assistant"):
+                response = await assistant.handle_message(assistant_message, context)
+                await cl.Message(content=response).send()
             return
 
+    profile_requests = _parse_profile_command(user_content)
+    if profile_requests is not None:
+        await _respond_to_profile_command(profile_requests)
+        return
+
     # Handle shared commands (search, chart) - these work regardless of assistant
     raw_search_query = _extract_search_query(user_content or "")
     if raw_search_query is not None:
-        await _respond_with_web_search(raw_search_query)
+        with track_request("search"):
+            await _respond_with_web_search(raw_search_query)
         return
 
     chart_sample_size = _parse_chart_request(user_content or "")
     if chart_sample_size is not None:
-        await _respond_with_demo_chart(chart_sample_size)
+        with track_request("chart"):
+            await _respond_with_demo_chart(chart_sample_size)
         return
 
     # Check if active assistant is set and route to it
@@ -698,78 +1095,22 @@ async def main(message: cl.Message):
                 "file_name": cl.user_session.get("file_name"),
                 "index": cl.user_session.get("index"),
             }
-            
+
             # Call assistant handler
-            response = await assistant.handle_message(user_content, context)
-            await cl.Message(content=response).send()
+            with track_request("assistant"):
+                response = await assistant.handle_message(user_content, context)
+                await cl.Message(content=response).send()
             return
 
     # Handle document QA if index exists
-    index: VectorStoreIndex | None = cl.user_session.get("index")
+    index = await _get_session_index()
     if not index:
-        await _respond_with_general_chat(user_content)
+        with track_request("chat"):
+            await _respond_with_general_chat(user_content)
         return
 
-    # Get or create chat engine with memory
-    chat_engine_key = "chat_engine"
-    chat_engine = cl.user_session.get(chat_engine_key)
-    if chat_engine is None:
-        memory = ChatMemoryBuffer.from_defaults(token_limit=3000)
-        chat_engine = index.as_chat_engine(
-            llm=llm,
-            memory=memory,
-            similarity_top_k=3,
-            streaming=True,
-        )
-        cl.user_session.set(chat_engine_key, chat_engine)
-
-    # Stream the response
-    response = cl.Message(content="")
-    await response.send()
-    
-    full_response = ""
-    text_elements: list[cl.Text] = []
-    token_count = 0
-    
-    async for token in chat_engine.astream_chat(user_content):
-        if token.delta:
-            full_response += token.delta
-            token_count += 1
-        
-        # Extract source nodes if available
-        if hasattr(token, "source_nodes") and token.source_nodes:
-            for source_idx, node in enumerate(token.source_nodes):
-                source_name = f"source_{source_idx}"
-                if not any(el.name == source_name for el in text_elements):
-                    text_elements.append(
-                        cl.Text(
-                            content=node.text,
-                            name=source_name,
-                            display="side",
-                        )
-                    )
-        
-        # Throttle updates: update every 5 tokens to avoid "Too many packets" error
-        # Also update on first token to show immediate feedback
-        update_interval = 5
-        if token_count == 1 or token_count % update_interval == 0:
-            response.content = full_response
-            await response.update()
-            # Small delay to prevent overwhelming the WebSocket
-            await asyncio.sleep(0.01)
-    
-    # Final update to ensure complete response is shown
-    # (in case the last update didn't happen due to throttling)
-    response.content = full_response
-    
-    # Update response with source elements
-    if text_elements:
-        source_names = [text_el.name for text_el in text_elements]
-        full_response += f"\nSources: {', '.join(source_names)}"
-        response.content = full_response
-        response.elements = text_elements
-    
-    await response.update()
+    with track_request("document_qa"):
+        await _respond_with_document_qa(index, user_content)
 
 
 @cl.on_audio_chunk
@@ -781,9 +1122,12 @@ async def on_audio_chunk(audio_chunk):
     Currently a placeholder that acknowledges audio input.
     """
     import logging
+
     logger = logging.getLogger(__name__)
-    logger.info(f"Audio chunk received: isStart={getattr(audio_chunk, 'isStart', None)}, isEnd={getattr(audio_chunk, 'isEnd', None)}")
-    
+    logger.info(
+        f"Audio chunk received: isStart={getattr(audio_chunk, 'isStart', None)}, isEnd={getattr(audio_chunk, 'isEnd', None)}"
+    )
+
     if hasattr(audio_chunk, "isStart") and audio_chunk.isStart:
         await cl.Message(content="🎤 Listening...").send()
     elif hasattr(audio_chunk, "isEnd") and audio_chunk.isEnd:
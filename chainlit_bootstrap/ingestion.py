@@ -0,0 +1,303 @@
+"""Document ingestion pipeline for session vector indexes."""
+
+import asyncio
+import codecs
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections.abc import Iterator
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+import chromadb
+from llama_index.core import Document, VectorStoreIndex
+from llama_index.core.schema import (
+    BaseNode,
+    MetadataMode,
+    NodeRelationship,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.vector_stores.chroma import ChromaVectorStore
+
+from .llm import embeddings, text_splitter
+from .retrieval import BM25Index
+from .vector_store import COMPACT_DTYPES, SESSION_VECTOR_STORE, CompactVectorStore
+
+logger = logging.getLogger(__name__)
+
+# Number of chunks sent to the embeddings endpoint in a single request
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+
+# Maximum number of embedding requests in flight across all files being ingested
+MAX_CONCURRENT_EMBED_REQUESTS = int(os.getenv("MAX_CONCURRENT_EMBED_REQUESTS", "4"))
+
+# Files larger than this are ingested in streaming mode with bounded memory
+STREAMING_INGEST_THRESHOLD_BYTES = int(
+    os.getenv("STREAMING_INGEST_THRESHOLD_BYTES", str(1024 * 1024))
+)
+
+# Size of each raw block read from disk in streaming mode
+INGEST_BLOCK_SIZE = int(os.getenv("INGEST_BLOCK_SIZE", str(256 * 1024)))
+
+
+class EmptyDocumentError(ValueError):
+    """Raised when an uploaded document has no text content."""
+
+
+@dataclass
+class IngestionResult:
+    """Outcome of ingesting a single file into a session index."""
+
+    file_name: str
+    chunks: int
+    bytes_read: int
+    seconds: float
+    content_hash: str = ""
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else float(self.chunks)
+
+    @property
+    def kib_per_second(self) -> float:
+        kib = self.bytes_read / 1024
+        return kib / self.seconds if self.seconds > 0 else kib
+
+    def summary(self) -> str:
+        """Return a one-line human-readable throughput summary."""
+        return (
+            f"{self.chunks} chunks from {self.bytes_read / 1024:.1f} KiB "
+            f"in {self.seconds:.2f}s "
+            f"({self.chunks_per_second:.1f} chunks/s, {self.kib_per_second:.1f} KiB/s)"
+        )
+
+
+def create_session_index() -> VectorStoreIndex:
+    """
+    Create an empty vector index for a chat session.
+
+    By default the index is backed by a fresh in-memory Chroma collection. Setting
+    ``SESSION_VECTOR_STORE`` to ``float16`` or ``int8`` uses a compact NumPy store
+    instead, trading a little precision for much less memory per session.
+    """
+    if SESSION_VECTOR_STORE in COMPACT_DTYPES:
+        return VectorStoreIndex.from_vector_store(
+            CompactVectorStore(dtype=SESSION_VECTOR_STORE), embed_model=embeddings
+        )
+
+    chroma_client = chromadb.Client()
+    collection_name = f"session_{uuid.uuid4().hex[:8]}"
+    chroma_collection = chroma_client.get_or_create_collection(name=collection_name)
+    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    return VectorStoreIndex.from_vector_store(vector_store, embed_model=embeddings)
+
+
+def _hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(INGEST_BLOCK_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_and_split(file_path: str, file_name: str) -> tuple[list[BaseNode], int]:
+    """
+    Read a UTF-8 text file and split it into nodes.
+
+    Returns:
+        Tuple of (nodes, bytes_read)
+
+    Raises:
+        EmptyDocumentError: If the file has no text content
+        UnicodeDecodeError: If the file is not valid UTF-8 text
+    """
+    with open(file_path, encoding="utf-8") as f:
+        text = f.read()
+    if not text.strip():
+        raise EmptyDocumentError(f"File `{file_name}` is empty.")
+
+    document = Document(text=text, metadata={"source": file_name})
+    nodes = text_splitter.get_nodes_from_documents([document])
+    return nodes, Path(file_path).stat().st_size
+
+
+def iter_text_blocks(
+    file_path: str, block_size: int = INGEST_BLOCK_SIZE
+) -> Iterator[str]:
+    """
+    Yield decoded UTF-8 text from a file in blocks of at most ``block_size`` bytes.
+
+    Multi-byte characters split across block boundaries are handled by an
+    incremental decoder, so no block ever needs the whole file in memory.
+
+    Raises:
+        UnicodeDecodeError: If the file is not valid UTF-8 text
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(file_path, "rb") as f:
+        while raw := f.read(block_size):
+            text = decoder.decode(raw)
+            if text:
+                yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_text_nodes(
+    file_path: str, file_name: str, block_size: int = INGEST_BLOCK_SIZE
+) -> Iterator[TextNode]:
+    """
+    Lazily split a text file into nodes, one block at a time.
+
+    Each block is appended to the last, still-open chunk of the previous block and
+    re-split; every chunk except the trailing one is final and yielded right away.
+    Peak memory is therefore bounded by one block plus one chunk, while chunk
+    sizes and overlap stay the same as when splitting the whole text at once.
+    """
+    source = RelatedNodeInfo(node_id=str(uuid.uuid4()))
+    metadata = {"source": file_name}
+    carry = ""
+    for block in iter_text_blocks(file_path, block_size):
+        chunks = text_splitter.split_text(carry + block)
+        if not chunks:
+            carry = ""
+            continue
+        carry = chunks.pop()
+        for chunk in chunks:
+            yield TextNode(
+                text=chunk,
+                metadata=dict(metadata),
+                relationships={NodeRelationship.SOURCE: source},
+            )
+    if carry.strip():
+        yield TextNode(
+            text=carry,
+            metadata=dict(metadata),
+            relationships={NodeRelationship.SOURCE: source},
+        )
+
+
+def _take(nodes: Iterator[TextNode], count: int) -> list[TextNode]:
+    return list(islice(nodes, count))
+
+
+class IngestionPipeline:
+    """
+    Ingest any number of files concurrently into one session index.
+
+    Reading and splitting run in worker threads, embeddings are requested in
+    batches of ``EMBED_BATCH_SIZE`` with a shared cap on in-flight requests, and
+    nodes are inserted into the index as soon as each file's embeddings are ready.
+    When a lexical index is given, inserted nodes are added to it as well.
+    """
+
+    def __init__(
+        self, index: VectorStoreIndex, lexical_index: BM25Index | None = None
+    ) -> None:
+        self.index = index
+        self.lexical_index = lexical_index
+        self._embed_semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMBED_REQUESTS)
+        self._insert_lock = asyncio.Lock()
+
+    async def _embed_batch(self, nodes: list[BaseNode]) -> None:
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        async with self._embed_semaphore:
+            vectors = await embeddings.aget_text_embedding_batch(texts)
+        for node, vector in zip(nodes, vectors, strict=True):
+            node.embedding = vector
+
+    async def embed_nodes(self, nodes: list[BaseNode]) -> None:
+        """Embed nodes in place using batched, concurrency-limited requests."""
+        batches = [
+            nodes[start : start + EMBED_BATCH_SIZE]
+            for start in range(0, len(nodes), EMBED_BATCH_SIZE)
+        ]
+        await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+
+    async def insert_nodes(self, nodes: list[BaseNode]) -> None:
+        """Insert pre-embedded nodes into the shared index."""
+        if not nodes:
+            return
+        async with self._insert_lock:
+            await asyncio.to_thread(self.index.insert_nodes, nodes)
+            if self.lexical_index is not None:
+                await asyncio.to_thread(self.lexical_index.add_nodes, nodes)
+
+    async def _embed_and_insert(self, nodes: list[BaseNode]) -> None:
+        await self.embed_nodes(nodes)
+        await self.insert_nodes(nodes)
+
+    async def ingest_file_streaming(
+        self, file_path: str, file_name: str
+    ) -> IngestionResult:
+        """
+        Ingest a file of any size with bounded memory.
+
+        Splitting runs in a worker thread one embedding batch at a time, and each
+        batch is embedded and inserted while the next one is being split. At most
+        ``MAX_CONCURRENT_EMBED_REQUESTS`` batches are held in memory at once.
+        """
+        started = time.perf_counter()
+        nodes = iter_text_nodes(file_path, file_name)
+        pending: set[asyncio.Task] = set()
+        chunks = 0
+        try:
+            while batch := await asyncio.to_thread(_take, nodes, EMBED_BATCH_SIZE):
+                chunks += len(batch)
+                if len(pending) >= MAX_CONCURRENT_EMBED_REQUESTS:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                pending.add(asyncio.create_task(self._embed_and_insert(batch)))
+            await asyncio.gather(*pending)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+        if chunks == 0:
+            raise EmptyDocumentError(f"File `{file_name}` is empty.")
+
+        result = IngestionResult(
+            file_name=file_name,
+            chunks=chunks,
+            bytes_read=Path(file_path).stat().st_size,
+            seconds=time.perf_counter() - started,
+            content_hash=await asyncio.to_thread(_hash_file, file_path),
+        )
+        logger.info(f"Ingested {file_name} (streaming): {result.summary()}")
+        return result
+
+    async def ingest_file(self, file_path: str, file_name: str) -> IngestionResult:
+        """
+        Read, split, embed and insert a single file.
+
+        Files above ``STREAMING_INGEST_THRESHOLD_BYTES`` are handed to
+        :meth:`ingest_file_streaming`.
+        """
+        if Path(file_path).stat().st_size > STREAMING_INGEST_THRESHOLD_BYTES:
+            return await self.ingest_file_streaming(file_path, file_name)
+
+        started = time.perf_counter()
+        nodes, bytes_read = await asyncio.to_thread(
+            _read_and_split, file_path, file_name
+        )
+        await self.embed_nodes(nodes)
+        await self.insert_nodes(nodes)
+        result = IngestionResult(
+            file_name=file_name,
+            chunks=len(nodes),
+            bytes_read=bytes_read,
+            seconds=time.perf_counter() - started,
+            content_hash=await asyncio.to_thread(_hash_file, file_path),
+        )
+        logger.info(f"Ingested {file_name}: {result.summary()}")
+        return result
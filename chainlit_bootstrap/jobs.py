@@ -0,0 +1,660 @@
+"""Durable SQLite-backed job queue for audio processing.
+
+Each uploaded audio file becomes a job that moves through two stages,
+``transcribe`` (Whisper, via :func:`transcribe_audio`) and ``parse``
+(:func:`parse_atc_conversation`). A small pool of asyncio workers claims jobs
+with a renewable lease, so jobs interrupted by a restart (or a crashed worker
+process sharing the database) are picked up again once their lease expires.
+Failed stages are retried with jittered exponential backoff.
+
+Chat handlers follow a job with :meth:`AudioJobQueue.watch`, which yields a new
+snapshot whenever the job's status, stage or attempt count changes.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import random
+import shutil
+import sqlite3
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .audio import transcribe_audio
+from .audio_archive import schedule_archive
+from .completion_cache import bypass_completion_cache
+from .governor import BATCH, governor_context
+from .metrics import track_request
+from .tracing import collect_spans, span
+
+logger = logging.getLogger(__name__)
+
+_audio_job_dir_str = os.getenv("AUDIO_JOB_DIR", "./.local/data/jobs/")
+AUDIO_JOB_DIR = Path(_audio_job_dir_str).resolve()
+
+# Concurrent audio jobs per server process
+AUDIO_JOB_WORKERS = int(os.getenv("AUDIO_JOB_WORKERS", "2"))
+
+# Attempts per stage before the job fails (or, for parsing, completes unparsed)
+AUDIO_JOB_MAX_ATTEMPTS = int(os.getenv("AUDIO_JOB_MAX_ATTEMPTS", "3"))
+
+# First retry delay in seconds; doubles with each further attempt
+AUDIO_JOB_RETRY_BASE_SECONDS = float(os.getenv("AUDIO_JOB_RETRY_BASE_SECONDS", "2"))
+
+# Seconds a claimed job stays leased without a heartbeat before it is reclaimed
+AUDIO_JOB_LEASE_SECONDS = float(os.getenv("AUDIO_JOB_LEASE_SECONDS", "60"))
+
+# Upper bound on how long idle workers and watchers wait before re-checking the
+# database (jobs can be enqueued or advanced by other server processes)
+AUDIO_JOB_POLL_SECONDS = float(os.getenv("AUDIO_JOB_POLL_SECONDS", "1"))
+
+# Finished jobs older than this are removed when the queue starts
+_FINISHED_JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+STAGE_TRANSCRIBE = "transcribe"
+STAGE_PARSE = "parse"
+STAGE_DONE = "done"
+
+
+def _parse_transcription(transcription: str) -> list[dict[str, str]]:
+    # Imported here (in the worker thread) so llama-index loads on first use
+    from .atc_parser import parse_atc_conversation
+
+    return parse_atc_conversation(transcription)
+
+
+@dataclass
+class AudioJob:
+    """Snapshot of one audio job row."""
+
+    id: str
+    thread_id: str | None
+    user_id: str | None
+    file_name: str
+    input_path: str
+    status: str
+    stage: str
+    attempts: int
+    error: str | None
+    result: dict[str, Any] | None
+    created_at: float
+    updated_at: float
+    lease_token: str | None = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "AudioJob":
+        return cls(
+            id=row["id"],
+            thread_id=row["thread_id"],
+            user_id=row["user_id"],
+            file_name=row["file_name"],
+            input_path=row["input_path"],
+            status=row["status"],
+            stage=row["stage"],
+            attempts=row["attempts"],
+            error=row["error"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+            lease_token=row["lease_token"],
+        )
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+@dataclass
+class QueueStats:
+    """Queue depth and age metrics."""
+
+    queued: int
+    running: int
+    succeeded: int
+    failed: int
+    oldest_pending_age_seconds: float
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting for or currently occupying a worker."""
+        return self.queued + self.running
+
+
+class AudioJobQueue:
+    """SQLite-backed audio job queue with an in-process asyncio worker pool."""
+
+    def __init__(
+        self,
+        directory: Path = AUDIO_JOB_DIR,
+        workers: int = AUDIO_JOB_WORKERS,
+        max_attempts: int = AUDIO_JOB_MAX_ATTEMPTS,
+        retry_base_seconds: float = AUDIO_JOB_RETRY_BASE_SECONDS,
+        lease_seconds: float = AUDIO_JOB_LEASE_SECONDS,
+        poll_seconds: float = AUDIO_JOB_POLL_SECONDS,
+    ) -> None:
+        self.db_path = directory / "jobs.db"
+        self.inputs_dir = directory / "inputs"
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self._worker_tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._listeners: dict[str, set[asyncio.Event]] = {}
+
+        self.inputs_dir.mkdir(parents=True, exist_ok=True)
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS audio_jobs (
+                    id TEXT PRIMARY KEY,
+                    thread_id TEXT,
+                    user_id TEXT,
+                    file_name TEXT NOT NULL,
+                    input_path TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    lease_until REAL,
+                    lease_token TEXT,
+                    delivered INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_audio_jobs_status "
+                "ON audio_jobs (status, available_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_audio_jobs_thread ON audio_jobs (thread_id)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode; multi-statement updates use explicit BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # -- Database operations (blocking; run in a worker thread) ---------------
+
+    def _insert(
+        self,
+        job_id: str,
+        thread_id: str | None,
+        user_id: str | None,
+        file_name: str,
+        input_path: str,
+    ) -> None:
+        now = time.time()
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute(
+                """
+                INSERT INTO audio_jobs (id, thread_id, user_id, file_name, input_path,
+                                        status, stage, created_at, updated_at, available_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job_id,
+                    thread_id,
+                    user_id,
+                    file_name,
+                    input_path,
+                    QUEUED,
+                    STAGE_TRANSCRIBE,
+                    now,
+                    now,
+                    now,
+                ),
+            )
+
+    def _get(self, job_id: str) -> AudioJob | None:
+        with contextlib.closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM audio_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return AudioJob.from_row(row) if row else None
+
+    def _claim(self) -> AudioJob | None:
+        """Lease the oldest runnable job, including jobs whose lease has expired."""
+        now = time.time()
+        with contextlib.closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = conn.execute(
+                        """
+                        SELECT * FROM audio_jobs
+                        WHERE (status = ? AND available_at <= ?)
+                           OR (status = ? AND lease_until < ?)
+                        ORDER BY available_at
+                        LIMIT 1
+                        """,
+                        (QUEUED, now, RUNNING, now),
+                    ).fetchone()
+                    if row is None:
+                        conn.execute("COMMIT")
+                        return None
+                    if row["status"] != RUNNING:
+                        break
+                    # A job that keeps taking its worker down (e.g. out of memory
+                    # on a huge upload) must not be retried on every restart
+                    if row["attempts"] >= self.max_attempts:
+                        self._expire(conn, row)
+                        continue
+                    logger.warning(
+                        f"Reclaiming audio job {row['id']} ({row['stage']}) after its lease expired"
+                    )
+                    break
+                # The token identifies this lease; a worker that lost it can't
+                # overwrite the job once someone else has reclaimed it
+                conn.execute(
+                    """
+                    UPDATE audio_jobs
+                    SET status = ?, attempts = attempts + 1, lease_until = ?, lease_token = ?,
+                        updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (
+                        RUNNING,
+                        now + self.lease_seconds,
+                        uuid.uuid4().hex,
+                        now,
+                        row["id"],
+                    ),
+                )
+                row = conn.execute(
+                    "SELECT * FROM audio_jobs WHERE id = ?", (row["id"],)
+                ).fetchone()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return AudioJob.from_row(row)
+
+    def _expire(self, conn: sqlite3.Connection, row: sqlite3.Row) -> None:
+        """Finish a job whose lease expired on its last attempt (inside ``_claim``)."""
+        message = (
+            f"Lease expired on attempt {row['attempts']}; the worker probably crashed"
+        )
+        now = time.time()
+        if row["stage"] == STAGE_PARSE:
+            logger.error(f"Audio job {row['id']} could not be parsed: {message}")
+            result = json.loads(row["result"]) if row["result"] else {}
+            result["parsing_error"] = message
+            conn.execute(
+                "UPDATE audio_jobs SET status = ?, stage = ?, error = ?, result = ?, "
+                "updated_at = ? WHERE id = ?",
+                (SUCCEEDED, STAGE_DONE, message, json.dumps(result), now, row["id"]),
+            )
+            return
+        logger.error(
+            f"Audio job {row['id']} failed after {row['attempts']} attempts: {message}"
+        )
+        conn.execute(
+            "UPDATE audio_jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (FAILED, message, now, row["id"]),
+        )
+        Path(row["input_path"]).unlink(missing_ok=True)
+
+    def _update(
+        self, job_id: str, lease_token: str | None = None, **fields: Any
+    ) -> bool:
+        """Update a job; with ``lease_token``, only while that lease is still held."""
+        fields["updated_at"] = time.time()
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        condition, params = "id = ?", [job_id]
+        if lease_token is not None:
+            condition += " AND lease_token = ?"
+            params.append(lease_token)
+        with contextlib.closing(self._connect()) as conn:
+            cursor = conn.execute(
+                f"UPDATE audio_jobs SET {assignments} WHERE {condition}",
+                (*fields.values(), *params),
+            )
+            return cursor.rowcount == 1
+
+    def _renew_lease(self, job: AudioJob) -> bool:
+        with contextlib.closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE audio_jobs SET lease_until = ? "
+                "WHERE id = ? AND status = ? AND lease_token = ?",
+                (time.time() + self.lease_seconds, job.id, RUNNING, job.lease_token),
+            )
+            return cursor.rowcount == 1
+
+    def _claim_delivery(self, job_id: str) -> bool:
+        with contextlib.closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE audio_jobs SET delivered = 1 WHERE id = ? AND delivered = 0",
+                (job_id,),
+            )
+            return cursor.rowcount == 1
+
+    def _undelivered(self, thread_id: str) -> list[AudioJob]:
+        with contextlib.closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM audio_jobs WHERE thread_id = ? AND delivered = 0 ORDER BY created_at",
+                (thread_id,),
+            ).fetchall()
+        return [AudioJob.from_row(row) for row in rows]
+
+    def _purge_finished(self) -> int:
+        cutoff = time.time() - _FINISHED_JOB_RETENTION_SECONDS
+        with contextlib.closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "DELETE FROM audio_jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (*TERMINAL_STATUSES, cutoff),
+            )
+            return cursor.rowcount
+
+    def _stats(self) -> QueueStats:
+        counts = dict.fromkeys((QUEUED, RUNNING, SUCCEEDED, FAILED), 0)
+        with contextlib.closing(self._connect()) as conn:
+            for row in conn.execute(
+                "SELECT status, COUNT(*) FROM audio_jobs GROUP BY status"
+            ):
+                counts[row[0]] = row[1]
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM audio_jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchone()[0]
+        return QueueStats(
+            queued=counts[QUEUED],
+            running=counts[RUNNING],
+            succeeded=counts[SUCCEEDED],
+            failed=counts[FAILED],
+            oldest_pending_age_seconds=time.time() - oldest if oldest else 0.0,
+        )
+
+    # -- Public API ------------------------------------------------------------
+
+    async def enqueue(
+        self,
+        file_path: str,
+        file_name: str,
+        thread_id: str | None,
+        user_id: str | None = None,
+    ) -> str:
+        """
+        Queue an uploaded audio file for transcription and parsing.
+
+        The upload is copied into the queue's own directory first, since Chainlit
+        removes session files when the session ends. ``user_id`` is used for fair
+        scheduling of the job's upstream calls.
+
+        Returns:
+            The new job id
+        """
+        job_id = uuid.uuid4().hex
+        input_path = self.inputs_dir / f"{job_id}{Path(file_name).suffix}"
+        await asyncio.to_thread(shutil.copyfile, file_path, input_path)
+        await asyncio.to_thread(
+            self._insert, job_id, thread_id, user_id, file_name, str(input_path)
+        )
+        logger.info(f"Queued audio job {job_id} for {file_name}")
+        await self.start()
+        self._notify(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> AudioJob | None:
+        return await asyncio.to_thread(self._get, job_id)
+
+    async def claim_delivery(self, job_id: str) -> bool:
+        """Return True exactly once per job, for whichever watcher shows its result."""
+        return await asyncio.to_thread(self._claim_delivery, job_id)
+
+    async def undelivered(self, thread_id: str) -> list[AudioJob]:
+        """Jobs of a thread whose result has not been shown in the chat yet."""
+        return await asyncio.to_thread(self._undelivered, thread_id)
+
+    async def stats(self) -> QueueStats:
+        return await asyncio.to_thread(self._stats)
+
+    async def watch(self, job_id: str) -> AsyncIterator[AudioJob]:
+        """Yield job snapshots as the job progresses, ending once it has finished."""
+        event = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(event)
+        try:
+            last_seen = None
+            while True:
+                event.clear()
+                job = await self.get(job_id)
+                if job is None:
+                    return
+                seen = (job.status, job.stage, job.attempts)
+                if seen != last_seen:
+                    last_seen = seen
+                    yield job
+                if job.is_finished:
+                    return
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(self.poll_seconds):
+                        await event.wait()
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(event)
+                if not listeners:
+                    del self._listeners[job_id]
+
+    def _notify(self, job_id: str) -> None:
+        for event in self._listeners.get(job_id, ()):
+            event.set()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self) -> None:
+        """Start the worker pool in the running event loop (idempotent)."""
+        if self._worker_tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(worker_id))
+            for worker_id in range(self.workers)
+        ]
+        purged = await asyncio.to_thread(self._purge_finished)
+        stats = await self.stats()
+        logger.info(
+            f"Audio job queue started with {self.workers} workers "
+            f"(depth={stats.depth}, purged {purged} finished jobs)"
+        )
+
+    async def stop(self) -> None:
+        """Cancel the workers. Jobs they were running resume when their lease expires."""
+        tasks, self._worker_tasks = self._worker_tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # -- Workers ---------------------------------------------------------------
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            # Cleared before claiming so an enqueue during the claim is not missed
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Audio job worker {worker_id} failed to claim a job: {e}")
+                job = None
+            if job is None:
+                # asyncio.timeout, unlike wait_for, never swallows a cancellation
+                # that races with the event being set
+                with contextlib.suppress(TimeoutError):
+                    async with asyncio.timeout(self.poll_seconds):
+                        await self._wakeup.wait()
+                continue
+            self._notify(job.id)
+            try:
+                await self._run(job)
+            except Exception as e:
+                # e.g. the database was locked while recording the outcome; the
+                # lease expires and the job is reclaimed
+                logger.error(
+                    f"Audio job worker {worker_id} failed while running job {job.id}: {e}",
+                    exc_info=True,
+                )
+            self._notify(job.id)
+
+    async def _heartbeat(self, job: AudioJob) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await asyncio.to_thread(self._renew_lease, job)
+            except Exception as e:
+                # A missed renewal is harmless as long as a later one succeeds
+                logger.warning(f"Failed to renew the lease of audio job {job.id}: {e}")
+                continue
+            if not renewed:
+                logger.warning(
+                    f"Audio job {job.id} lost its lease; its result will be discarded"
+                )
+                return
+
+    async def _run(self, job: AudioJob) -> None:
+        logger.info(
+            f"Running audio job {job.id} stage {job.stage} (attempt {job.attempts})"
+        )
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            # Upstream calls made by batch stages queue behind interactive chat
+            # Stage spans share the job id as trace id; their summaries travel
+            # with the result so the chat can show them on delivery
+            with (
+                governor_context(job.user_id or job.thread_id, BATCH),
+                track_request(f"audio_{job.stage}"),
+                collect_spans() as spans,
+                span(
+                    f"audio_job.{job.stage}",
+                    trace_id=job.id,
+                    job_id=job.id,
+                    attempt=job.attempts,
+                ),
+            ):
+                if job.stage == STAGE_TRANSCRIBE:
+                    result = await asyncio.to_thread(
+                        transcribe_audio, job.input_path, job.file_name
+                    )
+                else:
+                    result = dict(job.result or {})
+                    # A retry must not replay the cached completion that just failed
+                    cache_scope = (
+                        bypass_completion_cache()
+                        if job.attempts > 1
+                        else contextlib.nullcontext()
+                    )
+                    with cache_scope:
+                        result["parsed_conversation"] = await asyncio.to_thread(
+                            _parse_transcription, result["transcription"]
+                        )
+            if spans:
+                result["trace"] = result.get("trace", []) + spans
+
+            if job.stage == STAGE_TRANSCRIBE:
+                updated = await asyncio.to_thread(
+                    self._update,
+                    job.id,
+                    job.lease_token,
+                    status=QUEUED,
+                    stage=STAGE_PARSE,
+                    attempts=0,
+                    error=None,
+                    result=result,
+                    available_at=time.time(),
+                )
+                if updated:
+                    Path(job.input_path).unlink(missing_ok=True)
+                    schedule_archive(result["audio_path"])
+            else:
+                updated = await asyncio.to_thread(
+                    self._update,
+                    job.id,
+                    job.lease_token,
+                    status=SUCCEEDED,
+                    stage=STAGE_DONE,
+                    error=None,
+                    result=result,
+                )
+            if not updated:
+                logger.warning(
+                    f"Discarding the {job.stage} result of audio job {job.id}: "
+                    f"its lease was taken over"
+                )
+        except Exception as e:
+            await asyncio.to_thread(self._handle_failure, job, e)
+        finally:
+            heartbeat.cancel()
+
+    def _handle_failure(self, job: AudioJob, error: Exception) -> None:
+        message = f"{type(error).__name__}: {error}"
+        if job.attempts < self.max_attempts:
+            delay = (
+                self.retry_base_seconds
+                * 2 ** (job.attempts - 1)
+                * random.uniform(0.5, 1.5)
+            )
+            logger.warning(
+                f"Audio job {job.id} stage {job.stage} failed (attempt {job.attempts}), "
+                f"retrying in {delay:.1f}s: {message}"
+            )
+            self._update(
+                job.id,
+                job.lease_token,
+                status=QUEUED,
+                error=message,
+                available_at=time.time() + delay,
+            )
+            return
+
+        if job.stage == STAGE_PARSE:
+            # The transcript is still useful without a parsed conversation
+            logger.error(f"Audio job {job.id} could not be parsed: {message}")
+            result = dict(job.result or {})
+            result["parsing_error"] = str(error)
+            self._update(
+                job.id,
+                job.lease_token,
+                status=SUCCEEDED,
+                stage=STAGE_DONE,
+                error=message,
+                result=result,
+            )
+            return
+
+        logger.error(
+            f"Audio job {job.id} failed after {job.attempts} attempts: {message}"
+        )
+        if self._update(job.id, job.lease_token, status=FAILED, error=message):
+            Path(job.input_path).unlink(missing_ok=True)
+
+
+_audio_jobs: AudioJobQueue | None = None
+
+
+def get_audio_jobs() -> AudioJobQueue:
+    """The process's audio job queue; its directory and database are created on first use."""
+    global _audio_jobs
+    if _audio_jobs is None:
+        _audio_jobs = AudioJobQueue()
+    return _audio_jobs
@@ -1,11 +1,19 @@
 """LLM and embeddings configuration."""
 
 import os
+import re
+from collections.abc import AsyncGenerator, Generator, Sequence
+from typing import Any
 
+from llama_index.core.base.llms.types import ChatMessage, ChatResponse
 from llama_index.core.node_parser import SentenceSplitter
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 
+from .completion_cache import cache_active, completion_cache, completion_key
+from .metrics import LLM_TOKENS
+from .resilience import upstream_http_clients
+
 # Currently only OpenAI is supported
 DEFAULT_GAI_MODEL = os.getenv("DEFAULT_GAI_MODEL", "gpt-4o-mini")
 
@@ -13,11 +21,158 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-llm = OpenAI(
+# OpenAI-compatible endpoint, e.g. the local stand-in (scripts/fake_openai_server.py).
+# The OpenAI SDK reads OPENAI_BASE_URL itself; LlamaIndex needs it passed explicitly
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Requests go through the rate governor (see governor.py) and the resilience layer
+# (see resilience.py), which owns retries; the SDK's own retries are disabled
+_llm_http_client, _llm_async_http_client = upstream_http_clients("llm")
+_embed_http_client, _embed_async_http_client = upstream_http_clients("embeddings")
+
+# Chunks used when replaying a cached response to a streaming caller
+_REPLAY_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+class CachedOpenAI(OpenAI):
+    """
+    OpenAI LLM that serves deterministic requests from the completion cache.
+
+    All public chat and completion methods (sync, async, streaming) go through the
+    private chat methods overridden here, so one cache covers them all. Streaming
+    callers get cached responses replayed as a stream of word-sized deltas. Token
+    usage of upstream responses is counted in the metrics.
+    """
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedOpenAI"
+
+    def _cache_key(
+        self, messages: Sequence[ChatMessage], kwargs: dict[str, Any]
+    ) -> str | None:
+        if self.temperature != 0 or kwargs.get("tools") or not cache_active():
+            return None
+        return completion_key(
+            "chat",
+            self._get_model_kwargs(**kwargs),
+            [message.model_dump(mode="json") for message in messages],
+        )
+
+    @staticmethod
+    def _dump(response: ChatResponse) -> dict[str, Any]:
+        return {
+            "message": response.message.model_dump(mode="json"),
+            "additional_kwargs": response.additional_kwargs,
+        }
+
+    @staticmethod
+    def _load(cached: dict[str, Any]) -> ChatResponse:
+        return ChatResponse(
+            message=ChatMessage.model_validate(cached["message"]),
+            additional_kwargs=cached["additional_kwargs"],
+        )
+
+    def _record_usage(self, response: ChatResponse) -> None:
+        # Token counts the upstream reported; streamed responses usually carry none
+        for kind in ("prompt", "completion"):
+            if count := response.additional_kwargs.get(f"{kind}_tokens"):
+                LLM_TOKENS.inc(count, model=self.model, kind=kind)
+
+    @staticmethod
+    def _replay(cached: dict[str, Any]) -> Generator[ChatResponse, None, None]:
+        message = ChatMessage.model_validate(cached["message"])
+        content = ""
+        for chunk in _REPLAY_CHUNK.findall(message.content or ""):
+            content += chunk
+            yield ChatResponse(
+                message=ChatMessage(role=message.role, content=content),
+                delta=chunk,
+            )
+
+    def _chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        key = self._cache_key(messages, kwargs)
+        if key is not None and (cached := completion_cache.get(key)) is not None:
+            return self._load(cached)
+        response = super()._chat(messages, **kwargs)
+        self._record_usage(response)
+        if key is not None:
+            completion_cache.put(key, self._dump(response))
+        return response
+
+    def _stream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> Generator[ChatResponse, None, None]:
+        key = self._cache_key(messages, kwargs)
+        if key is not None and (cached := completion_cache.get(key)) is not None:
+            return self._replay(cached)
+        stream = super()._stream_chat(messages, **kwargs)
+
+        def gen() -> Generator[ChatResponse, None, None]:
+            last = None
+            for last in stream:
+                yield last
+            if last is not None:
+                self._record_usage(last)
+                # Only streams read to the end are cached
+                if key is not None:
+                    completion_cache.put(key, self._dump(last))
+
+        return gen()
+
+    async def _achat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> ChatResponse:
+        key = self._cache_key(messages, kwargs)
+        if key is not None and (cached := await completion_cache.aget(key)) is not None:
+            return self._load(cached)
+        response = await super()._achat(messages, **kwargs)
+        self._record_usage(response)
+        if key is not None:
+            await completion_cache.aput(key, self._dump(response))
+        return response
+
+    async def _astream_chat(
+        self, messages: Sequence[ChatMessage], **kwargs: Any
+    ) -> AsyncGenerator[ChatResponse, None]:
+        key = self._cache_key(messages, kwargs)
+        if key is not None and (cached := await completion_cache.aget(key)) is not None:
+
+            async def replay() -> AsyncGenerator[ChatResponse, None]:
+                for response in self._replay(cached):
+                    yield response
+
+            return replay()
+        stream = await super()._astream_chat(messages, **kwargs)
+
+        async def gen() -> AsyncGenerator[ChatResponse, None]:
+            last = None
+            async for last in stream:
+                yield last
+            if last is not None:
+                self._record_usage(last)
+                if key is not None:
+                    await completion_cache.aput(key, self._dump(last))
+
+        return gen()
+
+
+# Responses at temperature 0 are cached (see completion_cache.py)
+llm = CachedOpenAI(
     model=DEFAULT_GAI_MODEL,
     temperature=0,
     api_key=OPENAI_API_KEY,
+    api_base=OPENAI_BASE_URL,
+    max_retries=0,
+    http_client=_llm_http_client,
+    async_http_client=_llm_async_http_client,
+)
+embeddings = OpenAIEmbedding(
+    api_key=OPENAI_API_KEY,
+    api_base=OPENAI_BASE_URL,
+    max_retries=0,
+    http_client=_embed_http_client,
+    async_http_client=_embed_async_http_client,
 )
-embeddings = OpenAIEmbedding(api_key=OPENAI_API_KEY)
 
 text_splitter = SentenceSplitter(chunk_size=1000, chunk_overlap=100)
@@ -0,0 +1,275 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms here are updated on the hot path (handlers, caches,
+upstream transports) and are safe to use from worker threads. Values that
+already live elsewhere (queue depth, governor waits, cache sizes) are read at
+scrape time by collectors registered with :func:`register_collector`; see
+``monitoring.py`` for those and for the ``/metrics`` route.
+"""
+
+import bisect
+import contextlib
+import math
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass, field
+
+# Seconds; covers cache hits through slow LLM and Whisper calls
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
+PREFIX = "app_"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[tuple[str, str]]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels)
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+@dataclass
+class MetricFamily:
+    """One metric with its samples, as produced by collectors at scrape time."""
+
+    name: str
+    type: str
+    help: str
+    samples: list[tuple[dict[str, str], float]] = field(default_factory=list)
+
+    def add(self, value: float, **labels: str) -> None:
+        self.samples.append((labels, value))
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.samples:
+            lines.append(
+                f"{self.name}{_format_labels(labels.items())} {_format_value(value)}"
+            )
+        return "\n".join(lines)
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> dict[tuple[str, ...], float]:
+        """Current value per label tuple."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> str:
+        family = MetricFamily(self.name, "counter", self.help)
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                family.add(value, **dict(zip(self.labelnames, key, strict=True)))
+        return family.render()
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count above the last bucket], sum
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(
+                key, ([0] * (len(self.buckets) + 1), [0.0])
+            )
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            values = sorted(
+                (key, list(counts), total[0])
+                for key, (counts, total) in self._values.items()
+            )
+        for key, counts, total in values:
+            labels = list(zip(self.labelnames, key, strict=True))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts, strict=True):
+                cumulative += count
+                bucket_labels = _format_labels([*labels, ("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(
+                f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}"
+            )
+            lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines)
+
+
+_metrics: list[Counter | Histogram] = []
+_collectors: list[Callable[[], Iterable[MetricFamily]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]) -> None:
+    """Add a callable that returns metric families computed at scrape time."""
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text format (version 0.0.4)."""
+    parts = [metric.render() for metric in _metrics]
+    for collector in _collectors:
+        parts.extend(family.render() for family in collector())
+    return "\n".join(parts) + "\n"
+
+
+REQUESTS = Counter(
+    "requests_total",
+    "Chat messages handled, by handler path and outcome.",
+    ("path", "outcome"),
+)
+REQUEST_SECONDS = Histogram(
+    "request_duration_seconds",
+    "Time to handle a chat message, by handler path.",
+    ("path",),
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total",
+    "Cache lookups by cache and result (hit or miss).",
+    ("cache", "result"),
+)
+UPSTREAM_SECONDS = Histogram(
+    "upstream_request_seconds",
+    "Time to response headers for upstream HTTP attempts.",
+    ("upstream", "backend", "status"),
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM upstream, by kind.",
+    ("model", "kind"),
+)
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop woke a periodic timer.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+CHAT_START_SECONDS = Histogram(
+    "chat_start_seconds",
+    "Time to open a chat session (on_chat_start).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+GC_DELETED = Counter(
+    "gc_deleted_total",
+    "Entries removed by garbage collection, by store and reason.",
+    ("store", "reason"),
+)
+GC_RECLAIMED_BYTES = Counter(
+    "gc_reclaimed_bytes_total",
+    "Bytes reclaimed by garbage collection, by store and reason.",
+    ("store", "reason"),
+)
+GC_RUN_SECONDS = Histogram(
+    "gc_run_seconds",
+    "Duration of garbage collection runs.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0),
+)
+
+AUDIO_ARCHIVE_FILES = Counter(
+    "audio_archive_files_total",
+    "Persisted audio files transcoded for archival, by codec and outcome.",
+    ("codec", "outcome"),
+)
+AUDIO_ARCHIVE_BYTES = Counter(
+    "audio_archive_bytes_total",
+    "Bytes of archived originals and their archives, by codec and kind.",
+    ("codec", "kind"),
+)
+AUDIO_ARCHIVE_RATIO = Histogram(
+    "audio_archive_compression_ratio",
+    "Original size over archive size per transcoded file.",
+    ("codec",),
+    buckets=(1.0, 2.0, 4.0, 6.0, 8.0, 12.0, 16.0, 24.0, 32.0, 64.0),
+)
+AUDIO_ARCHIVE_CPU_SECONDS_PER_MINUTE = Histogram(
+    "audio_archive_cpu_seconds_per_audio_minute",
+    "Transcoder CPU time per minute of audio.",
+    ("codec",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+EVENT_LOOP_STALLS = Counter(
+    "event_loop_stalls_total",
+    "Times the event loop was blocked past the stall threshold.",
+)
+
+
+@contextlib.contextmanager
+def track_request(path: str) -> Iterator[None]:
+    """Count and time a handled chat message under ``path`` (e.g. ``chat``, ``audio``)."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, path=path)
+        REQUESTS.inc(path=path, outcome=outcome)
+
+
+@contextlib.contextmanager
+def track_chat_start() -> Iterator[None]:
+    """Time opening a chat session."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        CHAT_START_SECONDS.observe(time.perf_counter() - started)
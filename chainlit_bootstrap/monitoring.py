@@ -0,0 +1,281 @@
+"""Prometheus ``/metrics`` endpoint, scrape-time collectors and event-loop lag probe.
+
+The endpoint is added to Chainlit's FastAPI app on startup and reports, per
+worker process:
+
+- chat messages handled and their latency per handler path (``metrics.py``)
+- cache lookups and hit ratios: transcripts, ATC parses and other LLM completions,
+  and semantic document-QA answers
+- upstream attempt latency by status, LLM token usage, governor queueing and
+  resilience counters (retries, hedges, fallbacks, circuit state)
+- audio job queue depth, active websocket sessions and event-loop lag
+- chat session open latency, and the Chainlit database schema version and
+  migration cost
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import secrets
+import time
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse, Response
+
+from chainlit.server import app as chainlit_app
+from chainlit.session import ws_sessions_id
+
+from .completion_cache import completion_cache
+from .data_layer import schema_state
+from .governor import governor
+from .jobs import get_audio_jobs
+from .metrics import (
+    CACHE_LOOKUPS,
+    EVENT_LOOP_LAG_SECONDS,
+    MetricFamily,
+    register_collector,
+    render_metrics,
+)
+from .resilience import resilience_stats
+from .semantic_cache import answer_cache
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+
+# Seconds between event-loop lag probes
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(
+    os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "0.5")
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_CIRCUIT_STATES = ("closed", "open", "half_open")
+
+_lag_task: asyncio.Task | None = None
+_last_lag_seconds = 0.0
+_max_lag_seconds = 0.0
+
+
+def _cache_families() -> list[MetricFamily]:
+    ratio = MetricFamily(
+        "app_cache_hit_ratio",
+        "gauge",
+        "Share of lookups served from cache since start.",
+    )
+    lookups: dict[str, dict[str, float]] = {}
+    for (cache, result), count in CACHE_LOOKUPS.values().items():
+        lookups.setdefault(cache, {})[result] = count
+    answers = {"hit": answer_cache.hits, "miss": answer_cache.misses}
+    for cache, results in {**lookups, "semantic_answer": answers}.items():
+        total = results.get("hit", 0) + results.get("miss", 0)
+        ratio.add(results.get("hit", 0) / total if total else 0.0, cache=cache)
+
+    answer_lookups = MetricFamily(
+        "app_semantic_answer_cache_lookups_total",
+        "counter",
+        "Semantic answer cache lookups.",
+    )
+    for result, count in answers.items():
+        answer_lookups.add(count, result=result)
+    entries = MetricFamily(
+        "app_cache_entries", "gauge", "Entries held in memory per cache."
+    )
+    entries.add(len(answer_cache), cache="semantic_answer")
+
+    stats = completion_cache.stats()
+    entries.add(stats.memory_entries, cache="completion")
+    completion_bytes = MetricFamily(
+        "app_completion_cache_bytes", "gauge", "Bytes of cached completions per tier."
+    )
+    completion_bytes.add(stats.memory_bytes, tier="memory")
+    completion_bytes.add(stats.disk_bytes, tier="disk")
+    completion_hits = MetricFamily(
+        "app_completion_cache_hits_total", "counter", "Completion cache hits per tier."
+    )
+    completion_hits.add(stats.memory_hits, tier="memory")
+    completion_hits.add(stats.disk_hits, tier="disk")
+    evictions = MetricFamily(
+        "app_completion_cache_evictions_total", "counter", "Completion cache evictions."
+    )
+    evictions.add(stats.evictions)
+    return [
+        ratio,
+        answer_lookups,
+        entries,
+        completion_bytes,
+        completion_hits,
+        evictions,
+    ]
+
+
+def _upstream_families() -> list[MetricFamily]:
+    granted = MetricFamily(
+        "app_governor_granted_total",
+        "counter",
+        "Upstream requests admitted by the governor.",
+    )
+    waiting = MetricFamily(
+        "app_governor_waiting", "gauge", "Requests queued in the governor per upstream."
+    )
+    wait_p95 = MetricFamily(
+        "app_governor_wait_p95_seconds", "gauge", "p95 of recent governor queue waits."
+    )
+    for stats in governor.stats():
+        granted.add(stats.granted, upstream=stats.name)
+        waiting.add(stats.waiting, upstream=stats.name)
+        wait_p95.add(stats.wait_seconds_p95, upstream=stats.name)
+
+    counters = {
+        field: MetricFamily(f"app_upstream_{field}_total", "counter", help)
+        for field, help in (
+            ("attempts", "Upstream request attempts, including retries and fallbacks."),
+            ("retries", "Upstream retries."),
+            ("hedges", "Hedged duplicate requests sent."),
+            ("hedge_wins", "Hedged duplicates that answered first."),
+            ("fallbacks", "Attempts sent to the fallback backend."),
+            ("deadline_exceeded", "Calls that ran out of deadline."),
+        )
+    }
+    circuit = MetricFamily(
+        "app_upstream_circuit_state",
+        "gauge",
+        "1 for the current circuit breaker state.",
+    )
+    for stats in resilience_stats():
+        for field, family in counters.items():
+            family.add(getattr(stats, field), upstream=stats.name)
+        for state in _CIRCUIT_STATES:
+            circuit.add(
+                1 if stats.circuit_state == state else 0,
+                upstream=stats.name,
+                state=state,
+            )
+    return [granted, waiting, wait_p95, *counters.values(), circuit]
+
+
+def _runtime_families() -> list[MetricFamily]:
+    sessions = MetricFamily(
+        "app_active_sessions", "gauge", "Websocket sessions connected to this worker."
+    )
+    sessions.add(len(ws_sessions_id))
+    lag = MetricFamily(
+        "app_event_loop_lag_last_seconds", "gauge", "Most recent event-loop lag probe."
+    )
+    lag.add(_last_lag_seconds)
+    max_lag = MetricFamily(
+        "app_event_loop_lag_max_seconds",
+        "gauge",
+        "Largest event-loop lag seen since start.",
+    )
+    max_lag.add(_max_lag_seconds)
+    return [sessions, lag, max_lag]
+
+
+def _schema_families() -> list[MetricFamily]:
+    version = MetricFamily(
+        "app_data_layer_schema_version",
+        "gauge",
+        "Schema version of the Chainlit database.",
+    )
+    version.add(schema_state.version)
+    migration = MetricFamily(
+        "app_data_layer_schema_migration_seconds",
+        "gauge",
+        "Time spent migrating the Chainlit database at startup (0 if it was current).",
+    )
+    migration.add(schema_state.migration_seconds)
+    check = MetricFamily(
+        "app_data_layer_schema_check_seconds",
+        "gauge",
+        "Cost of one schema readiness check, paid once at startup.",
+    )
+    check.add(schema_state.check_seconds)
+    return [version, migration, check]
+
+
+async def _job_families() -> list[MetricFamily]:
+    stats = await get_audio_jobs().stats()
+    jobs = MetricFamily("app_audio_jobs", "gauge", "Audio jobs by status.")
+    for status in ("queued", "running", "succeeded", "failed"):
+        jobs.add(getattr(stats, status), status=status)
+    oldest = MetricFamily(
+        "app_audio_job_oldest_pending_seconds",
+        "gauge",
+        "Age of the oldest unfinished audio job.",
+    )
+    oldest.add(stats.oldest_pending_age_seconds)
+    return [jobs, oldest]
+
+
+register_collector(_cache_families)
+register_collector(_upstream_families)
+register_collector(_runtime_families)
+register_collector(_schema_families)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Serve all metrics in the Prometheus text format."""
+    if METRICS_TOKEN:
+        supplied = (
+            request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        )
+        if not secrets.compare_digest(supplied, METRICS_TOKEN):
+            return PlainTextResponse("Unauthorized\n", status_code=401)
+    body = render_metrics()
+    # The job queue lives in SQLite, so it is read off the event loop
+    body += "\n".join(family.render() for family in await _job_families()) + "\n"
+    return PlainTextResponse(body, media_type=CONTENT_TYPE)
+
+
+def _mount_metrics_route() -> None:
+    if any(
+        getattr(route, "path", None) == "/metrics"
+        for route in chainlit_app.router.routes
+    ):
+        return
+    chainlit_app.add_api_route(
+        "/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False
+    )
+    # Chainlit serves its UI from a catch-all route; ours has to match first
+    chainlit_app.router.routes.insert(0, chainlit_app.router.routes.pop())
+
+
+async def _probe_event_loop_lag() -> None:
+    global _last_lag_seconds, _max_lag_seconds
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        lag = max(0.0, time.perf_counter() - started - EVENT_LOOP_LAG_INTERVAL_SECONDS)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        _last_lag_seconds = lag
+        _max_lag_seconds = max(_max_lag_seconds, lag)
+
+
+async def start_monitoring() -> None:
+    """Mount ``/metrics`` and start the event-loop lag probe (if METRICS_ENABLED)."""
+    global _lag_task
+    if not METRICS_ENABLED:
+        return
+    _mount_metrics_route()
+    if _lag_task is None:
+        _lag_task = asyncio.create_task(_probe_event_loop_lag())
+    logger.info("Prometheus metrics available at /metrics")
+
+
+async def stop_monitoring() -> None:
+    global _lag_task
+    if _lag_task is not None:
+        _lag_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _lag_task
+        _lag_task = None
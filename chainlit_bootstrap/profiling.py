@@ -0,0 +1,293 @@
+"""Opt-in sampling profiler for handled requests and an event-loop stall detector.
+
+Profiling is armed for the next N requests either at startup
+(``PROFILE_NEXT_REQUESTS``) or by an admin with the ``/profile N`` chat command.
+While an armed request runs, a background thread samples the stacks of all
+threads every ``PROFILE_SAMPLE_INTERVAL_SECONDS`` and the result is written to
+``PROFILE_DIR`` in the folded-stack format (``frame;frame;frame count``), which
+``flamegraph.pl``, speedscope and inferno render directly. One request is
+profiled at a time; requests arriving while a profile is running are not.
+
+The event loop also runs other sessions' coroutines meanwhile, so its samples
+are kept only while it is executing the profiled coroutine (rooted at
+``request``). Worker threads can't be attributed to a request; their samples
+are rooted at ``other threads`` so they stay apart.
+
+The stall detector keeps a heartbeat callback on the event loop and, from a
+watchdog thread, captures the loop thread's stack whenever the heartbeat is
+late by more than ``LOOP_STALL_THRESHOLD_SECONDS``. Stacks are logged and
+appended to ``PROFILE_DIR/stalls.log``.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from collections.abc import AsyncIterator
+from datetime import datetime
+from pathlib import Path
+from types import CodeType, FrameType
+
+from .metrics import EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+_profile_dir_str = os.getenv("PROFILE_DIR", "./.local/data/profiles/")
+PROFILE_DIR = Path(_profile_dir_str).resolve()
+
+# Requests to profile after startup; admins can arm more with /profile N
+PROFILE_NEXT_REQUESTS = int(os.getenv("PROFILE_NEXT_REQUESTS", "0"))
+
+# Seconds between stack samples while a request is profiled
+PROFILE_SAMPLE_INTERVAL_SECONDS = float(
+    os.getenv("PROFILE_SAMPLE_INTERVAL_SECONDS", "0.005")
+)
+
+# Comma-separated user identifiers allowed to use /profile, besides users with
+# the "admin" role
+PROFILE_ADMINS = {
+    user.strip() for user in os.getenv("PROFILE_ADMINS", "").split(",") if user.strip()
+}
+
+# Seconds the event loop may be blocked before its stack is captured; 0 disables
+LOOP_STALL_THRESHOLD_SECONDS = float(os.getenv("LOOP_STALL_THRESHOLD_SECONDS", "1.0"))
+
+# Leaf frames of threads parked on a lock or queue; their samples are dropped
+_IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+_labels: dict[CodeType, str] = {}
+
+
+def _frame_label(code: CodeType) -> str:
+    label = _labels.get(code)
+    if label is None:
+        # Keep paths short but unambiguous: package-relative where possible
+        _, installed, relative = code.co_filename.rpartition("site-packages/")
+        _, local, own = code.co_filename.rpartition("chainlit_bootstrap/")
+        if installed:
+            path = relative
+        elif local:
+            path = local + own
+        else:
+            path = os.path.basename(code.co_filename)
+        label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+        _labels[code] = label
+    return label
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on an interval and counts folded stacks.
+
+    With ``request_frame``, samples of the thread running it (the event loop)
+    are kept only if that frame is on the stack.
+    """
+
+    def __init__(
+        self,
+        interval: float = PROFILE_SAMPLE_INTERVAL_SECONDS,
+        request_frame: FrameType | None = None,
+    ) -> None:
+        self.interval = interval
+        self.request_frame = request_frame
+        self.request_thread = (
+            threading.get_ident() if request_frame is not None else None
+        )
+        self.samples: Counter[str] = Counter()
+        # Loop samples taken while it was idle or running other coroutines
+        self.unrelated = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.started = 0.0
+        self.duration = 0.0
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                in_request = False
+                current: FrameType | None = frame
+                while current is not None:
+                    stack.append(_frame_label(current.f_code))
+                    in_request = in_request or current is self.request_frame
+                    current = current.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                if thread_id == self.request_thread:
+                    if not in_request:
+                        self.unrelated += 1
+                        continue
+                    stack.append("request")
+                elif self.request_thread is not None:
+                    stack.append("other threads")
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+
+    def write(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class _ProfileBudget:
+    """Number of upcoming requests to profile, and whether one is running."""
+
+    def __init__(self, remaining: int) -> None:
+        self.remaining = remaining
+        self.active = False
+
+    def claim(self) -> bool:
+        if self.active or self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        self.active = True
+        return True
+
+
+_budget = _ProfileBudget(PROFILE_NEXT_REQUESTS)
+
+
+def arm_profiler(requests: int) -> None:
+    """Profile the next ``requests`` requests (0 disarms)."""
+    _budget.remaining = max(0, requests)
+    logger.info(f"Profiling armed for the next {_budget.remaining} requests")
+
+
+def is_profile_admin(user) -> bool:
+    """Whether a Chainlit user may arm the profiler."""
+    if user is None:
+        return False
+    role = (getattr(user, "metadata", None) or {}).get("role")
+    return role == "admin" or user.identifier in PROFILE_ADMINS
+
+
+@contextlib.asynccontextmanager
+async def profiled(label: str) -> AsyncIterator[None]:
+    """Sample the enclosed request if profiling is armed, writing a folded-stack file."""
+    if not _budget.claim():
+        yield
+        return
+    # The coroutine that entered this context manager, past contextlib's frames
+    request_frame = sys._getframe(1)
+    while (
+        request_frame.f_back is not None
+        and request_frame.f_code.co_filename == contextlib.__file__
+    ):
+        request_frame = request_frame.f_back
+    profiler = SamplingProfiler(request_frame=request_frame)
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        _budget.active = False
+        del request_frame
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        path = PROFILE_DIR / f"{stamp}_{label}.folded"
+        try:
+            await asyncio.to_thread(profiler.write, path)
+            logger.info(
+                f"Profiled {label} for {profiler.duration:.2f}s "
+                f"({sum(profiler.samples.values())} samples, {profiler.unrelated} event loop "
+                f"samples outside the request dropped) -> {path}"
+            )
+        except OSError as e:
+            logger.warning(f"Failed to write profile {path}: {e}")
+
+
+class StallDetector:
+    """Captures the event loop's stack when it stops running callbacks for too long."""
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self._beat_interval = threshold / 4
+        self._last_beat = 0.0
+        self._reported_beat = 0.0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread = 0
+        self._handle: asyncio.TimerHandle | None = None
+        self._stop = threading.Event()
+        self._watchdog: threading.Thread | None = None
+
+    def _beat(self) -> None:
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self._beat_interval, self._beat)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._beat_interval):
+            beat = self._last_beat
+            blocked = time.monotonic() - beat - self._beat_interval
+            if blocked < self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            EVENT_LOOP_STALLS.inc()
+            logger.warning(f"Event loop blocked for over {blocked:.2f}s at:\n{stack}")
+            try:
+                PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+                with open(PROFILE_DIR / "stalls.log", "a", encoding="utf-8") as f:
+                    f.write(
+                        f"=== {datetime.now().isoformat()} blocked >= {blocked:.2f}s\n{stack}\n"
+                    )
+            except OSError as e:
+                logger.warning(f"Failed to record event loop stall: {e}")
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat()
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-stall-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+
+_stall_detector: StallDetector | None = None
+
+
+def start_stall_detector() -> None:
+    """Watch the running event loop for stalls (if LOOP_STALL_THRESHOLD_SECONDS > 0)."""
+    global _stall_detector
+    if LOOP_STALL_THRESHOLD_SECONDS <= 0 or _stall_detector is not None:
+        return
+    _stall_detector = StallDetector(LOOP_STALL_THRESHOLD_SECONDS)
+    _stall_detector.start()
+
+
+def stop_stall_detector() -> None:
+    global _stall_detector
+    if _stall_detector is not None:
+        _stall_detector.stop()
+        _stall_detector = None
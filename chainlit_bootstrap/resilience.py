@@ -0,0 +1,562 @@
+"""Deadlines, retries, hedging and circuit breaking for OpenAI-compatible upstreams.
+
+:class:`ResilientTransport` (sync) and :class:`AsyncResilientTransport` wrap the
+governed httpx transports from ``governor.py``. For every request they:
+
+- enforce a per-call deadline covering all attempts, by capping each attempt's
+  httpx timeouts at the time remaining
+- retry transport errors, 429 and 5xx responses with jittered exponential
+  backoff (honouring ``Retry-After``), until the deadline or retry budget runs out
+- optionally send a hedged duplicate when the first attempt is slower than the
+  upstream's recent p95 time-to-headers, using whichever succeeds first
+- track consecutive failures in a circuit breaker; while it is open, requests go
+  to the configured fallback backend, or fail fast if there is none
+
+The OpenAI SDK's own retries are disabled where these clients are used, so
+attempts are not multiplied. Point ``OPENAI_BASE_URL`` or
+``OPENAI_FALLBACK_BASE_URL`` at a local fake server to exercise this layer.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+import httpx
+
+from .governor import AsyncGovernedTransport, GovernedTransport
+from .metrics import UPSTREAM_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Total seconds per call, across retries and hedges, as "name=seconds,..."
+DEFAULT_DEADLINES = {"llm": 90.0, "embeddings": 30.0, "whisper": 180.0}
+UPSTREAM_DEADLINES = os.getenv("UPSTREAM_DEADLINES", "")
+
+# Retries after the first attempt
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+
+# First retry delay in seconds; doubles with each further attempt
+UPSTREAM_RETRY_BASE_SECONDS = float(os.getenv("UPSTREAM_RETRY_BASE_SECONDS", "0.5"))
+
+# Comma-separated upstreams that send a hedged duplicate of slow requests
+UPSTREAM_HEDGING = {
+    name.strip()
+    for name in os.getenv("UPSTREAM_HEDGING", "").split(",")
+    if name.strip()
+}
+
+# Never hedge earlier than this, and only once enough latency samples exist
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.5"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+# Consecutive failures that open the circuit, and seconds before a trial request
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+
+# OpenAI-compatible backend used while the primary's circuit is open
+OPENAI_FALLBACK_BASE_URL = os.getenv("OPENAI_FALLBACK_BASE_URL", "").strip()
+OPENAI_FALLBACK_API_KEY = os.getenv("OPENAI_FALLBACK_API_KEY", "").strip()
+
+_PRIMARY_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+_LATENCY_SAMPLES = 200
+
+# Threads that run sync hedged attempts
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised when the circuit is open and no fallback backend is configured."""
+
+
+class DeadlineExceededError(httpx.TimeoutException):
+    """Raised when a call's deadline passes before any attempt succeeds."""
+
+
+def _parse_deadlines(spec: str) -> dict[str, float]:
+    deadlines = dict(DEFAULT_DEADLINES)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, seconds = item.partition("=")
+        try:
+            deadlines[name.strip()] = float(seconds)
+        except ValueError:
+            logger.warning(f"Ignoring malformed UPSTREAM_DEADLINES entry: {item!r}")
+    return deadlines
+
+
+_deadlines = _parse_deadlines(UPSTREAM_DEADLINES)
+
+
+class LatencyTracker:
+    """Recent time-to-headers samples of successful primary attempts."""
+
+    def __init__(self) -> None:
+        self._samples: deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        return samples[int(0.95 * (len(samples) - 1))]
+
+    def hedge_delay(self) -> float | None:
+        p95 = self.p95()
+        return None if p95 is None else max(HEDGE_MIN_DELAY_SECONDS, p95)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open trial request."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Return True if a request may go to the primary backend now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if (
+                self.state == self.OPEN
+                and time.monotonic() - self._opened_at >= CIRCUIT_RESET_SECONDS
+            ):
+                self.state = self.HALF_OPEN
+                logger.info(
+                    f"Circuit for {self.name} half-open; sending a trial request"
+                )
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if (
+                self.state == self.HALF_OPEN
+                or self._failures >= CIRCUIT_FAILURE_THRESHOLD
+            ):
+                if self.state != self.OPEN:
+                    logger.warning(
+                        f"Circuit for {self.name} opened after {self._failures} consecutive failures"
+                    )
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class ResilienceStats:
+    """Counters for one upstream."""
+
+    name: str
+    attempts: int = 0
+    retries: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    fallbacks: int = 0
+    deadline_exceeded: int = 0
+    circuit_state: str = CircuitBreaker.CLOSED
+    latency_p95_seconds: float | None = None
+
+
+class _UpstreamState:
+    """Breaker, latency samples and counters shared by an upstream's transports."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.deadline = _deadlines.get(name, 60.0)
+        self.hedge = name in UPSTREAM_HEDGING
+        self.breaker = CircuitBreaker(name)
+        self.latency = LatencyTracker()
+        self.stats = ResilienceStats(name)
+
+    def observe(
+        self, started: float, fallback: bool, response: httpx.Response | None
+    ) -> None:
+        """Record one attempt's time to headers (``response`` is None on transport errors)."""
+        elapsed = time.monotonic() - started
+        if not fallback and response is not None and response.status_code < 500:
+            self.latency.record(elapsed)
+        UPSTREAM_SECONDS.observe(
+            elapsed,
+            upstream=self.name,
+            backend="fallback" if fallback else "primary",
+            status="error" if response is None else str(response.status_code),
+        )
+
+    def snapshot(self) -> ResilienceStats:
+        self.stats.circuit_state = self.breaker.state
+        self.stats.latency_p95_seconds = self.latency.p95()
+        return ResilienceStats(**vars(self.stats))
+
+
+_upstreams: dict[str, _UpstreamState] = {}
+
+
+def _upstream(name: str) -> _UpstreamState:
+    if name not in _upstreams:
+        _upstreams[name] = _UpstreamState(name)
+    return _upstreams[name]
+
+
+def resilience_stats() -> list[ResilienceStats]:
+    """Per-upstream retry, hedge, fallback and circuit metrics."""
+    return [state.snapshot() for state in _upstreams.values()]
+
+
+def _backoff(attempt: int, response: httpx.Response | None) -> float:
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        with contextlib.suppress(ValueError, TypeError):
+            return float(retry_after)
+    return UPSTREAM_RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+
+
+def _is_failure(response: httpx.Response | None) -> bool:
+    """Whether an attempt counts against the primary's health."""
+    return response is None or response.status_code >= 500
+
+
+def _fallback_request(request: httpx.Request) -> httpx.Request:
+    """Re-target a primary request at the fallback backend."""
+    path = request.url.raw_path.decode("ascii")
+    primary_prefix = httpx.URL(_PRIMARY_BASE_URL).raw_path.decode("ascii").rstrip("/")
+    if primary_prefix and path.startswith(primary_prefix):
+        path = path[len(primary_prefix) :]
+    headers = request.headers.copy()
+    # httpx fills in the fallback's Host header
+    if "host" in headers:
+        del headers["host"]
+    if OPENAI_FALLBACK_API_KEY:
+        headers["authorization"] = f"Bearer {OPENAI_FALLBACK_API_KEY}"
+    return httpx.Request(
+        request.method,
+        OPENAI_FALLBACK_BASE_URL.rstrip("/") + path,
+        headers=headers,
+        content=request.content,
+        extensions=request.extensions,
+    )
+
+
+def _attempt_request(
+    request: httpx.Request, deadline: float, fallback: bool
+) -> httpx.Request:
+    """Copy of the (buffered) request with timeouts capped by the remaining deadline."""
+    remaining = max(0.001, deadline - time.monotonic())
+    extensions = dict(request.extensions)
+    timeouts = dict(extensions.get("timeout") or {})
+    for key in ("connect", "read", "write", "pool"):
+        current = timeouts.get(key)
+        timeouts[key] = remaining if current is None else min(current, remaining)
+    extensions["timeout"] = timeouts
+    attempt = httpx.Request(
+        request.method,
+        request.url,
+        headers=request.headers,
+        content=request.content,
+        extensions=extensions,
+    )
+    return _fallback_request(attempt) if fallback else attempt
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """Sync transport adding deadlines, retries, hedging and circuit breaking."""
+
+    def __init__(self, upstream: str) -> None:
+        self._state = _upstream(upstream)
+        self._primary = GovernedTransport(upstream)
+        self._fallback = (
+            GovernedTransport(upstream) if OPENAI_FALLBACK_BASE_URL else None
+        )
+
+    def _send(self, request: httpx.Request, fallback: bool) -> httpx.Response:
+        started = time.monotonic()
+        transport = self._fallback if fallback else self._primary
+        try:
+            response = transport.handle_request(request)
+        except httpx.TransportError:
+            self._state.observe(started, fallback, None)
+            raise
+        self._state.observe(started, fallback, response)
+        return response
+
+    def _send_hedged(
+        self, request: httpx.Request, deadline: float, fallback: bool
+    ) -> httpx.Response:
+        delay = (
+            self._state.latency.hedge_delay()
+            if self._state.hedge and not fallback
+            else None
+        )
+        if delay is None:
+            return self._send(_attempt_request(request, deadline, fallback), fallback)
+
+        # Attempts run on pool threads; each gets a copy of the caller's context
+        # so the governor's user and priority class and the tracing span apply
+        futures = [
+            _hedge_executor.submit(
+                contextvars.copy_context().run,
+                self._send,
+                _attempt_request(request, deadline, fallback),
+                fallback,
+            )
+        ]
+        done, _ = wait(
+            futures, timeout=min(delay, max(0.0, deadline - time.monotonic()))
+        )
+        if not done:
+            self._state.stats.hedges += 1
+            futures.append(
+                _hedge_executor.submit(
+                    contextvars.copy_context().run,
+                    self._send,
+                    _attempt_request(request, deadline, fallback),
+                    fallback,
+                )
+            )
+        pending = set(futures)
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED,
+            )
+            if not done:
+                break
+            for future in done:
+                if future.exception() is None:
+                    if future is not futures[0]:
+                        self._state.stats.hedge_wins += 1
+                    for loser in pending:
+                        loser.add_done_callback(_close_sync_response)
+                    for other in done - {future}:
+                        _close_sync_response(other)
+                    return future.result()
+                error = future.exception()
+        for loser in pending:
+            loser.add_done_callback(_close_sync_response)
+        if error is not None:
+            raise error
+        raise DeadlineExceededError(f"{self._state.name} deadline exceeded")
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        # Buffer the body so attempts can be replayed and sent concurrently
+        request.read()
+        state = self._state
+        deadline = time.monotonic() + state.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            use_primary = state.breaker.allow()
+            if not use_primary and self._fallback is None:
+                raise CircuitOpenError(f"Circuit for {state.name} is open")
+            state.stats.attempts += 1
+            if not use_primary:
+                state.stats.fallbacks += 1
+
+            response, error = None, None
+            try:
+                response = self._send_hedged(
+                    request, deadline, fallback=not use_primary
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if use_primary:
+                    state.breaker.record_success()
+                return response
+            if use_primary and _is_failure(response):
+                state.breaker.record_failure()
+
+            delay = _backoff(attempt, response)
+            if attempt > UPSTREAM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                if response is not None:
+                    return response
+                if time.monotonic() >= deadline:
+                    state.stats.deadline_exceeded += 1
+                raise error
+            if response is not None:
+                response.close()
+            state.stats.retries += 1
+            logger.warning(
+                f"{state.name} attempt {attempt} failed "
+                f"({error or response.status_code}); retrying in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+    def close(self) -> None:
+        self._primary.close()
+        if self._fallback is not None:
+            self._fallback.close()
+
+
+def _close_sync_response(future: Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Async transport adding deadlines, retries, hedging and circuit breaking."""
+
+    def __init__(self, upstream: str) -> None:
+        self._state = _upstream(upstream)
+        self._primary = AsyncGovernedTransport(upstream)
+        self._fallback = (
+            AsyncGovernedTransport(upstream) if OPENAI_FALLBACK_BASE_URL else None
+        )
+
+    async def _send(self, request: httpx.Request, fallback: bool) -> httpx.Response:
+        started = time.monotonic()
+        transport = self._fallback if fallback else self._primary
+        try:
+            response = await transport.handle_async_request(request)
+        except httpx.TransportError:
+            self._state.observe(started, fallback, None)
+            raise
+        self._state.observe(started, fallback, response)
+        return response
+
+    async def _send_hedged(
+        self, request: httpx.Request, deadline: float, fallback: bool
+    ) -> httpx.Response:
+        delay = (
+            self._state.latency.hedge_delay()
+            if self._state.hedge and not fallback
+            else None
+        )
+        if delay is None:
+            return await self._send(
+                _attempt_request(request, deadline, fallback), fallback
+            )
+
+        tasks = [
+            asyncio.create_task(
+                self._send(_attempt_request(request, deadline, fallback), fallback)
+            )
+        ]
+        done, _ = await asyncio.wait(
+            tasks, timeout=min(delay, max(0.0, deadline - time.monotonic()))
+        )
+        if not done:
+            self._state.stats.hedges += 1
+            tasks.append(
+                asyncio.create_task(
+                    self._send(_attempt_request(request, deadline, fallback), fallback)
+                )
+            )
+        pending = set(tasks)
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0.0, deadline - time.monotonic()),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self._state.stats.hedge_wins += 1
+                        for other in done - {task}:
+                            await other.result().aclose()
+                        return task.result()
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None:
+            raise error
+        raise DeadlineExceededError(f"{self._state.name} deadline exceeded")
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # Buffer the body so attempts can be replayed and sent concurrently
+        await request.aread()
+        state = self._state
+        deadline = time.monotonic() + state.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            use_primary = state.breaker.allow()
+            if not use_primary and self._fallback is None:
+                raise CircuitOpenError(f"Circuit for {state.name} is open")
+            state.stats.attempts += 1
+            if not use_primary:
+                state.stats.fallbacks += 1
+
+            response, error = None, None
+            try:
+                response = await self._send_hedged(
+                    request, deadline, fallback=not use_primary
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if use_primary:
+                    state.breaker.record_success()
+                return response
+            if use_primary and _is_failure(response):
+                state.breaker.record_failure()
+
+            delay = _backoff(attempt, response)
+            if attempt > UPSTREAM_MAX_RETRIES or time.monotonic() + delay >= deadline:
+                if response is not None:
+                    return response
+                if time.monotonic() >= deadline:
+                    state.stats.deadline_exceeded += 1
+                raise error
+            if response is not None:
+                await response.aclose()
+            state.stats.retries += 1
+            logger.warning(
+                f"{state.name} attempt {attempt} failed "
+                f"({error or response.status_code}); retrying in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._primary.aclose()
+        if self._fallback is not None:
+            await self._fallback.aclose()
+
+
+def upstream_http_clients(upstream: str) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """Sync and async httpx clients for an OpenAI client of ``upstream``."""
+    from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+
+    return (
+        DefaultHttpxClient(transport=ResilientTransport(upstream)),
+        DefaultAsyncHttpxClient(transport=AsyncResilientTransport(upstream)),
+    )
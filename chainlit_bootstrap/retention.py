@@ -0,0 +1,444 @@
+"""Retention policies and background garbage collection for on-disk data.
+
+Without it, these only grow:
+
+- ``audio``: verbatim uploads in ``AUDIO_PERSIST_DIR`` (messages play the copy
+  in blob storage; this one is kept for re-processing)
+- ``blobs``: element files in the content-addressed blob store
+- ``artifacts``: transcripts and parsed conversations in ``ARTIFACT_DIR``
+- ``snapshots``: session index snapshots in ``INDEX_SNAPSHOT_DIR`` (the
+  persisted form of the in-memory Chroma/NumPy session indexes)
+- ``transcripts``: the Whisper transcript cache in ``TRANSCRIPT_CACHE_DIR``
+
+Each run cross-references the Chainlit database: blobs whose object key no
+element row uses, artifacts and audio files no step refers to, and snapshots no
+thread refers to are orphans (typically left by deleted threads) and are
+removed. Stores also have an age limit and a size cap (``GC_<STORE>_MAX_AGE_DAYS``,
+``GC_<STORE>_MAX_BYTES``; 0 disables either); size caps remove the oldest
+entries first. Nothing younger than ``GC_MIN_AGE_SECONDS`` is removed, which
+covers jobs and messages still in flight. If the database can't be read,
+orphan detection is skipped for that run rather than treating everything as
+unreferenced.
+
+Files are scanned and removed in worker threads, in batches of
+``GC_BATCH_SIZE`` with a pause in between, so request handling isn't blocked.
+Each run logs and exports (``/metrics``) the files removed, bytes reclaimed
+and run duration. ``python scripts/gc.py --dry-run`` reports what a run would do.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .artifacts import ARTIFACT_DIR
+from .audio import AUDIO_PERSIST_DIR, TRANSCRIPT_CACHE_DIR
+from .audio_archive import original_path
+from .blob_storage import LocalFileStorageClient
+from .metrics import GC_DELETED, GC_RECLAIMED_BYTES, GC_RUN_SECONDS
+
+logger = logging.getLogger(__name__)
+
+GC_ENABLED = os.getenv("GC_ENABLED", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# Seconds between runs, and before the first run after startup
+GC_INTERVAL_SECONDS = float(os.getenv("GC_INTERVAL_SECONDS", str(6 * 3600)))
+GC_INITIAL_DELAY_SECONDS = float(os.getenv("GC_INITIAL_DELAY_SECONDS", "300"))
+
+# Entries younger than this are never removed (in-flight jobs and messages)
+GC_MIN_AGE_SECONDS = float(os.getenv("GC_MIN_AGE_SECONDS", str(24 * 3600)))
+
+# Removals per batch, and the pause between batches
+GC_BATCH_SIZE = int(os.getenv("GC_BATCH_SIZE", "200"))
+GC_BATCH_PAUSE_SECONDS = float(os.getenv("GC_BATCH_PAUSE_SECONDS", "0.05"))
+
+_DAY = 24 * 3600
+
+
+@dataclass
+class RetentionPolicy:
+    """Limits for one store; 0 disables a limit."""
+
+    max_age_seconds: float = 0.0
+    max_bytes: int = 0
+
+    @classmethod
+    def from_env(
+        cls, store: str, max_age_days: float, max_bytes: int
+    ) -> "RetentionPolicy":
+        prefix = f"GC_{store.upper()}"
+        return cls(
+            max_age_seconds=float(
+                os.getenv(f"{prefix}_MAX_AGE_DAYS", str(max_age_days))
+            )
+            * _DAY,
+            max_bytes=int(os.getenv(f"{prefix}_MAX_BYTES", str(max_bytes))),
+        )
+
+
+# Referenced blobs and artifacts are kept regardless of age: thread history needs them
+POLICIES = {
+    "audio": RetentionPolicy.from_env("audio", 30, 0),
+    "blobs": RetentionPolicy.from_env("blobs", 0, 0),
+    "artifacts": RetentionPolicy.from_env("artifacts", 0, 0),
+    "snapshots": RetentionPolicy.from_env("snapshots", 30, 0),
+    "transcripts": RetentionPolicy.from_env("transcripts", 90, 256 * 1024 * 1024),
+}
+
+
+@dataclass
+class _Entry:
+    """A removable unit: a file, a snapshot directory or a blob object key."""
+
+    key: str
+    size: int
+    mtime: float
+    remove: Callable[[], int]
+
+
+@dataclass
+class GcReport:
+    """What one collection run removed (or would remove, for a dry run)."""
+
+    dry_run: bool = False
+    duration_seconds: float = 0.0
+    deleted: dict[str, int] = field(default_factory=dict)
+    reclaimed_bytes: dict[str, int] = field(default_factory=dict)
+    orphan_detection: bool = True
+
+    def summary(self) -> str:
+        verb = "Would remove" if self.dry_run else "Removed"
+        stores = ", ".join(
+            f"{store} {count} ({self.reclaimed_bytes.get(store, 0) / 2**20:.1f} MiB)"
+            for store, count in sorted(self.deleted.items())
+        )
+        return f"{verb} {stores or 'nothing'} in {self.duration_seconds:.2f}s"
+
+
+@dataclass
+class _References:
+    object_keys: set[str] = field(default_factory=set)
+    artifacts: set[str] = field(default_factory=set)
+    audio_paths: set[str] = field(default_factory=set)
+    snapshots: set[str] = field(default_factory=set)
+
+
+def _json_rows(conn: sqlite3.Connection, query: str) -> Iterable[dict]:
+    for (raw,) in conn.execute(query):
+        with contextlib.suppress(TypeError, ValueError):
+            value = json.loads(raw) if isinstance(raw, str) else raw
+            if isinstance(value, dict):
+                yield value
+
+
+def _read_references(db_path: Path) -> _References | None:
+    """Everything the Chainlit database still points at, or None if unreadable."""
+    if not db_path.exists():
+        return None
+    refs = _References()
+    try:
+        with contextlib.closing(
+            sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        ) as conn:
+            refs.object_keys = {
+                row[0]
+                for row in conn.execute(
+                    'SELECT "objectKey" FROM elements WHERE "objectKey" IS NOT NULL'
+                )
+            }
+            for metadata in _json_rows(
+                conn,
+                "SELECT metadata FROM steps "
+                "WHERE metadata LIKE '%audio_path%' OR metadata LIKE '%_ref%'",
+            ):
+                if metadata.get("audio_path"):
+                    refs.audio_paths.add(str(Path(metadata["audio_path"]).resolve()))
+                for key in ("transcription_ref", "parsed_conversation_ref"):
+                    if metadata.get(key):
+                        refs.artifacts.add(metadata[key])
+            for props in _json_rows(
+                conn, "SELECT props FROM elements WHERE props LIKE '%\"artifact\"%'"
+            ):
+                if props.get("artifact"):
+                    refs.artifacts.add(props["artifact"])
+            for metadata in _json_rows(
+                conn,
+                "SELECT metadata FROM threads WHERE metadata LIKE '%index_snapshot%'",
+            ):
+                if metadata.get("index_snapshot"):
+                    refs.snapshots.add(metadata["index_snapshot"])
+    except sqlite3.Error as e:
+        logger.warning(
+            f"Garbage collection can't read {db_path}; skipping orphan checks: {e}"
+        )
+        return None
+    return refs
+
+
+def _unlink(path: Path, root: Path) -> Callable[[], int]:
+    def remove() -> int:
+        size = path.stat().st_size
+        path.unlink()
+        # Drop directories left empty (shards, old per-user layout), but never
+        # the store itself
+        parent = path.parent
+        while parent != root and parent.is_relative_to(root):
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+        return size
+
+    return remove
+
+
+def _rmtree(path: Path, size: int) -> Callable[[], int]:
+    def remove() -> int:
+        shutil.rmtree(path)
+        return size
+
+    return remove
+
+
+def _file_entries(
+    directory: Path, key: Callable[[Path], str] = lambda path: path.name
+) -> list[_Entry]:
+    entries = []
+    if not directory.is_dir():
+        return entries
+    for path in directory.rglob("*"):
+        with contextlib.suppress(FileNotFoundError):
+            if path.is_file():
+                stat = path.stat()
+                entries.append(
+                    _Entry(
+                        key(path), stat.st_size, stat.st_mtime, _unlink(path, directory)
+                    )
+                )
+    return entries
+
+
+def _snapshot_entries() -> list[_Entry]:
+    # Imported here: the snapshot module loads llama-index
+    from .snapshots import INDEX_SNAPSHOT_DIR
+
+    entries = []
+    if not INDEX_SNAPSHOT_DIR.is_dir():
+        return entries
+    for path in INDEX_SNAPSHOT_DIR.iterdir():
+        if not path.is_dir():
+            continue
+        files = [child.stat() for child in path.rglob("*") if child.is_file()]
+        size = sum(stat.st_size for stat in files)
+        mtime = max((stat.st_mtime for stat in files), default=path.stat().st_mtime)
+        entries.append(_Entry(path.name, size, mtime, _rmtree(path, size)))
+    return entries
+
+
+def _blob_entries(
+    storage: LocalFileStorageClient, referenced: set[str] | None = None
+) -> list[_Entry]:
+    """Object keys in the blob index, plus files outside it (temp files, old layout).
+
+    Files outside the index at a ``referenced`` object key are old-layout
+    element files still in use, and are left out.
+    """
+
+    def release(object_key: str) -> Callable[[], int]:
+        # Shared content is only reclaimed with its last key
+        return lambda: storage.remove_key(object_key) or 0
+
+    blobs = storage.list_blobs()
+    entries = [
+        _Entry(blob.object_key, blob.size, blob.created_at, release(blob.object_key))
+        for blob in blobs
+    ]
+    digests = {blob.digest for blob in blobs}
+    # Anything the index doesn't account for: interrupted uploads, objects whose
+    # key was dropped mid-crash, and pre-index flat-layout files no element uses
+    index_files = {storage.index_path.name + suffix for suffix in ("", "-wal", "-shm")}
+    for entry in _file_entries(storage.base_path, key=str):
+        path = Path(entry.key)
+        if path.parent == storage.base_path and path.name in index_files:
+            continue
+        if path.is_relative_to(storage.objects_dir) and path.name in digests:
+            continue
+        relative = path.relative_to(storage.base_path)
+        if referenced and relative.as_posix() in referenced:
+            continue
+        entry.key = f"unindexed:{relative}"
+        entries.append(entry)
+    return entries
+
+
+def _select(
+    entries: list[_Entry],
+    policy: RetentionPolicy,
+    now: float,
+    referenced: set[str] | None,
+) -> list[tuple[_Entry, str]]:
+    """Entries to remove with the reason: orphaned, age, then size (oldest first)."""
+    victims: list[tuple[_Entry, str]] = []
+    kept: list[_Entry] = []
+    for entry in sorted(entries, key=lambda entry: entry.mtime):
+        age = now - entry.mtime
+        if age < GC_MIN_AGE_SECONDS:
+            kept.append(entry)
+        elif entry.key.startswith("unindexed:") or (
+            referenced is not None and entry.key not in referenced
+        ):
+            victims.append((entry, "orphaned"))
+        elif policy.max_age_seconds and age > policy.max_age_seconds:
+            victims.append((entry, "age"))
+        else:
+            kept.append(entry)
+    if policy.max_bytes:
+        total = sum(entry.size for entry in kept)
+        for entry in kept:
+            if total <= policy.max_bytes:
+                break
+            if now - entry.mtime < GC_MIN_AGE_SECONDS:
+                continue
+            victims.append((entry, "size"))
+            total -= entry.size
+    return victims
+
+
+async def collect_garbage(
+    db_path: Path | None,
+    blob_storage: LocalFileStorageClient | None = None,
+    dry_run: bool = False,
+) -> GcReport:
+    """Apply the retention policies once. ``db_path`` is the Chainlit database."""
+    started = time.perf_counter()
+    report = GcReport(dry_run=dry_run)
+    refs = await asyncio.to_thread(_read_references, db_path) if db_path else None
+    report.orphan_detection = refs is not None
+    now = time.time()
+
+    stores: dict[str, tuple[Callable[[], list[_Entry]], set[str] | None]] = {
+        "audio": (
+            # Archives are referenced through the upload they were made from
+            lambda: _file_entries(
+                AUDIO_PERSIST_DIR, key=lambda path: str(original_path(path).resolve())
+            ),
+            refs.audio_paths if refs else None,
+        ),
+        "artifacts": (
+            lambda: _file_entries(ARTIFACT_DIR),
+            refs.artifacts if refs else None,
+        ),
+        "snapshots": (_snapshot_entries, refs.snapshots if refs else None),
+        # A cache: never orphaned, only bounded by age and size
+        "transcripts": (lambda: _file_entries(TRANSCRIPT_CACHE_DIR), None),
+    }
+    if blob_storage is not None:
+        if refs and not dry_run:
+            imported = await asyncio.to_thread(
+                blob_storage.import_legacy_files, refs.object_keys
+            )
+            if imported:
+                logger.info(f"Indexed {imported} blob files from the old flat layout")
+        stores["blobs"] = (
+            lambda: _blob_entries(blob_storage, refs.object_keys if refs else None),
+            refs.object_keys if refs else None,
+        )
+
+    for store, (scan, referenced) in stores.items():
+        entries = await asyncio.to_thread(scan)
+        victims = _select(entries, POLICIES[store], now, referenced)
+        for offset in range(0, len(victims), GC_BATCH_SIZE):
+            batch = victims[offset : offset + GC_BATCH_SIZE]
+            removed = (
+                batch
+                if dry_run
+                else await asyncio.to_thread(_remove_batch, store, batch)
+            )
+            for entry, reason in removed:
+                report.deleted[store] = report.deleted.get(store, 0) + 1
+                report.reclaimed_bytes[store] = (
+                    report.reclaimed_bytes.get(store, 0) + entry.size
+                )
+                if not dry_run:
+                    GC_DELETED.inc(store=store, reason=reason)
+                    GC_RECLAIMED_BYTES.inc(entry.size, store=store, reason=reason)
+            await asyncio.sleep(GC_BATCH_PAUSE_SECONDS)
+
+    report.duration_seconds = time.perf_counter() - started
+    if not dry_run:
+        GC_RUN_SECONDS.observe(report.duration_seconds)
+    return report
+
+
+def _remove_batch(
+    store: str, batch: list[tuple[_Entry, str]]
+) -> list[tuple[_Entry, str]]:
+    removed = []
+    for entry, reason in batch:
+        try:
+            entry.size = entry.remove()
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            logger.warning(f"Failed to remove {store} entry {entry.key}: {e}")
+            continue
+        removed.append((entry, reason))
+    return removed
+
+
+_gc_task: asyncio.Task | None = None
+
+
+def _resolve_targets() -> tuple[Path | None, LocalFileStorageClient | None]:
+    from chainlit.data import get_data_layer
+
+    data_layer = get_data_layer()
+    engine = getattr(data_layer, "engine", None)
+    database = engine.url.database if engine is not None else None
+    storage = getattr(data_layer, "storage_provider", None)
+    return (
+        Path(database) if database else None,
+        storage if isinstance(storage, LocalFileStorageClient) else None,
+    )
+
+
+async def _gc_loop() -> None:
+    await asyncio.sleep(GC_INITIAL_DELAY_SECONDS)
+    while True:
+        try:
+            db_path, blob_storage = _resolve_targets()
+            report = await collect_garbage(db_path, blob_storage)
+            logger.info(f"Garbage collection: {report.summary()}")
+        except Exception as e:
+            logger.warning(f"Garbage collection failed: {e}", exc_info=True)
+        await asyncio.sleep(GC_INTERVAL_SECONDS)
+
+
+def start_gc() -> None:
+    """Run garbage collection periodically in the background (if GC_ENABLED)."""
+    global _gc_task
+    if not GC_ENABLED or _gc_task is not None:
+        return
+    _gc_task = asyncio.create_task(_gc_loop())
+
+
+async def stop_gc() -> None:
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _gc_task
+        _gc_task = None
@@ -0,0 +1,201 @@
+"""Hybrid lexical + vector retrieval for session document indexes."""
+
+import logging
+import math
+import os
+import re
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+from threading import Lock
+
+import numpy as np
+from llama_index.core import VectorStoreIndex
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle, TextNode
+
+logger = logging.getLogger(__name__)
+
+# Reciprocal rank fusion constant; larger values flatten the contribution of top ranks
+RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+
+# How many candidates each retriever contributes before fusion, per result requested
+HYBRID_CANDIDATE_MULTIPLIER = int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "3"))
+
+# Tokens are runs of letters/digits, optionally joined by "." or "-" so that
+# frequencies ("124.5"), runways ("27L") and tail numbers ("N123AB") stay whole.
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.\-][a-z0-9]+)*")
+_JOINERS = re.compile(r"[.\-]")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase and split text into ATC-friendly lexical tokens.
+
+    Joined compounds also yield their parts, so "missed approach" matches
+    "missed-approach" (and the reverse).
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token or "-" in token:
+            tokens.extend(_JOINERS.split(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Compact, append-only BM25 inverted index.
+
+    Postings are kept per term in typed ``array`` buffers (document ordinal and term
+    frequency), so they grow incrementally during ingestion without per-entry Python
+    objects and can be viewed as NumPy arrays at query time without copying.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._nodes: list[TextNode] = []
+        # Text of nodes kept without it (rows of ``_texts``, -1 for nodes that have it)
+        self._texts: Sequence[str] | None = None
+        self._text_rows = array("i")
+        self._doc_lengths = array("I")
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._total_length = 0
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add_nodes(
+        self, nodes: list[BaseNode], texts: Sequence[str] | None = None
+    ) -> None:
+        """
+        Index nodes by their text content.
+
+        If ``texts`` is given, ``texts[i]`` is the text of ``nodes[i]``. It is read
+        once to index the node and again only when the node is returned by
+        :meth:`search`; the node itself is kept without text.
+        """
+        with self._lock:
+            if texts is not None and self._texts is None:
+                self._texts = texts
+                self._text_rows.extend([-1] * len(self._nodes))
+            elif texts is not None and texts is not self._texts:
+                raise ValueError(
+                    "BM25Index already reads node text from another source"
+                )
+            for position, node in enumerate(nodes):
+                text = node.get_content() if texts is None else texts[position]
+                terms = Counter(tokenize(text))
+                doc_id = len(self._nodes)
+                # Keep a lightweight copy without the embedding vector
+                self._nodes.append(
+                    TextNode(
+                        id_=node.node_id,
+                        text="" if texts is not None else text,
+                        metadata=dict(node.metadata),
+                    )
+                )
+                if self._texts is not None:
+                    self._text_rows.append(-1 if texts is None else position)
+                length = sum(terms.values())
+                self._doc_lengths.append(length)
+                self._total_length += length
+                for term, freq in terms.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = (array("I"), array("I"))
+                        self._postings[term] = postings
+                    postings[0].append(doc_id)
+                    postings[1].append(freq)
+
+    def _score(self, query: str) -> np.ndarray:
+        """Vectorized BM25 scores for every document. Caller must hold the lock."""
+        num_docs = len(self._nodes)
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+        avg_length = max(self._total_length / num_docs, 1.0)
+        length_norm = self.k1 * (1 - self.b + self.b * doc_lengths / avg_length)
+        scores = np.zeros(num_docs, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            doc_ids = np.frombuffer(postings[0], dtype=np.uint32)
+            freqs = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+            idf = math.log(1 + (num_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            scores[doc_ids] += (
+                idf * freqs * (self.k1 + 1) / (freqs + length_norm[doc_ids])
+            )
+        return scores
+
+    def search(self, query: str, top_k: int) -> list[NodeWithScore]:
+        """Return the ``top_k`` highest-scoring nodes for a query."""
+        # Postings are viewed in place; hold the lock so appends can't resize them
+        with self._lock:
+            if not self._nodes or top_k <= 0:
+                return []
+            scores = self._score(query)
+
+        matched = np.flatnonzero(scores)
+        if matched.size == 0:
+            return []
+        if matched.size > top_k:
+            matched = matched[np.argpartition(scores[matched], -top_k)[-top_k:]]
+        ranked = matched[np.argsort(scores[matched])[::-1]]
+        return [
+            NodeWithScore(node=self._with_text(idx), score=float(scores[idx]))
+            for idx in ranked
+        ]
+
+    def _with_text(self, doc_id: int) -> TextNode:
+        node = self._nodes[doc_id]
+        if self._texts is None or self._text_rows[doc_id] < 0:
+            return node
+        return node.model_copy(update={"text": self._texts[self._text_rows[doc_id]]})
+
+
+def reciprocal_rank_fusion(
+    rankings: list[list[NodeWithScore]], top_k: int, k: int = RRF_K
+) -> list[NodeWithScore]:
+    """Fuse several ranked result lists into one, keyed by node id."""
+    fused: dict[str, float] = {}
+    nodes: dict[str, NodeWithScore] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking):
+            node_id = result.node.node_id
+            fused[node_id] = fused.get(node_id, 0.0) + 1.0 / (k + rank + 1)
+            # Prefer the first retriever's copy of the node (the vector store's)
+            nodes.setdefault(node_id, result)
+    best = sorted(fused, key=fused.__getitem__, reverse=True)[:top_k]
+    return [
+        NodeWithScore(node=nodes[node_id].node, score=fused[node_id])
+        for node_id in best
+    ]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retrieve with dense vectors and BM25, then fuse with reciprocal rank fusion."""
+
+    def __init__(
+        self,
+        index: VectorStoreIndex,
+        lexical_index: BM25Index,
+        similarity_top_k: int = 3,
+    ) -> None:
+        self._similarity_top_k = similarity_top_k
+        candidates = similarity_top_k * HYBRID_CANDIDATE_MULTIPLIER
+        self._vector_retriever = index.as_retriever(similarity_top_k=candidates)
+        self._lexical_index = lexical_index
+        self._candidates = candidates
+        super().__init__()
+
+    def _retrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        dense = self._vector_retriever.retrieve(query_bundle)
+        lexical = self._lexical_index.search(query_bundle.query_str, self._candidates)
+        return reciprocal_rank_fusion([dense, lexical], self._similarity_top_k)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> list[NodeWithScore]:
+        dense = await self._vector_retriever.aretrieve(query_bundle)
+        lexical = self._lexical_index.search(query_bundle.query_str, self._candidates)
+        return reciprocal_rank_fusion([dense, lexical], self._similarity_top_k)
@@ -4,9 +4,12 @@ from __future__ import annotations
 
 import os
 from functools import lru_cache
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from tavily import TavilyClient
+from .governor import governor
+
+if TYPE_CHECKING:
+    from tavily import TavilyClient
 
 
 class TavilyNotConfiguredError(RuntimeError):
@@ -25,7 +28,12 @@ def _get_api_key() -> str:
 @lru_cache(maxsize=1)
 def _get_client() -> TavilyClient:
     """Create or return a cached Tavily client instance."""
-    return TavilyClient(api_key=_get_api_key())
+    from tavily import TavilyClient
+
+    # TAVILY_BASE_URL points search at a compatible stand-in (scripts/fake_openai_server.py)
+    return TavilyClient(
+        api_key=_get_api_key(), api_base_url=os.getenv("TAVILY_BASE_URL") or None
+    )
 
 
 def is_web_search_configured() -> bool:
@@ -40,6 +48,6 @@ def run_web_search(query: str, max_results: int = 5) -> list[dict[str, Any]]:
     Returns a list of dictionaries containing title, url, and content snippet.
     """
     client = _get_client()
+    governor.limiter("tavily").acquire_sync()
     response = client.search(query=query, max_results=max_results)
     return response.get("results", [])
-
@@ -0,0 +1,166 @@
+"""Semantic cache for document QA answers."""
+
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv(
+    "SEMANTIC_CACHE_ENABLED", "1"
+).strip().lower() not in ("0", "false", "no", "")
+
+# Minimum cosine similarity between question embeddings for a cache hit
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+
+# Seconds a cached answer stays valid
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+
+# Maximum number of cached answers across all documents (least recently used evicted)
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1024"))
+
+
+def document_set_hash(content_hashes: Iterable[str]) -> str:
+    """Combine per-file content hashes into one order-independent document key."""
+    digest = hashlib.sha256()
+    for content_hash in sorted(content_hashes):
+        digest.update(content_hash.encode("ascii"))
+    return digest.hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """A previously generated answer and the source texts it was grounded on."""
+
+    question: str
+    answer: str
+    sources: list[str]
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _DocumentEntries:
+    """Cached answers for one document, with embeddings stacked for vectorized lookup."""
+
+    entry_ids: list[str] = field(default_factory=list)
+    vectors: np.ndarray | None = None
+
+
+class SemanticAnswerCache:
+    """
+    Size-bounded, TTL-limited cache of answers keyed on document hash and question.
+
+    Questions match when the cosine similarity of their embeddings is at least
+    ``threshold``. Entries are evicted least-recently-used first once
+    ``max_entries`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, CachedAnswer]] = OrderedDict()
+        self._documents: dict[str, _DocumentEntries] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, entry_id: str) -> None:
+        document_hash, _ = self._entries.pop(entry_id)
+        document = self._documents[document_hash]
+        position = document.entry_ids.index(entry_id)
+        document.entry_ids.pop(position)
+        if not document.entry_ids:
+            del self._documents[document_hash]
+        else:
+            document.vectors = np.delete(document.vectors, position, axis=0)
+
+    def _purge_expired(self, document_hash: str) -> None:
+        document = self._documents.get(document_hash)
+        if document is None:
+            return
+        now = time.monotonic()
+        expired = [
+            entry_id
+            for entry_id in document.entry_ids
+            if now - self._entries[entry_id][1].created_at > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+
+    def lookup(
+        self, document_hash: str, question_embedding: Sequence[float]
+    ) -> CachedAnswer | None:
+        """Return the closest fresh cached answer for the document, if similar enough."""
+        self._purge_expired(document_hash)
+        document = self._documents.get(document_hash)
+        if document is None:
+            self.misses += 1
+            return None
+
+        similarities = document.vectors @ self._normalize(question_embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        entry_id = document.entry_ids[best]
+        _, answer = self._entries[entry_id]
+        self._entries.move_to_end(entry_id)
+        self.hits += 1
+        logger.info(
+            f"Semantic cache hit (similarity={similarities[best]:.3f}) "
+            f"for question: {answer.question[:80]}"
+        )
+        return answer
+
+    def store(
+        self,
+        document_hash: str,
+        question_embedding: Sequence[float],
+        answer: CachedAnswer,
+    ) -> None:
+        """Cache an answer, evicting the least recently used entries if over budget."""
+        if self.max_entries <= 0:
+            return
+
+        entry_id = uuid.uuid4().hex
+        vector = self._normalize(question_embedding)[np.newaxis, :]
+        document = self._documents.setdefault(document_hash, _DocumentEntries())
+        document.entry_ids.append(entry_id)
+        document.vectors = (
+            vector
+            if document.vectors is None
+            else np.vstack([document.vectors, vector])
+        )
+        self._entries[entry_id] = (document_hash, answer)
+
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+
+# Process-wide cache shared by all sessions, so operators asking about the same
+# uploaded document benefit from each other's questions
+answer_cache = SemanticAnswerCache()
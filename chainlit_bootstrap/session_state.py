@@ -0,0 +1,309 @@
+"""Externalized per-thread session state, shared by all server workers.
+
+Chainlit keeps ``cl.user_session`` in the memory of the worker that owns the
+websocket. To run several workers, the state the handlers rely on is loaded from
+and saved to a shared store around every message. Only JSON-serializable state is
+stored; indexes and chat engines are rebuilt on demand from persisted artifacts
+(index snapshots) and the stored chat history.
+
+Backends:
+
+- ``sqlite`` (default): one SQLite file in WAL mode, shared by workers on one host
+- ``redis``: any Redis-protocol server (Redis, Valkey, a local stand-in), for
+  workers spread across hosts; requires the optional ``redis`` package
+- ``none``: keep state in process memory only (single worker)
+
+The store is created on first use, not at import. If it can't be created (e.g.
+the ``redis`` package is missing), state stays in process memory and a warning
+is logged.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import chainlit as cl
+
+if TYPE_CHECKING:
+    from llama_index.core.memory import ChatMemoryBuffer
+
+logger = logging.getLogger(__name__)
+
+# Session state backend: "sqlite", "redis" or "none"
+SESSION_STATE_BACKEND = os.getenv("SESSION_STATE_BACKEND", "sqlite").strip().lower()
+
+_session_state_path_str = os.getenv(
+    "SESSION_STATE_PATH", "./.local/data/session_state.db"
+)
+SESSION_STATE_PATH = Path(_session_state_path_str).resolve()
+
+SESSION_STATE_REDIS_URL = os.getenv(
+    "SESSION_STATE_REDIS_URL", "redis://localhost:6379/0"
+)
+
+# Seconds of inactivity after which a session's state is discarded
+SESSION_STATE_TTL_SECONDS = int(
+    os.getenv("SESSION_STATE_TTL_SECONDS", str(7 * 24 * 3600))
+)
+
+# Token limit for chat memories rebuilt from stored history
+MEMORY_TOKEN_LIMIT = 3000
+
+
+class SessionStateStore(ABC):
+    """Key-value store of JSON-serializable session state, keyed by thread id."""
+
+    @abstractmethod
+    async def load(self, session_key: str) -> dict[str, Any] | None:
+        """Return the stored state for a session, or None if there is none."""
+
+    @abstractmethod
+    async def save(self, session_key: str, state: dict[str, Any]) -> None:
+        """Replace the stored state for a session."""
+
+    @abstractmethod
+    async def delete(self, session_key: str) -> None:
+        """Remove the stored state for a session."""
+
+
+class SQLiteSessionStateStore(SessionStateStore):
+    """
+    Session state in a local SQLite database.
+
+    WAL mode lets workers on the same host read concurrently while one writes.
+    Blocking calls run in a worker thread.
+    """
+
+    def __init__(
+        self, path: Path, ttl_seconds: int = SESSION_STATE_TTL_SECONDS
+    ) -> None:
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_state (
+                    session_key TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            # Expired sessions are dropped on startup; loads also ignore them
+            conn.execute(
+                "DELETE FROM session_state WHERE updated_at < ?",
+                (time.time() - ttl_seconds,),
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _load(self, session_key: str) -> dict[str, Any] | None:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT state, updated_at FROM session_state WHERE session_key = ?",
+                (session_key,),
+            ).fetchone()
+        if row is None or row[1] < time.time() - self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def _save(self, session_key: str, state: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT INTO session_state (session_key, state, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(session_key) DO UPDATE SET
+                    state = excluded.state, updated_at = excluded.updated_at
+                """,
+                (session_key, state, time.time()),
+            )
+
+    def _delete(self, session_key: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM session_state WHERE session_key = ?", (session_key,)
+            )
+
+    async def load(self, session_key: str) -> dict[str, Any] | None:
+        return await asyncio.to_thread(self._load, session_key)
+
+    async def save(self, session_key: str, state: dict[str, Any]) -> None:
+        await asyncio.to_thread(self._save, session_key, json.dumps(state))
+
+    async def delete(self, session_key: str) -> None:
+        await asyncio.to_thread(self._delete, session_key)
+
+
+class RedisSessionStateStore(SessionStateStore):
+    """Session state in a Redis-protocol server, one JSON string per session."""
+
+    def __init__(self, url: str, ttl_seconds: int = SESSION_STATE_TTL_SECONDS) -> None:
+        try:
+            from redis import asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError(
+                "SESSION_STATE_BACKEND=redis requires the redis package. "
+                "Install it with: pip install 'chainlit-bootstrap[redis]'"
+            ) from e
+        self.ttl_seconds = ttl_seconds
+        self._client = redis_asyncio.from_url(url)
+
+    @staticmethod
+    def _key(session_key: str) -> str:
+        return f"session_state:{session_key}"
+
+    async def load(self, session_key: str) -> dict[str, Any] | None:
+        raw = await self._client.get(self._key(session_key))
+        return None if raw is None else json.loads(raw)
+
+    async def save(self, session_key: str, state: dict[str, Any]) -> None:
+        await self._client.set(
+            self._key(session_key), json.dumps(state), ex=self.ttl_seconds
+        )
+
+    async def delete(self, session_key: str) -> None:
+        await self._client.delete(self._key(session_key))
+
+
+def create_session_state_store() -> SessionStateStore | None:
+    """Create the store selected by SESSION_STATE_BACKEND, or None to disable."""
+    if SESSION_STATE_BACKEND in ("none", "memory", ""):
+        return None
+    if SESSION_STATE_BACKEND == "sqlite":
+        return SQLiteSessionStateStore(SESSION_STATE_PATH)
+    if SESSION_STATE_BACKEND == "redis":
+        return RedisSessionStateStore(SESSION_STATE_REDIS_URL)
+    raise ValueError(
+        f"Unknown SESSION_STATE_BACKEND '{SESSION_STATE_BACKEND}'. "
+        "Use sqlite, redis or none."
+    )
+
+
+def _dump_memory(memory: "ChatMemoryBuffer") -> list[dict[str, Any]]:
+    return [message.model_dump(mode="json") for message in memory.get_all()]
+
+
+def _load_memory(messages: list[dict[str, Any]]) -> "ChatMemoryBuffer":
+    from llama_index.core.llms import ChatMessage
+    from llama_index.core.memory import ChatMemoryBuffer
+
+    return ChatMemoryBuffer.from_defaults(
+        chat_history=[ChatMessage.model_validate(message) for message in messages],
+        token_limit=MEMORY_TOKEN_LIMIT,
+    )
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+# Session keys shared across workers, with (dump, load) converters for values
+# that are not JSON-serializable as-is
+PERSISTED_KEYS: dict[str, tuple[Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "active_assistant": (_identity, _identity),
+    "healthcare_scheduling_state": (_identity, _identity),
+    "index_snapshot": (_identity, _identity),
+    "file_names": (_identity, _identity),
+    "file_name": (_identity, _identity),
+    "content_hashes": (_identity, _identity),
+    "document_hash": (_identity, _identity),
+    "general_memory": (_dump_memory, _load_memory),
+    "document_memory": (_dump_memory, _load_memory),
+}
+
+
+class SessionStateSync:
+    """Loads ``cl.user_session`` from the shared store and saves it back."""
+
+    def __init__(
+        self,
+        store_factory: Callable[
+            [], SessionStateStore | None
+        ] = create_session_state_store,
+    ) -> None:
+        self._store_factory = store_factory
+        self._store: SessionStateStore | None = None
+        self._store_created = False
+        self._store_lock = asyncio.Lock()
+
+    async def get_store(self) -> SessionStateStore | None:
+        """The shared store, created on first call; None if disabled or unavailable."""
+        if self._store_created:
+            return self._store
+        async with self._store_lock:
+            if not self._store_created:
+                try:
+                    # The SQLite store opens and prepares its database
+                    self._store = await asyncio.to_thread(self._store_factory)
+                except Exception as e:
+                    logger.warning(
+                        f"Session state store unavailable, keeping state in process "
+                        f"memory only: {e}"
+                    )
+                self._store_created = True
+        return self._store
+
+    @staticmethod
+    def _session_key() -> str | None:
+        return cl.context.session.thread_id
+
+    async def restore(self) -> None:
+        """Replace local session state with the shared copy, if one exists."""
+        session_key = self._session_key()
+        if not session_key:
+            return
+        store = await self.get_store()
+        if store is None:
+            return
+        try:
+            state = await store.load(session_key)
+        except Exception as e:
+            logger.warning(f"Failed to load session state for {session_key}: {e}")
+            return
+        if state is None:
+            return
+
+        # Indexes and chat engines are not stored; they are rebuilt on demand from
+        # the index snapshot and the chat memory restored below
+        if state.get("index_snapshot") != cl.user_session.get("index_snapshot"):
+            # Another worker ingested documents since this one last saw the session
+            for key in ("index", "lexical_index"):
+                cl.user_session.set(key, None)
+        # Chat engines hold a reference to the memory object replaced below
+        cl.user_session.set("chat_engine", None)
+
+        for key, (_, load) in PERSISTED_KEYS.items():
+            if key in state:
+                value = state[key]
+                cl.user_session.set(key, None if value is None else load(value))
+
+    async def persist(self) -> None:
+        """Write the persisted subset of the local session state to the store."""
+        session_key = self._session_key()
+        if not session_key:
+            return
+        store = await self.get_store()
+        if store is None:
+            return
+        state = {}
+        for key, (dump, _) in PERSISTED_KEYS.items():
+            value = cl.user_session.get(key)
+            state[key] = None if value is None else dump(value)
+        try:
+            await store.save(session_key, state)
+        except Exception as e:
+            logger.warning(f"Failed to save session state for {session_key}: {e}")
+
+
+session_state = SessionStateSync()
@@ -0,0 +1,242 @@
+"""On-disk snapshots of session document indexes.
+
+A snapshot is a directory holding everything needed to answer questions about a
+thread's documents without re-embedding them:
+
+- ``manifest.json``: format version, vector dtype, counts and document names/hashes
+- ``vectors.npy`` (and ``scales.npy`` for int8): encoded embeddings, loaded with
+  ``mmap_mode="r"`` so rehydration does not read them into memory up front
+- ``texts.bin`` + ``text_offsets.npy``: concatenated UTF-8 node text and offsets.
+  ``texts.bin`` is memory-mapped too: a rehydrated index keeps nodes without
+  their text and decodes a node's text only when it is retrieved
+- ``nodes.jsonl``: node ids, source document ids and metadata
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import (
+    BaseNode,
+    NodeRelationship,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from .llm import embeddings
+from .retrieval import BM25Index
+from .vector_store import COMPACT_DTYPES, SESSION_VECTOR_STORE, CompactVectorStore
+
+logger = logging.getLogger(__name__)
+
+_snapshot_dir_str = os.getenv("INDEX_SNAPSHOT_DIR", "./.local/data/index_snapshots/")
+INDEX_SNAPSHOT_DIR = Path(_snapshot_dir_str).resolve()
+
+# Snapshots of Chroma-backed indexes are stored in this compact encoding
+SNAPSHOT_DTYPE = (
+    SESSION_VECTOR_STORE if SESSION_VECTOR_STORE in COMPACT_DTYPES else "float16"
+)
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+@dataclass
+class SnapshotManifest:
+    """Description of a saved index snapshot."""
+
+    dtype: str
+    count: int
+    file_names: list[str] = field(default_factory=list)
+    content_hashes: list[str] = field(default_factory=list)
+    version: int = SNAPSHOT_FORMAT_VERSION
+
+
+class _MappedTexts(Sequence[str]):
+    """Node text in a snapshot's ``texts.bin``, decoded one node at a time."""
+
+    def __init__(self, path: Path):
+        self._offsets = np.load(path / "text_offsets.npy")
+        # np.memmap refuses empty files
+        self._data = (
+            np.memmap(path / "texts.bin", dtype=np.uint8, mode="r")
+            if self._offsets[-1]
+            else np.zeros(0, dtype=np.uint8)
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return self._data[start:end].tobytes().decode("utf-8")
+
+
+def _snapshot_path(snapshot_id: str) -> Path:
+    # Snapshot ids are generated by new_snapshot_id; refuse anything path-like
+    if not snapshot_id or Path(snapshot_id).name != snapshot_id:
+        raise ValueError(f"Invalid snapshot id: {snapshot_id!r}")
+    return INDEX_SNAPSHOT_DIR / snapshot_id
+
+
+def new_snapshot_id(thread_id: str | None) -> str:
+    """Return a fresh snapshot id, prefixed with the thread id when known."""
+    prefix = Path(thread_id).name if thread_id else "session"
+    return f"{prefix}-{uuid.uuid4().hex[:12]}"
+
+
+def _export_compact(
+    index: VectorStoreIndex,
+) -> tuple[str, np.ndarray | None, np.ndarray | None, list[BaseNode]]:
+    """Return (dtype, vectors, scales, nodes) for any supported session index."""
+    store = index.vector_store
+    if isinstance(store, CompactVectorStore):
+        return (store.dtype, *store.export())
+
+    # Chroma: pull stored embeddings back out and encode them compactly
+    result = store.client.get(include=["embeddings", "documents", "metadatas"])
+    nodes = []
+    for text, metadata, embedding in zip(
+        result["documents"], result["metadatas"], result["embeddings"], strict=True
+    ):
+        node = metadata_dict_to_node(metadata, text=text)
+        node.embedding = list(embedding)
+        nodes.append(node)
+    compact = CompactVectorStore(dtype=SNAPSHOT_DTYPE)
+    compact.add(nodes)
+    return (SNAPSHOT_DTYPE, *compact.export())
+
+
+def save_index_snapshot(
+    index: VectorStoreIndex,
+    snapshot_id: str,
+    file_names: list[str],
+    content_hashes: list[str],
+) -> SnapshotManifest:
+    """
+    Write a snapshot of the index to disk.
+
+    The snapshot is written to a temporary directory and renamed into place, so a
+    crash never leaves a partially written snapshot under its final id.
+    """
+    dtype, vectors, scales, nodes = _export_compact(index)
+    final_path = _snapshot_path(snapshot_id)
+    tmp_path = INDEX_SNAPSHOT_DIR / f".tmp-{snapshot_id}"
+    tmp_path.mkdir(parents=True, exist_ok=False)
+
+    try:
+        if vectors is not None:
+            np.save(tmp_path / "vectors.npy", vectors)
+        if scales is not None:
+            np.save(tmp_path / "scales.npy", scales)
+
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        with (
+            open(tmp_path / "texts.bin", "wb") as texts,
+            open(tmp_path / "nodes.jsonl", "w", encoding="utf-8") as records,
+        ):
+            for position, node in enumerate(nodes):
+                encoded = node.get_content().encode("utf-8")
+                texts.write(encoded)
+                offsets[position + 1] = offsets[position] + len(encoded)
+                record = {
+                    "id": node.node_id,
+                    "ref_doc_id": node.ref_doc_id,
+                    "metadata": node.metadata,
+                }
+                records.write(json.dumps(record, ensure_ascii=False) + "\n")
+        np.save(tmp_path / "text_offsets.npy", offsets)
+
+        manifest = SnapshotManifest(
+            dtype=dtype,
+            count=len(nodes),
+            file_names=list(file_names),
+            content_hashes=list(content_hashes),
+        )
+        (tmp_path / "manifest.json").write_text(
+            json.dumps(asdict(manifest), indent=2), encoding="utf-8"
+        )
+        os.replace(tmp_path, final_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    logger.info(f"Saved index snapshot {snapshot_id} ({manifest.count} nodes, {dtype})")
+    return manifest
+
+
+def load_index_snapshot(
+    snapshot_id: str,
+) -> tuple[VectorStoreIndex, BM25Index, SnapshotManifest] | None:
+    """
+    Rehydrate a session index from a snapshot without re-embedding.
+
+    Returns None if the snapshot does not exist or was written by an incompatible
+    version.
+    """
+    path = _snapshot_path(snapshot_id)
+    manifest_path = path / "manifest.json"
+    if not manifest_path.exists():
+        logger.warning(f"Index snapshot {snapshot_id} not found at {path}")
+        return None
+
+    manifest = SnapshotManifest(**json.loads(manifest_path.read_text(encoding="utf-8")))
+    if manifest.version != SNAPSHOT_FORMAT_VERSION:
+        logger.warning(
+            f"Index snapshot {snapshot_id} has format version {manifest.version}, "
+            f"expected {SNAPSHOT_FORMAT_VERSION}. Ignoring it."
+        )
+        return None
+
+    nodes: list[BaseNode] = []
+    texts: _MappedTexts | None = None
+    if manifest.count:
+        texts = _MappedTexts(path)
+        with open(path / "nodes.jsonl", encoding="utf-8") as records:
+            for line in records:
+                record = json.loads(line)
+                relationships = {}
+                if record["ref_doc_id"]:
+                    relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+                        node_id=record["ref_doc_id"]
+                    )
+                nodes.append(
+                    TextNode(
+                        id_=record["id"],
+                        text="",
+                        metadata=record["metadata"],
+                        relationships=relationships,
+                    )
+                )
+
+    if not manifest.count:
+        store = CompactVectorStore(dtype=manifest.dtype)
+    else:
+        scales_path = path / "scales.npy"
+        store = CompactVectorStore.from_arrays(
+            manifest.dtype,
+            np.load(path / "vectors.npy", mmap_mode="r"),
+            np.load(scales_path, mmap_mode="r") if scales_path.exists() else None,
+            nodes,
+            texts=texts,
+        )
+
+    lexical_index = BM25Index()
+    lexical_index.add_nodes(nodes, texts=texts)
+    index = VectorStoreIndex.from_vector_store(store, embed_model=embeddings)
+    logger.info(f"Rehydrated index snapshot {snapshot_id} ({manifest.count} nodes)")
+    return index, lexical_index, manifest
+
+
+def delete_index_snapshot(snapshot_id: str) -> None:
+    """Remove a snapshot directory if it exists."""
+    shutil.rmtree(_snapshot_path(snapshot_id), ignore_errors=True)
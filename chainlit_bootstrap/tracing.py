@@ -0,0 +1,326 @@
+"""Lightweight nestable tracing spans for pipeline stages.
+
+Wrap a stage in :func:`span` to time it::
+
+    with span("audio.whisper", bytes=size) as s:
+        ...
+        s.set_attribute("cached", False)
+
+Spans nest through a context variable, so children opened in ``asyncio`` tasks or
+in ``asyncio.to_thread`` workers attach to the enclosing span. Finished spans are
+appended by a background thread to ``TRACE_EXPORT_PATH``, either as one flat JSON
+object per span (``jsonl``) or as one OTLP/JSON ``ExportTraceServiceRequest`` per
+line (``otlp``), which the OpenTelemetry collector's file receiver and most trace
+viewers can import.
+
+:func:`collect_spans` gathers the spans finished inside a block as plain dicts,
+so they can travel with a job result and be shown later with
+:func:`render_span_steps` as collapsed Chainlit steps.
+
+When neither ``TRACING_ENABLED`` nor ``TRACE_STEPS`` is set, :func:`span` returns a
+shared no-op object and costs a single function call.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+import chainlit as cl
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "0").strip().lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Render collected spans as collapsible steps in the chat
+TRACE_STEPS = os.getenv("TRACE_STEPS", "0").strip().lower() in ("1", "true", "yes")
+
+_trace_export_path_str = os.getenv(
+    "TRACE_EXPORT_PATH", "./.local/data/traces/spans.jsonl"
+)
+TRACE_EXPORT_PATH = Path(_trace_export_path_str).resolve()
+
+# Export format: "jsonl" (flat span objects) or "otlp" (OTLP/JSON requests)
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "jsonl").strip().lower()
+
+SERVICE_NAME = "chainlit-bootstrap"
+
+_recording = TRACING_ENABLED or TRACE_STEPS
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_collector: ContextVar[list[dict[str, Any]] | None] = ContextVar(
+    "span_collector", default=None
+)
+
+
+class Span:
+    """A timed, attributed unit of work."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start_ns",
+        "end_ns",
+        "attributes",
+        "error",
+    )
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: str | None, attributes: dict
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.error: str | None = None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+    def to_otlp(self) -> dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [_otlp_attribute("service.name", SERVICE_NAME)]
+                    },
+                    "scopeSpans": [{"scope": {"name": __name__}, "spans": [span]}],
+                }
+            ]
+        }
+
+
+def _otlp_attribute(key: str, value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+class _SpanScope:
+    """Context manager that opens a span, makes it current and records it on exit."""
+
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, name: str, trace_id: str | None, attributes: dict) -> None:
+        parent = _current_span.get()
+        if trace_id is None:
+            trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self._span = Span(
+            name, trace_id, parent.span_id if parent is not None else None, attributes
+        )
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        span = self._span
+        span.end_ns = time.time_ns()
+        if exc is not None:
+            span.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        _finish(span)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(
+    name: str, trace_id: str | None = None, **attributes: Any
+) -> _SpanScope | _NoopSpan:
+    """
+    Time the enclosed block as a span named ``name``.
+
+    Args:
+        name: Stage name, dotted by component (e.g. ``audio.whisper``)
+        trace_id: 32-hex-digit trace id for a root span; inherited by default
+        **attributes: Initial span attributes
+    """
+    if not _recording:
+        return _NOOP_SPAN
+    return _SpanScope(name, trace_id, attributes)
+
+
+class collect_spans:
+    """Collect the spans finished inside the block, as dicts, into the yielded list."""
+
+    __slots__ = ("spans", "_token")
+
+    def __init__(self) -> None:
+        self.spans: list[dict[str, Any]] = []
+        self._token = None
+
+    def __enter__(self) -> list[dict[str, Any]]:
+        if _recording:
+            self._token = _collector.set(self.spans)
+        return self.spans
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._token is not None:
+            _collector.reset(self._token)
+
+
+class _SpanWriter:
+    """Appends exported spans to a file from a background thread."""
+
+    def __init__(self, path: Path, fmt: str) -> None:
+        self.path = path
+        self.format = fmt
+        self._queue: queue.SimpleQueue[Span | None] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, span: Span) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    self._thread = threading.Thread(
+                        target=self._run, name="span-writer", daemon=True
+                    )
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            spans = [s for s in batch if s is not None]
+            if spans:
+                try:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        for s in spans:
+                            record = (
+                                s.to_otlp() if self.format == "otlp" else s.to_dict()
+                            )
+                            f.write(json.dumps(record, default=str) + "\n")
+                except OSError as e:
+                    logger.warning(
+                        f"Failed to export {len(spans)} spans to {self.path}: {e}"
+                    )
+            if None in batch:
+                return
+
+    def close(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+_writer = _SpanWriter(TRACE_EXPORT_PATH, TRACE_FORMAT) if TRACING_ENABLED else None
+
+
+def _finish(span: Span) -> None:
+    if _writer is not None:
+        _writer.submit(span)
+    collected = _collector.get()
+    if collected is not None:
+        collected.append(span.to_dict())
+
+
+def _iso(ns: int) -> str:
+    return datetime.fromtimestamp(ns / 1e9, tz=UTC).isoformat().replace("+00:00", "Z")
+
+
+async def render_span_steps(spans: list[dict[str, Any]], title: str) -> None:
+    """Show collected spans as a collapsed step tree with durations (if TRACE_STEPS)."""
+    if not TRACE_STEPS or not spans:
+        return
+    spans = sorted(spans, key=lambda s: s["start_ns"])
+    total_ms = (max(s["end_ns"] for s in spans) - spans[0]["start_ns"]) / 1e6
+    root = cl.Step(name=f"{title} ({total_ms:.0f} ms)", type="run", default_open=False)
+    root.start = _iso(spans[0]["start_ns"])
+    root.end = _iso(max(s["end_ns"] for s in spans))
+    await root.send()
+
+    known = {s["span_id"] for s in spans}
+    step_ids = {}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in known else None
+        step = cl.Step(
+            name=f"{s['name']} ({s['duration_ms']:.0f} ms)",
+            type="tool",
+            parent_id=step_ids.get(parent, root.id),
+            default_open=False,
+        )
+        step.start = _iso(s["start_ns"])
+        step.end = _iso(s["end_ns"])
+        step.is_error = bool(s.get("error"))
+        details = dict(s["attributes"])
+        if s.get("error"):
+            details["error"] = s["error"]
+        step.output = json.dumps(details, default=str) if details else ""
+        # Parents start before their children, so their steps already exist
+        step_ids[s["span_id"]] = step.id
+        await step.send()
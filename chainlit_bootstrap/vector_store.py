@@ -0,0 +1,369 @@
+"""Compact in-memory vector store with float16 or int8-quantized embeddings."""
+
+import logging
+import os
+from collections.abc import Sequence
+from threading import Lock
+from typing import Any
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore,
+    FilterCondition,
+    FilterOperator,
+    MetadataFilters,
+    VectorStoreQuery,
+    VectorStoreQueryResult,
+)
+
+logger = logging.getLogger(__name__)
+
+# Backend for per-session document indexes: "chroma", "float16" or "int8"
+SESSION_VECTOR_STORE = os.getenv("SESSION_VECTOR_STORE", "chroma").strip().lower()
+
+COMPACT_DTYPES = ("float16", "int8")
+
+# Rows scored per block at query time, bounding the float32 scratch memory
+_QUERY_BLOCK_ROWS = 1024
+
+_INITIAL_CAPACITY = 64
+
+# Metadata filter operators applied as exact comparisons against node metadata
+_EXACT_OPERATORS = (
+    FilterOperator.EQ,
+    FilterOperator.NE,
+    FilterOperator.IN,
+    FilterOperator.NIN,
+)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _check_filters(filters: MetadataFilters) -> None:
+    """Raise ValueError for filters this store can't apply exactly."""
+    if filters.condition not in (FilterCondition.AND, FilterCondition.OR, None):
+        raise ValueError(
+            f"Unsupported metadata filter condition '{filters.condition}' for "
+            "CompactVectorStore; use AND or OR"
+        )
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            _check_filters(item)
+        elif item.operator not in _EXACT_OPERATORS:
+            raise ValueError(
+                f"Unsupported metadata filter operator '{item.operator.value}' for "
+                "CompactVectorStore; use ==, !=, in or nin"
+            )
+
+
+def _matches(metadata: dict[str, Any], filters: MetadataFilters) -> bool:
+    results = []
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            results.append(_matches(metadata, item))
+            continue
+        value = metadata.get(item.key)
+        if item.operator == FilterOperator.EQ:
+            results.append(item.key in metadata and value == item.value)
+        elif item.operator == FilterOperator.NE:
+            results.append(value != item.value)
+        elif item.operator == FilterOperator.IN:
+            results.append(item.key in metadata and value in item.value)
+        else:
+            results.append(value not in item.value)
+    if filters.condition == FilterCondition.OR:
+        return any(results)
+    return all(results)
+
+
+class CompactVectorStore(BasePydanticVectorStore):
+    """
+    Vector store that keeps unit-normalized embeddings in one contiguous NumPy array.
+
+    ``dtype="float16"`` halves memory versus float32. ``dtype="int8"`` stores each
+    vector symmetrically quantized with its own float32 scale, using roughly a
+    quarter of the memory. Queries are exact cosine-similarity top-k scans, done in
+    fixed-size row blocks with ``np.argpartition``.
+
+    Metadata filters are applied as exact comparisons (``==``, ``!=``, ``in``,
+    ``nin``, combined with AND or OR); other operators raise ``ValueError``.
+    """
+
+    stores_text: bool = True
+    dtype: str = "float16"
+
+    _vectors: np.ndarray | None = PrivateAttr(default=None)
+    _scales: np.ndarray | None = PrivateAttr(default=None)
+    _count: int = PrivateAttr(default=0)
+    _nodes: list[BaseNode] = PrivateAttr(default_factory=list)
+    # Text of nodes stored without it (snapshot rows, or -1 for nodes added later)
+    _texts: Sequence[str] | None = PrivateAttr(default=None)
+    _text_rows: list[int] = PrivateAttr(default_factory=list)
+    _lock: Lock = PrivateAttr(default_factory=Lock)
+
+    def __init__(self, dtype: str = "float16", **kwargs: Any) -> None:
+        if dtype not in COMPACT_DTYPES:
+            raise ValueError(
+                f"Unsupported compact vector dtype '{dtype}'. Use one of {COMPACT_DTYPES}."
+            )
+        super().__init__(dtype=dtype, **kwargs)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CompactVectorStore"
+
+    @classmethod
+    def from_arrays(
+        cls,
+        dtype: str,
+        vectors: np.ndarray,
+        scales: np.ndarray | None,
+        nodes: list[BaseNode],
+        texts: Sequence[str] | None = None,
+    ) -> "CompactVectorStore":
+        """
+        Build a store around already-encoded arrays without copying them.
+
+        The arrays may be read-only memory maps; they are copied into memory only
+        when the store is first modified. If ``texts`` is given, ``nodes`` are
+        stored without their text and ``texts[i]`` is read for node ``i`` only when
+        it is returned.
+        """
+        if len(vectors) != len(nodes):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(nodes)} nodes")
+        store = cls(dtype=dtype)
+        store._vectors = vectors
+        store._scales = scales
+        store._nodes = list(nodes)
+        store._count = len(nodes)
+        if texts is not None:
+            store._texts = texts
+            store._text_rows = list(range(len(nodes)))
+        return store
+
+    def _with_text(self, position: int) -> BaseNode:
+        """The stored node at ``position``, with its text if it was stored without it."""
+        node = self._nodes[position]
+        if self._texts is None or self._text_rows[position] < 0:
+            return node
+        return node.model_copy(update={"text": self._texts[self._text_rows[position]]})
+
+    def export(self) -> tuple[np.ndarray | None, np.ndarray | None, list[BaseNode]]:
+        """Return copies of the encoded vectors, scales and stored nodes."""
+        with self._lock:
+            if self._vectors is None:
+                return None, None, []
+            vectors = np.array(self._vectors[: self._count])
+            scales = (
+                None if self._scales is None else np.array(self._scales[: self._count])
+            )
+            return vectors, scales, [self._with_text(i) for i in range(self._count)]
+
+    @property
+    def client(self) -> None:
+        return None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        # StorageContext.from_defaults tests ``if vector_store:``; an empty store
+        # must not be mistaken for "no store" and swapped for a SimpleVectorStore
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by stored vectors and scales (excluding spare capacity)."""
+        if self._vectors is None:
+            return 0
+        row_bytes = self._vectors.itemsize * self._vectors.shape[1]
+        if self._scales is not None:
+            row_bytes += self._scales.itemsize
+        return row_bytes * self._count
+
+    def _encode(self, vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray | None]:
+        vectors = _normalize_rows(vectors.astype(np.float32, copy=False))
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), None
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(vectors / scales[:, np.newaxis]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+
+    def _ensure_capacity(self, needed: int, dim: int) -> None:
+        if self._vectors is None:
+            capacity = max(_INITIAL_CAPACITY, needed)
+            self._vectors = np.empty((capacity, dim), dtype=self.dtype)
+            if self.dtype == "int8":
+                self._scales = np.empty(capacity, dtype=np.float32)
+            return
+        if self._vectors.shape[1] != dim:
+            raise ValueError(
+                f"Embedding dimension {dim} does not match store dimension "
+                f"{self._vectors.shape[1]}"
+            )
+        capacity = self._vectors.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.empty((capacity, dim), dtype=self.dtype)
+        vectors[: self._count] = self._vectors[: self._count]
+        self._vectors = vectors
+        if self._scales is not None:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[: self._count] = self._scales[: self._count]
+            self._scales = scales
+
+    def add(self, nodes: list[BaseNode], **add_kwargs: Any) -> list[str]:
+        """Add embedded nodes to the store."""
+        if not nodes:
+            return []
+        embeddings = np.asarray(
+            [node.get_embedding() for node in nodes], dtype=np.float32
+        )
+        encoded, scales = self._encode(embeddings)
+
+        with self._lock:
+            start = self._count
+            end = start + len(nodes)
+            self._ensure_capacity(end, encoded.shape[1])
+            self._vectors[start:end] = encoded
+            if scales is not None:
+                self._scales[start:end] = scales
+            for node in nodes:
+                # The quantized copy above is the only embedding we keep
+                stored = node.model_copy()
+                stored.embedding = None
+                self._nodes.append(stored)
+            if self._texts is not None:
+                self._text_rows.extend([-1] * len(nodes))
+            self._count = end
+        return [node.node_id for node in nodes]
+
+    def _delete_where(self, keep: np.ndarray) -> None:
+        kept = int(keep.sum())
+        if kept == self._count:
+            return
+        if not self._vectors.flags.writeable:
+            # Detach from a read-only memory map before compacting in place
+            self._vectors = np.array(self._vectors)
+            if self._scales is not None:
+                self._scales = np.array(self._scales)
+        self._vectors[:kept] = self._vectors[: self._count][keep]
+        if self._scales is not None:
+            self._scales[:kept] = self._scales[: self._count][keep]
+        self._nodes = [node for node, k in zip(self._nodes, keep, strict=True) if k]
+        if self._texts is not None:
+            self._text_rows = [
+                row for row, k in zip(self._text_rows, keep, strict=True) if k
+            ]
+        self._count = kept
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        """Delete all nodes that came from the given source document."""
+        with self._lock:
+            keep = np.array(
+                [node.ref_doc_id != ref_doc_id for node in self._nodes], dtype=bool
+            )
+            if keep.size:
+                self._delete_where(keep)
+
+    def delete_nodes(
+        self,
+        node_ids: list[str] | None = None,
+        filters: Any = None,
+        **delete_kwargs: Any,
+    ) -> None:
+        """Delete nodes by id, by metadata filters, or matching both."""
+        if filters is not None:
+            _check_filters(filters)
+        elif not node_ids:
+            return
+        doomed = set(node_ids or [])
+        with self._lock:
+            keep = np.array(
+                [
+                    not (
+                        (not doomed or node.node_id in doomed)
+                        and (filters is None or _matches(node.metadata, filters))
+                    )
+                    for node in self._nodes
+                ],
+                dtype=bool,
+            )
+            if keep.size:
+                self._delete_where(keep)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._scales = None
+            self._nodes = []
+            self._texts = None
+            self._text_rows = []
+            self._count = 0
+
+    def _scores(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        block = self._vectors[start:end]
+        if self._scales is None:
+            return block.astype(np.float32) @ query
+        return (block.astype(np.float32) @ query) * self._scales[start:end]
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        """Return the ``similarity_top_k`` nodes with the highest cosine similarity."""
+        if query.filters is not None:
+            _check_filters(query.filters)
+        if query.query_embedding is None:
+            raise ValueError("CompactVectorStore requires a query embedding")
+
+        query_vector = _normalize_rows(
+            np.asarray([query.query_embedding], dtype=np.float32)
+        )[0]
+
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, _QUERY_BLOCK_ROWS):
+                end = min(start + _QUERY_BLOCK_ROWS, count)
+                scores[start:end] = self._scores(query_vector, start, end)
+
+            if (
+                query.node_ids is not None
+                or query.doc_ids is not None
+                or query.filters is not None
+            ):
+                node_ids = set(query.node_ids or [])
+                doc_ids = set(query.doc_ids or [])
+                allowed = np.array(
+                    [
+                        (not node_ids or node.node_id in node_ids)
+                        and (not doc_ids or node.ref_doc_id in doc_ids)
+                        and (
+                            query.filters is None
+                            or _matches(node.metadata, query.filters)
+                        )
+                        for node in self._nodes
+                    ],
+                    dtype=bool,
+                )
+                scores[~allowed] = -np.inf
+
+            top_k = min(query.similarity_top_k, count)
+            top = np.argpartition(scores, -top_k)[-top_k:]
+            top = top[np.argsort(scores[top])[::-1]]
+            top = top[np.isfinite(scores[top])]
+            nodes = [self._with_text(idx) for idx in top]
+        return VectorStoreQueryResult(
+            nodes=nodes,
+            similarities=[float(scores[idx]) for idx in top],
+            ids=[node.node_id for node in nodes],
+        )
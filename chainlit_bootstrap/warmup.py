@@ -0,0 +1,74 @@
+"""Background pre-warming of modules that are otherwise imported on first use.
+
+llama-index, chromadb, matplotlib and the OpenAI SDK take several seconds to
+import, so ``handlers`` imports them lazily and the server starts without them.
+Shortly after startup this module imports them in a worker thread, one at a
+time, so the first chat, upload or chart request doesn't pay for the import.
+Set ``PREWARM_ENABLED=0`` (e.g. for ``--watch`` reloads) to keep them lazy.
+"""
+
+import asyncio
+import contextlib
+import importlib
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1").strip().lower() not in (
+    "0",
+    "false",
+    "no",
+    "",
+)
+
+# Seconds to wait after startup before importing, so the server is accepting connections
+PREWARM_DELAY_SECONDS = float(os.getenv("PREWARM_DELAY_SECONDS", "1.0"))
+
+# Comma-separated modules to import, most commonly needed first
+PREWARM_MODULES = [
+    name.strip()
+    for name in os.getenv(
+        "PREWARM_MODULES",
+        "chainlit_bootstrap.llm,chainlit_bootstrap.atc_parser,chainlit_bootstrap.snapshots,"
+        "chainlit_bootstrap.ingestion,openai,chainlit_bootstrap.charts,tavily",
+    ).split(",")
+    if name.strip()
+]
+
+_prewarm_task: asyncio.Task | None = None
+
+
+async def _prewarm() -> None:
+    await asyncio.sleep(PREWARM_DELAY_SECONDS)
+    started = time.perf_counter()
+    for name in PREWARM_MODULES:
+        module_started = time.perf_counter()
+        try:
+            # Imports hold the GIL but not the event loop, which keeps serving meanwhile
+            await asyncio.to_thread(importlib.import_module, name)
+        except Exception as e:
+            logger.warning(f"Failed to prewarm {name}: {e}")
+            continue
+        logger.debug(f"Prewarmed {name} in {time.perf_counter() - module_started:.2f}s")
+    logger.info(
+        f"Prewarmed {len(PREWARM_MODULES)} modules in {time.perf_counter() - started:.2f}s"
+    )
+
+
+def start_prewarm() -> None:
+    """Import heavy modules in the background after startup (if PREWARM_ENABLED)."""
+    global _prewarm_task
+    if not PREWARM_ENABLED or _prewarm_task is not None:
+        return
+    _prewarm_task = asyncio.create_task(_prewarm())
+
+
+async def stop_prewarm() -> None:
+    global _prewarm_task
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _prewarm_task
+        _prewarm_task = None
@@ -1,24 +1,47 @@
-export default function CollapsibleSection(props) {
-  // Chainlit passes props as an object
-  // Handle both direct props and nested props structure
-  const title = props?.title || props?.props?.title || 'Click to expand';
-  const content = props?.content || props?.props?.content || '';
-  
-  // Debug: log props to console to help diagnose
-  if (typeof window !== 'undefined' && window.console) {
-    console.log('CollapsibleSection all props:', JSON.stringify(props, null, 2));
-    console.log('CollapsibleSection title:', title);
-    console.log('CollapsibleSection content:', content);
-    console.log('CollapsibleSection content type:', typeof content);
-    console.log('CollapsibleSection content length:', content?.length);
-  }
-  
+import { useState } from 'react';
+
+export default function CollapsibleSection(elementProps) {
+  // Chainlit injects element props as a global `props`; older versions passed them
+  // as an argument (sometimes nested under `props`)
+  const data =
+    (typeof props !== 'undefined' && props) || elementProps?.props || elementProps || {};
+  const title = data.title || 'Click to expand';
+  // New messages carry an artifact reference, fetched on first open; threads saved
+  // before that carry the text inline
+  const [content, setContent] = useState(data.content || '');
+  const [status, setStatus] = useState(data.content || !data.artifact ? 'ready' : 'idle');
+
+  const onToggle = (event) => {
+    if (!event.currentTarget.open || status !== 'idle') {
+      return;
+    }
+    setStatus('loading');
+    fetch(`/artifacts/${encodeURIComponent(data.artifact)}`, { credentials: 'same-origin' })
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`HTTP ${response.status}`);
+        }
+        return response.text();
+      })
+      .then((text) => {
+        setContent(text);
+        setStatus('ready');
+      })
+      .catch((error) => {
+        setContent(`Failed to load content: ${error.message}`);
+        // Allow a retry on the next open
+        setStatus('idle');
+      });
+  };
+
+  const body = status === 'loading' ? 'Loading…' : content || '(No content provided)';
+
   return (
-    <details className="collapsible-section" style={{ marginTop: '8px' }}>
-      <summary 
+    <details className="collapsible-section" style={{ marginTop: '8px' }} onToggle={onToggle}>
+      <summary
         className="collapsible-header"
-        style={{ 
-          cursor: 'pointer', 
+        style={{
+          cursor: 'pointer',
           userSelect: 'none',
           fontWeight: '500',
           padding: '4px 0'
@@ -27,8 +50,8 @@ export default function CollapsibleSection(props) {
         {title}
       </summary>
       <div className="collapsible-content" style={{ marginTop: '8px' }}>
-        <pre style={{ 
-          whiteSpace: 'pre-wrap', 
+        <pre style={{
+          whiteSpace: 'pre-wrap',
           wordWrap: 'break-word',
           margin: 0,
           padding: '12px',
@@ -38,10 +61,9 @@ export default function CollapsibleSection(props) {
           overflow: 'auto',
           maxHeight: '400px'
         }}>
-          {content || '(No content provided)'}
+          {body}
         </pre>
       </div>
     </details>
   );
 }
-
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Transcode audio to the archival speech format and report size and CPU cost.
+
+Runs the same transcode as the server's archive stage (see
+chainlit_bootstrap/audio_codec.py) on the given files or directories, in a
+process pool, and prints the compression ratio and CPU seconds per minute of
+audio for each file and in total. Originals are never removed; use
+``--output-dir`` to try a codec without writing next to the sources.
+
+Usage:
+    python scripts/archive_audio.py                                # AUDIO_PERSIST_DIR
+    python scripts/archive_audio.py audio_files/ --output-dir /tmp/archive
+    AUDIO_ARCHIVE_CODEC=ulaw python scripts/archive_audio.py recording.wav
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# chainlit_bootstrap.audio requires a key at import time. Transcoding never
+# calls the API.
+os.environ.setdefault("OPENAI_API_KEY", "sk-archive-unused")
+
+from chainlit_bootstrap.audio import AUDIO_PERSIST_DIR, is_audio_file  # noqa: E402
+from chainlit_bootstrap.audio_archive import FFMPEG_BINARY, is_archive, select_codec  # noqa: E402
+from chainlit_bootstrap.audio_codec import ArchiveResult, transcode  # noqa: E402
+
+
+def _sources(paths: list[Path]) -> list[Path]:
+    files = []
+    for path in paths:
+        candidates = sorted(path.rglob("*")) if path.is_dir() else [path]
+        files.extend(
+            candidate
+            for candidate in candidates
+            if candidate.is_file()
+            and not candidate.name.startswith(".")
+            and not is_archive(candidate)
+            and is_audio_file("", candidate.name)
+        )
+    return files
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        default=[AUDIO_PERSIST_DIR],
+        help="files or directories",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        help="write archives here instead of next to the sources",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="transcoder processes"
+    )
+    args = parser.parse_args()
+
+    if args.output_dir:
+        args.output_dir.mkdir(parents=True, exist_ok=True)
+    sources = _sources(args.paths)
+    if not sources:
+        print("No audio files found")
+        return
+
+    results: list[ArchiveResult] = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {}
+        for source in sources:
+            selected = select_codec(source)
+            if selected is None:
+                print(
+                    f"{source.name}: skipped, {FFMPEG_BINARY} not found (only WAV is archived without it)"
+                )
+                continue
+            codec, ffmpeg = selected
+            output_dir = str(args.output_dir) if args.output_dir else None
+            futures[pool.submit(transcode, str(source), output_dir, codec, ffmpeg)] = (
+                source
+            )
+        for future in as_completed(futures):
+            source = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"{source.name}: failed: {e}")
+                continue
+            results.append(result)
+            print(f"{source.name}: {result.summary()}")
+
+    if results:
+        total = ArchiveResult(
+            source="",
+            archive="",
+            codec=",".join(sorted({result.codec for result in results})),
+            original_bytes=sum(result.original_bytes for result in results),
+            archived_bytes=sum(result.archived_bytes for result in results),
+            audio_seconds=sum(result.audio_seconds for result in results),
+            cpu_seconds=sum(result.cpu_seconds for result in results),
+        )
+        print(f"\nTotal ({len(results)} files): {total.summary()}")
+
+
+if __name__ == "__main__":
+    main()
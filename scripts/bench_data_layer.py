@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""Benchmark the Chainlit SQLite data layer: default vs tuned settings.
+
+Builds a synthetic database (users, threads, ~100k steps, elements and
+feedbacks), copies it, and migrates the copy with ``ensure_schema`` (indexes and
+WAL). Each copy is then exercised through Chainlit's ``SQLAlchemyDataLayer``:
+
+- thread list: ``list_threads`` for one user (sidebar history)
+- thread load: ``get_thread`` (resuming a conversation)
+- step insert: concurrent ``create_step`` writers, with readers listing threads
+  at the same time; writes that fail (e.g. "database is locked") are counted
+
+Usage:
+    python scripts/bench_data_layer.py --steps 100000 --threads 2000 --users 20
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chainlit.data.sql_alchemy import SQLAlchemyDataLayer  # noqa: E402
+from chainlit.types import Pagination, ThreadFilter  # noqa: E402
+from chainlit_bootstrap.data_layer import (  # noqa: E402
+    INDEXES,
+    TunedSQLAlchemyDataLayer,
+    ensure_schema,
+)
+
+STEP_TYPES = ("user_message", "assistant_message", "tool", "run")
+
+
+class _FailureCounter(logging.Handler):
+    """Counts the SQL errors SQLAlchemyDataLayer logs and swallows."""
+
+    def __init__(self) -> None:
+        super().__init__(logging.WARNING)
+        self.failures = 0
+        self.locked = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if "error occurred" in record.getMessage():
+            self.failures += 1
+            self.locked += "locked" in record.getMessage()
+
+
+def populate(
+    db_path: Path, users: int, threads: int, steps: int, seed: int
+) -> list[str]:
+    """Fill an unindexed, rollback-journal database. Returns the user ids."""
+    ensure_schema(db_path, tuned=False)
+    rng = random.Random(seed)
+    user_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(users)]
+    started = datetime(2025, 1, 1)
+    with contextlib.closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        for name in INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        # Unindexed, like a database created before the versioned schema
+        conn.execute("PRAGMA user_version=0")
+        conn.executemany(
+            'INSERT INTO users ("id", "identifier", "createdAt", "metadata") VALUES (?, ?, ?, ?)',
+            [
+                (uid, f"user{i}@example.com", started.isoformat(), "{}")
+                for i, uid in enumerate(user_ids)
+            ],
+        )
+        thread_rows = []
+        for i in range(threads):
+            user_index = rng.randrange(users)
+            created = started + timedelta(minutes=i)
+            thread_rows.append(
+                (
+                    str(uuid.uuid4()),
+                    created.isoformat(),
+                    f"Thread {i}",
+                    user_ids[user_index],
+                    f"user{user_index}@example.com",
+                    "[]",
+                    "{}",
+                )
+            )
+        conn.executemany(
+            'INSERT INTO threads ("id", "createdAt", "name", "userId", "userIdentifier", "tags", "metadata") '
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            thread_rows,
+        )
+        step_rows, element_rows, feedback_rows = [], [], []
+        for i in range(steps):
+            thread_id, thread_created = thread_rows[rng.randrange(threads)][:2]
+            step_id = str(uuid.uuid4())
+            created = (
+                datetime.fromisoformat(thread_created)
+                + timedelta(seconds=rng.randrange(86400))
+            ).isoformat() + "Z"
+            step_rows.append(
+                (
+                    step_id,
+                    "Assistant",
+                    rng.choice(STEP_TYPES),
+                    thread_id,
+                    f"Message {i} " * 8,
+                    created,
+                    created,
+                    created,
+                    "{}",
+                    "{}",
+                )
+            )
+            if i % 20 == 0:
+                element_rows.append(
+                    (
+                        str(uuid.uuid4()),
+                        thread_id,
+                        "file",
+                        f"file{i}.txt",
+                        "side",
+                        step_id,
+                        "text/plain",
+                    )
+                )
+            if i % 25 == 0:
+                feedback_rows.append(
+                    (str(uuid.uuid4()), step_id, thread_id, rng.choice((0, 1)))
+                )
+        conn.executemany(
+            'INSERT INTO steps ("id", "name", "type", "threadId", "output", "createdAt", '
+            '"start", "end", "metadata", "generation") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            step_rows,
+        )
+        conn.executemany(
+            'INSERT INTO elements ("id", "threadId", "type", "name", "display", "forId", "mime") '
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            element_rows,
+        )
+        conn.executemany(
+            'INSERT INTO feedbacks ("id", "forId", "threadId", "value") VALUES (?, ?, ?, ?)',
+            feedback_rows,
+        )
+        conn.commit()
+    return user_ids
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def timed(samples: list[float], coro) -> None:
+    started = time.perf_counter()
+    await coro
+    samples.append(time.perf_counter() - started)
+
+
+async def bench_layer(
+    layer: SQLAlchemyDataLayer,
+    user_ids: list[str],
+    thread_ids: list[str],
+    args: argparse.Namespace,
+) -> dict[str, list[float] | int]:
+    rng = random.Random(args.seed)
+    failures = _FailureCounter()
+    logging.getLogger("chainlit").addHandler(failures)
+    results: dict[str, list[float] | int] = {"list": [], "load": [], "insert": []}
+    try:
+        for _ in range(args.runs):
+            await timed(
+                results["list"],
+                layer.list_threads(
+                    Pagination(first=20), ThreadFilter(userId=rng.choice(user_ids))
+                ),
+            )
+            await timed(results["load"], layer.get_thread(rng.choice(thread_ids)))
+
+        # create_step is queued until the first user message inside a Chainlit
+        # session; call the undecorated method directly
+        create_step = SQLAlchemyDataLayer.create_step.__wrapped__
+        stop_readers = asyncio.Event()
+
+        async def writer(index: int) -> None:
+            for n in range(args.inserts):
+                now = datetime.now().isoformat() + "Z"
+                step = {
+                    "id": str(uuid.uuid4()),
+                    "name": "Assistant",
+                    "type": "assistant_message",
+                    "threadId": thread_ids[
+                        (index * args.inserts + n) % len(thread_ids)
+                    ],
+                    "output": f"Benchmark answer {index}.{n}",
+                    "createdAt": now,
+                    "start": now,
+                    "end": now,
+                    "metadata": {},
+                }
+                await timed(results["insert"], create_step(layer, step))
+
+        async def reader() -> None:
+            while not stop_readers.is_set():
+                await layer.list_threads(
+                    Pagination(first=20), ThreadFilter(userId=rng.choice(user_ids))
+                )
+
+        readers = [asyncio.create_task(reader()) for _ in range(args.readers)]
+        started = time.perf_counter()
+        await asyncio.gather(*(writer(i) for i in range(args.writers)))
+        results["insert_seconds"] = time.perf_counter() - started
+        stop_readers.set()
+        await asyncio.gather(*readers)
+    finally:
+        logging.getLogger("chainlit").removeHandler(failures)
+        await layer.engine.dispose()
+    results["failed"] = failures.failures
+    results["locked"] = failures.locked
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=100_000, help="synthetic steps")
+    parser.add_argument("--threads", type=int, default=2_000, help="synthetic threads")
+    parser.add_argument("--users", type=int, default=20, help="synthetic users")
+    parser.add_argument("--runs", type=int, default=20, help="thread list/load samples")
+    parser.add_argument(
+        "--writers", type=int, default=8, help="concurrent step writers"
+    )
+    parser.add_argument(
+        "--readers",
+        type=int,
+        default=2,
+        help="concurrent thread listers during inserts",
+    )
+    parser.add_argument(
+        "--inserts", type=int, default=50, help="steps inserted per writer"
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    # SQLAlchemyDataLayer logs each swallowed SQL error; the summary counts them
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        default_db = Path(tmp) / "default.db"
+        started = time.perf_counter()
+        user_ids = populate(default_db, args.users, args.threads, args.steps, args.seed)
+        print(
+            f"Built {args.steps} steps / {args.threads} threads / {args.users} users "
+            f"in {time.perf_counter() - started:.1f}s ({default_db.stat().st_size / 2**20:.0f} MiB)"
+        )
+        with contextlib.closing(sqlite3.connect(default_db)) as conn:
+            thread_ids = [row[0] for row in conn.execute("SELECT id FROM threads")]
+
+        tuned_db = Path(tmp) / "tuned.db"
+        shutil.copyfile(default_db, tuned_db)
+        started = time.perf_counter()
+        ensure_schema(tuned_db)
+        migrate_seconds = time.perf_counter() - started
+        # A new process opening the migrated file only reads the schema version
+        checked_db = Path(tmp) / "checked.db"
+        shutil.copyfile(tuned_db, checked_db)
+        started = time.perf_counter()
+        ensure_schema(checked_db)
+        check_seconds = time.perf_counter() - started
+        checked_db.unlink()
+        print(
+            f"Migration: {migrate_seconds:.2f}s on the populated copy, "
+            f"{check_seconds * 1000:.2f}ms to confirm the version once applied\n"
+        )
+
+        layers = {
+            "default": SQLAlchemyDataLayer(
+                conninfo=f"sqlite+aiosqlite:///{default_db}"
+            ),
+            "tuned": TunedSQLAlchemyDataLayer(tuned_db),
+        }
+        print(
+            f"{'mode':<9}{'list p50':>10}{'list p95':>10}{'load p50':>10}{'load p95':>10}"
+            f"{'insert p50':>12}{'insert p95':>12}{'inserts/s':>11}{'failed':>8}{'locked':>8}"
+        )
+        for mode, layer in layers.items():
+            results = asyncio.run(bench_layer(layer, user_ids, thread_ids, args))
+            inserts = results["insert"]
+            ms = lambda values, q: percentile(values, q) * 1000  # noqa: E731
+            print(
+                f"{mode:<9}"
+                f"{ms(results['list'], 0.5):>8.1f}ms{ms(results['list'], 0.95):>8.1f}ms"
+                f"{ms(results['load'], 0.5):>8.1f}ms{ms(results['load'], 0.95):>8.1f}ms"
+                f"{ms(inserts, 0.5):>10.1f}ms{ms(inserts, 0.95):>10.1f}ms"
+                f"{len(inserts) / results['insert_seconds']:>11.0f}"
+                f"{results['failed']:>8}{results['locked']:>8}"
+            )
+        print(
+            f"\n{args.runs} list/load samples per mode; {args.writers} writers x "
+            f"{args.inserts} steps with {args.readers} concurrent thread listers"
+        )
+
+
+if __name__ == "__main__":
+    main()
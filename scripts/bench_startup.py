@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Benchmark cold-start import time of the app, per module.
+
+Imports the target module (``app`` by default) in fresh interpreters with
+``python -X importtime`` and reports the median total import time, the slowest
+third-party packages and every first-party module (``app``, ``chainlit_bootstrap``)
+by cumulative time. With ``--prewarm`` it also times importing the modules that
+are otherwise loaded on first use (see ``chainlit_bootstrap/warmup.py``).
+
+Filesystem writes made during the import (files opened for writing, directories
+created, renames, removals and SQLite connections) are recorded with an audit
+hook and counted per run; ``--writes`` lists them.
+
+Usage:
+    python scripts/bench_startup.py --runs 5
+    python scripts/bench_startup.py --module chainlit_bootstrap.handlers --top 30
+    python scripts/bench_startup.py --runs 1 --writes
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent
+
+FIRST_PARTY = ("app", "chainlit_bootstrap")
+
+WRITES_MARKER = "bench-startup-writes:"
+
+# Runs in the child before the import; reports writes to stderr at exit
+_WRITE_PROBE = f"""
+import atexit as _atexit, json as _json, os as _os, sys as _sys
+_writes = []
+_WRITE_FLAGS = _os.O_WRONLY | _os.O_RDWR | _os.O_CREAT | _os.O_APPEND | _os.O_TRUNC
+def _audit(event, args):
+    if event == "open":
+        path, mode, flags = args
+        # pathlib.Path and other os.PathLike arguments count too
+        if isinstance(path, _os.PathLike):
+            path = _os.fspath(path)
+        if not isinstance(path, (str, bytes)):
+            return
+        if mode is not None:
+            if not any(c in mode for c in "wax+"):
+                return
+        elif not flags & _WRITE_FLAGS:
+            return
+    elif event in ("os.mkdir", "os.remove", "os.rmdir", "os.rename", "os.truncate", "sqlite3.connect"):
+        path = args[0]
+        if isinstance(path, _os.PathLike):
+            path = _os.fspath(path)
+        if not isinstance(path, (str, bytes)) or path == ":memory:":
+            return
+    else:
+        return
+    path = _os.path.abspath(_os.fsdecode(path))
+    # mkdir(parents=True, exist_ok=True) attempts that create nothing
+    if event == "os.mkdir" and (_os.path.isdir(path) or not _os.path.isdir(_os.path.dirname(path))):
+        return
+    _writes.append((event, path))
+_sys.addaudithook(_audit)
+_atexit.register(lambda: print("{WRITES_MARKER}" + _json.dumps(_writes), file=_sys.stderr))
+"""
+
+
+def import_once(
+    module: str, extra: list[str]
+) -> tuple[float, dict[str, tuple[int, int]], list[tuple[str, str]]]:
+    """Import ``module`` (then ``extra``) in a fresh interpreter.
+
+    Returns the wall time in seconds, {module: (self_us, cumulative_us)} and the
+    filesystem writes made as (audit event, absolute path).
+    """
+    env = dict(os.environ)
+    # The app needs a key at import time; nothing here calls the API
+    env.setdefault("OPENAI_API_KEY", "sk-benchmark-unused")
+    statements = _WRITE_PROBE + "\n".join(f"import {name}" for name in [module, *extra])
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statements],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings: dict[str, tuple[int, int]] = {}
+    writes: list[tuple[str, str]] = []
+    for line in result.stderr.splitlines():
+        if line.startswith(WRITES_MARKER):
+            writes = [tuple(write) for write in json.loads(line[len(WRITES_MARKER) :])]
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        name = name.strip()
+        # Keep the first (real) import of each module
+        timings.setdefault(name, (int(self_us), int(cumulative_us)))
+    return elapsed, timings, writes
+
+
+def top_level_packages(timings: dict[str, tuple[int, int]]) -> dict[str, int]:
+    """Self time summed per top-level package, in microseconds."""
+    totals: dict[str, int] = defaultdict(int)
+    for name, (self_us, _) in timings.items():
+        totals[name.split(".")[0]] += self_us
+    return totals
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app", help="module to import")
+    parser.add_argument(
+        "--runs", type=int, default=3, help="fresh interpreters to median over"
+    )
+    parser.add_argument(
+        "--top", type=int, default=15, help="third-party packages to list"
+    )
+    parser.add_argument(
+        "--prewarm",
+        action="store_true",
+        help="also import the modules loaded on first use",
+    )
+    parser.add_argument("--writes", action="store_true", help="list filesystem writes")
+    args = parser.parse_args()
+
+    extra = []
+    if args.prewarm:
+        sys.path.insert(0, str(REPO_ROOT))
+        os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-unused")
+        from chainlit_bootstrap.warmup import PREWARM_MODULES
+
+        extra = PREWARM_MODULES
+
+    walls = []
+    runs: list[dict[str, tuple[int, int]]] = []
+    write_counts = []
+    for run in range(args.runs):
+        wall, timings, writes = import_once(args.module, extra)
+        walls.append(wall)
+        runs.append(timings)
+        write_counts.append(len(writes))
+        if args.writes:
+            print(f"\nrun {run + 1}: {len(writes)} filesystem writes")
+            for event, path in writes:
+                try:
+                    path = str(Path(path).relative_to(REPO_ROOT.resolve()))
+                except ValueError:
+                    pass
+                print(f"  {event:16} {path}")
+
+    def median_of(name: str, index: int) -> float:
+        return statistics.median(run.get(name, (0, 0))[index] for run in runs) / 1e6
+
+    print(f"\nimport {args.module}" + (" + prewarm modules" if extra else ""))
+    print(
+        f"interpreter wall time: median {statistics.median(walls):.3f}s over {args.runs} runs"
+    )
+    print(
+        f"import total:          {median_of(args.module, 1):.3f}s cumulative for {args.module}"
+    )
+    print(f"filesystem writes:     {', '.join(map(str, write_counts))} (per run)")
+
+    packages = defaultdict(list)
+    for run in runs:
+        for package, self_us in top_level_packages(run).items():
+            packages[package].append(self_us)
+    ranked = sorted(
+        (
+            (statistics.median(values) / 1e6, package)
+            for package, values in packages.items()
+            if package not in FIRST_PARTY
+        ),
+        reverse=True,
+    )
+    print("\nslowest packages (self time, all submodules):")
+    for seconds, package in ranked[: args.top]:
+        print(f"  {seconds:8.3f}s  {package}")
+
+    first_party = sorted(
+        {name for run in runs for name in run if name.split(".")[0] in FIRST_PARTY},
+        key=lambda name: -median_of(name, 1),
+    )
+    print("\nfirst-party modules (cumulative / self):")
+    for name in first_party:
+        print(f"  {median_of(name, 1):8.3f}s {median_of(name, 0):8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Benchmark session vector store backends: memory per 1k chunks and recall@3.
+
+Compares the default in-memory Chroma collection with the compact float16 and
+int8 stores on synthetic, clustered embeddings shaped like OpenAI's
+text-embedding output. Ground truth is an exact float32 cosine top-k scan.
+
+Usage:
+    python scripts/bench_vector_store.py --chunks 5000 --dim 1536
+"""
+
+import argparse
+import gc
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from llama_index.core.schema import TextNode  # noqa: E402
+from llama_index.core.vector_stores.types import VectorStoreQuery  # noqa: E402
+
+from chainlit_bootstrap.vector_store import CompactVectorStore  # noqa: E402
+
+TOP_K = 3
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process (Linux), or 0 if unavailable."""
+    try:
+        with open("/proc/self/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def synthetic_embeddings(
+    rng: np.random.Generator, count: int, dim: int, clusters: int = 50
+) -> np.ndarray:
+    """Unit vectors drawn around a few topic centers, like chunks of related documents."""
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    vectors = centers[assignment] + 0.8 * rng.normal(size=(count, dim)).astype(
+        np.float32
+    )
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    scores = queries @ corpus.T
+    top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    return [set(row.tolist()) for row in top]
+
+
+def recall(truth: list[set[int]], found: list[list[int]]) -> float:
+    return statistics.fmean(
+        len(t & set(f)) / len(t) for t, f in zip(truth, found, strict=True)
+    )
+
+
+def bench_chroma(
+    corpus: np.ndarray, queries: np.ndarray
+) -> tuple[int, list[list[int]], list[float]]:
+    import chromadb
+
+    client = chromadb.Client()
+    collection = client.get_or_create_collection(name=f"bench_{uuid.uuid4().hex[:8]}")
+    # Measure only what the collection adds, not Chroma's one-time client startup
+    gc.collect()
+    before = rss_bytes()
+    # Small batches keep the transient Python float lists out of the RSS figure
+    batch = 250
+    for start in range(0, len(corpus), batch):
+        end = min(start + batch, len(corpus))
+        collection.add(
+            ids=[str(i) for i in range(start, end)],
+            embeddings=corpus[start:end].tolist(),
+            documents=["chunk"] * (end - start),
+        )
+    gc.collect()
+    used = rss_bytes() - before
+
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=TOP_K)
+        latencies.append(time.perf_counter() - started)
+        found.append([int(i) for i in result["ids"][0]])
+    client.delete_collection(collection.name)
+    return used, found, latencies
+
+
+def bench_compact(
+    dtype: str, corpus: np.ndarray, queries: np.ndarray
+) -> tuple[int, list[list[int]], list[float]]:
+    store = CompactVectorStore(dtype=dtype)
+    store.add(
+        [
+            TextNode(id_=str(i), text="chunk", embedding=vector.tolist())
+            for i, vector in enumerate(corpus)
+        ]
+    )
+    found, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        result = store.query(
+            VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=TOP_K)
+        )
+        latencies.append(time.perf_counter() - started)
+        found.append([int(i) for i in result.ids])
+    return store.nbytes, found, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--chunks", type=int, default=5000, help="number of stored chunks"
+    )
+    parser.add_argument("--dim", type=int, default=1536, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=200, help="number of queries")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = synthetic_embeddings(rng, args.chunks, args.dim)
+    # Queries are perturbed stored chunks, like paraphrased questions
+    picks = rng.integers(0, args.chunks, size=args.queries)
+    queries = corpus[picks] + 0.05 * rng.normal(size=(args.queries, args.dim)).astype(
+        np.float32
+    )
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = exact_top_k(corpus, queries, TOP_K)
+
+    per_1k = 1000 / args.chunks
+    print(
+        f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, recall@{TOP_K}"
+    )
+    print(
+        f"{'backend':<22}{'MiB per 1k chunks':>20}{'recall@3':>11}{'p50 query ms':>15}"
+    )
+    print(
+        f"{'float32 (raw vectors)':<22}"
+        f"{corpus.nbytes * per_1k / 2**20:>20.2f}{1.0:>11.3f}{'-':>15}"
+    )
+
+    results = [("chroma (RSS delta)", *bench_chroma(corpus, queries))]
+    for dtype in ("float16", "int8"):
+        results.append((dtype, *bench_compact(dtype, corpus, queries)))
+
+    for name, used, found, latencies in results:
+        print(
+            f"{name:<22}{used * per_1k / 2**20:>20.2f}"
+            f"{recall(truth, found):>11.3f}"
+            f"{statistics.median(latencies) * 1000:>15.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI (and Tavily) endpoints the app uses.
+
+Serves the subset of the API the app calls, with configurable latency, token
+rate and error injection, so benchmarks and load tests run offline and
+reproducibly:
+
+- ``POST /v1/audio/transcriptions``: replays fixture transcripts for the bundled
+  recordings in ``audio_files/ATC_recordings`` (matched by content hash)
+- ``POST /v1/chat/completions``: deterministic replies, streamed at a fixed token
+  rate; ATC parsing prompts get a valid JSON conversation back
+- ``POST /v1/embeddings``: deterministic unit vectors, float or base64 encoded
+- ``POST /search``: Tavily-compatible web search results
+- ``GET /stats``: request and injected-error counters
+
+Latency specs are ``fixed:S``, ``uniform:LOW:HIGH``, ``lognormal:MEDIAN:SIGMA`` or
+``exp:MEAN`` (seconds).
+
+Usage:
+    python scripts/fake_openai_server.py --port 8787 --chat-latency lognormal:0.4:0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 TAVILY_BASE_URL=http://127.0.0.1:8787 \\
+        TAVILY_API_KEY=fake OPENAI_API_KEY=fake chainlit run app.py
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import random
+import re
+import struct
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger("fake_openai_server")
+
+REPO_ROOT = Path(__file__).parent.parent
+
+# Recordings with a hand-made transcript; other recordings get a synthetic one
+TRANSCRIPT_FIXTURES = {
+    "droneKSAN1-Twr-Aug-26-2025-1830Z.mp3": "transcripts/transcript_1.txt",
+}
+
+# Marker of the ATC conversation parsing prompt (see atc_parser.PROMPT_TEMPLATE)
+_PARSE_PROMPT_MARKER = "Now parse this transcript:"
+_ATC_PHRASES = re.compile(
+    r"\b(cleared|contact|taxi via|hold short|hold position|line up|wind|traffic|"
+    r"use caution|climb|descend|maintain|turn (left|right)|squawk)\b",
+    re.IGNORECASE,
+)
+
+_VOCABULARY = (
+    "runway heading tower ground approach departure traffic cleared altitude "
+    "frequency readback clearance taxiway holding pattern visual wind report "
+    "aircraft advisory sequence final position squawk contact maintain flight level"
+).split()
+
+
+@dataclass
+class LatencyDistribution:
+    """Samples a delay in seconds."""
+
+    kind: str
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, *params = spec.split(":")
+        values = [float(p) for p in params]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2, "exp": 1}
+        if kind not in expected or len(values) != expected[kind]:
+            raise argparse.ArgumentTypeError(
+                f"Bad latency spec '{spec}'. Use fixed:S, uniform:LOW:HIGH, "
+                "lognormal:MEDIAN:SIGMA or exp:MEAN"
+            )
+        return cls(kind, *values)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(0.0, self.b) * self.a
+        return rng.expovariate(1.0 / self.a) if self.a > 0 else 0.0
+
+
+def _synthetic_transcript(seed: str) -> str:
+    """A plausible tower exchange, fixed for a given seed."""
+    rng = random.Random(seed)
+    airlines = ["United", "Delta", "American", "Southwest", "Alaska", "JetBlue"]
+    lines = []
+    for _ in range(rng.randint(4, 8)):
+        callsign = f"{rng.choice(airlines)} {rng.randint(100, 2999)}"
+        runway = f"{rng.randint(1, 36)}{rng.choice(['', 'L', 'R'])}"
+        lines.append(f"{callsign}, Tower, runway {runway}, cleared to land.")
+        lines.append(f"Cleared to land runway {runway}, {callsign}.")
+    return " ".join(lines)
+
+
+class Fixtures:
+    """Transcripts for the bundled recordings, indexed by MD5 of the audio bytes."""
+
+    def __init__(self, root: Path) -> None:
+        self.by_hash: dict[str, str] = {}
+        for path in sorted((root / "audio_files" / "ATC_recordings").glob("*.mp3")):
+            digest = hashlib.md5(path.read_bytes()).hexdigest()
+            fixture = TRANSCRIPT_FIXTURES.get(path.name)
+            if fixture and (root / fixture).exists():
+                self.by_hash[digest] = (
+                    (root / fixture).read_text(encoding="utf-8").strip()
+                )
+            else:
+                self.by_hash[digest] = _synthetic_transcript(path.name)
+        logger.info(f"Loaded transcript fixtures for {len(self.by_hash)} recordings")
+
+    def transcript(self, audio: bytes) -> str:
+        digest = hashlib.md5(audio).hexdigest()
+        return self.by_hash.get(digest) or _synthetic_transcript(digest)
+
+
+def _parse_reply(prompt: str) -> str:
+    """A JSON conversation for an ATC parsing prompt."""
+    # The transcript to parse follows the last "Transcript:" (earlier ones are examples)
+    transcript = prompt.rpartition("Transcript:")[2].partition("Output JSON array:")[0]
+    transcript = transcript.strip().strip('"')
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", transcript) if s.strip()]
+    return json.dumps(
+        [
+            {"role": "atc" if _ATC_PHRASES.search(s) else "pilot", "message": s}
+            for s in sentences
+        ],
+        indent=2,
+    )
+
+
+def _chat_reply(messages: list[dict], reply_tokens: int) -> str:
+    last = messages[-1] if messages else {}
+    content = last.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(
+            part.get("text", "") for part in content if isinstance(part, dict)
+        )
+    if _PARSE_PROMPT_MARKER in content:
+        return _parse_reply(content)
+    rng = random.Random(
+        hashlib.sha256(json.dumps(messages, sort_keys=True).encode()).digest()
+    )
+    words = [rng.choice(_VOCABULARY) for _ in range(reply_tokens)]
+    return " ".join(words).capitalize() + "."
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\S+\s*", text) or [text]
+
+
+def _count_tokens(value) -> int:
+    return max(1, len(json.dumps(value)) // 4)
+
+
+def _embedding(text: str, dim: int) -> list[float]:
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    vector = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="OpenAI stand-in")
+    rng = random.Random(args.seed)
+    fixtures = Fixtures(args.fixtures_root)
+    counters: Counter[str] = Counter()
+    error_statuses = [int(s) for s in args.error_statuses.split(",") if s.strip()]
+
+    async def inject(
+        endpoint: str, latency: LatencyDistribution
+    ) -> JSONResponse | None:
+        """Apply the sampled delay; return an error response when one is injected."""
+        counters[endpoint] += 1
+        if args.stall_rate and rng.random() < args.stall_rate:
+            counters[f"{endpoint}:stall"] += 1
+            await asyncio.sleep(args.stall_seconds)
+        else:
+            await asyncio.sleep(latency.sample(rng))
+        if args.error_rate and error_statuses and rng.random() < args.error_rate:
+            status = rng.choice(error_statuses)
+            counters[f"{endpoint}:error:{status}"] += 1
+            headers = {"retry-after": "1"} if status == 429 else None
+            return JSONResponse(
+                {
+                    "error": {
+                        "message": f"Injected {status}",
+                        "type": "fake_error",
+                        "code": status,
+                    }
+                },
+                status_code=status,
+                headers=headers,
+            )
+        return None
+
+    @app.get("/v1/models")
+    async def models():
+        return {
+            "object": "list",
+            "data": [{"id": args.model, "object": "model", "owned_by": "fake"}],
+        }
+
+    @app.post("/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        audio = await upload.read() if upload is not None else b""
+        error = await inject("transcriptions", args.transcription_latency)
+        if error is not None:
+            return error
+        # Longer recordings take longer to transcribe
+        await asyncio.sleep(args.transcription_seconds_per_mb * len(audio) / 1_000_000)
+        text = fixtures.transcript(audio)
+        if form.get("response_format") == "text":
+            return StreamingResponse(iter([text]), media_type="text/plain")
+        return {"text": text}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", args.model)
+        error = await inject("chat", args.chat_latency)
+        if error is not None:
+            return error
+        reply = _chat_reply(messages, args.reply_tokens)
+        tokens = _tokens(reply)
+        usage = {
+            "prompt_tokens": _count_tokens(messages),
+            "completion_tokens": len(tokens),
+            "total_tokens": _count_tokens(messages) + len(tokens),
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        token_delay = (
+            1.0 / args.tokens_per_second if args.tokens_per_second > 0 else 0.0
+        )
+
+        if not body.get("stream"):
+            await asyncio.sleep(token_delay * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": reply},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+
+        def chunk(
+            delta: dict, finish_reason: str | None = None, usage_value=None
+        ) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": []
+                if usage_value
+                else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            if usage_value:
+                payload["usage"] = usage_value
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                await asyncio.sleep(token_delay)
+            yield chunk({}, "stop")
+            if include_usage:
+                yield chunk({}, usage_value=usage)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        error = await inject("embeddings", args.embeddings_latency)
+        if error is not None:
+            return error
+        dim = int(body.get("dimensions") or args.embedding_dim)
+        data = []
+        for idx, text in enumerate(inputs):
+            vector = _embedding(str(text), dim)
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(struct.pack(f"<{dim}f", *vector)).decode(
+                    "ascii"
+                )
+                data.append({"object": "embedding", "index": idx, "embedding": encoded})
+            else:
+                data.append({"object": "embedding", "index": idx, "embedding": vector})
+        tokens = sum(_count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-ada-002"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        query = body.get("query", "")
+        error = await inject("search", args.search_latency)
+        if error is not None:
+            return error
+        results = [
+            {
+                "title": f"{query} ({idx + 1})",
+                "url": f"https://example.com/{hashlib.md5(f'{query}{idx}'.encode()).hexdigest()[:12]}",
+                "content": _chat_reply(
+                    [{"role": "user", "content": f"{query}{idx}"}], 40
+                ),
+                "score": round(1.0 - idx * 0.1, 2),
+            }
+            for idx in range(int(body.get("max_results", 5)))
+        ]
+        return {"query": query, "results": results, "response_time": 0.0}
+
+    @app.get("/stats")
+    async def stats():
+        return dict(counters)
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed for latency and error sampling"
+    )
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument(
+        "--chat-latency",
+        type=LatencyDistribution.parse,
+        default="lognormal:0.4:0.4",
+        help="time to first token",
+    )
+    parser.add_argument(
+        "--embeddings-latency",
+        type=LatencyDistribution.parse,
+        default="lognormal:0.1:0.3",
+    )
+    parser.add_argument(
+        "--transcription-latency",
+        type=LatencyDistribution.parse,
+        default="lognormal:1.0:0.3",
+    )
+    parser.add_argument(
+        "--search-latency", type=LatencyDistribution.parse, default="lognormal:0.5:0.3"
+    )
+    parser.add_argument(
+        "--transcription-seconds-per-mb",
+        type=float,
+        default=0.5,
+        help="extra transcription delay per MB of audio",
+    )
+    parser.add_argument(
+        "--tokens-per-second", type=float, default=60.0, help="0 streams instantly"
+    )
+    parser.add_argument(
+        "--reply-tokens", type=int, default=80, help="length of generic chat replies"
+    )
+    parser.add_argument("--embedding-dim", type=int, default=1536)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="fraction of requests failed"
+    )
+    parser.add_argument(
+        "--error-statuses", default="429,500,503", help="statuses to inject"
+    )
+    parser.add_argument(
+        "--stall-rate", type=float, default=0.0, help="fraction of requests stalled"
+    )
+    parser.add_argument("--stall-seconds", type=float, default=30.0)
+    parser.add_argument("--fixtures-root", type=Path, default=REPO_ROOT)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s"
+    )
+    uvicorn.run(
+        create_app(args), host=args.host, port=args.port, log_level=args.log_level
+    )
+
+
+if __name__ == "__main__":
+    main()
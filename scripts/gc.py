@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Run the retention garbage collector once (see chainlit_bootstrap/retention.py).
+
+Applies the same policies as the background collector in the server to the
+default data locations: ``data/chainlit.db``, ``.local/data/blobs`` and the
+directories configured through the environment. Safe to run while the server
+is up; the blob index and the Chainlit database are shared through SQLite.
+
+Usage:
+    python scripts/gc.py --dry-run     # report what would be removed
+    python scripts/gc.py
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# chainlit_bootstrap.audio requires a key at import time. Garbage
+# collection never calls the API.
+os.environ.setdefault("OPENAI_API_KEY", "sk-gc-unused")
+
+from chainlit_bootstrap.blob_storage import LocalFileStorageClient  # noqa: E402
+from chainlit_bootstrap.retention import POLICIES, collect_garbage  # noqa: E402
+
+ROOT = Path(__file__).parent.parent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--dry-run", action="store_true", help="report without removing anything"
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=ROOT / "data" / "chainlit.db",
+        help="Chainlit database",
+    )
+    parser.add_argument(
+        "--blobs",
+        type=Path,
+        default=ROOT / ".local" / "data" / "blobs",
+        help="blob store",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for store, policy in POLICIES.items():
+        age = (
+            f"{policy.max_age_seconds / 86400:g} days"
+            if policy.max_age_seconds
+            else "no age limit"
+        )
+        size = (
+            f"{policy.max_bytes / 2**20:g} MiB" if policy.max_bytes else "no size cap"
+        )
+        print(f"{store:<12} {age}, {size}")
+
+    blob_storage = LocalFileStorageClient(args.blobs) if args.blobs.is_dir() else None
+    report = asyncio.run(collect_garbage(args.db, blob_storage, dry_run=args.dry_run))
+    if not report.orphan_detection:
+        print(f"\n{args.db} is unavailable: orphans were not checked")
+    print(f"\n{report.summary()}")
+
+
+if __name__ == "__main__":
+    main()
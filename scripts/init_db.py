@@ -1,15 +1,27 @@
 #!/usr/bin/env python3
-"""Initialize Chainlit database tables."""
+"""Initialize Chainlit database tables.
 
+Creates missing tables, columns and indexes (see chainlit_bootstrap/data_layer.py).
+Safe to run against an existing database, which is migrated in place.
+"""
+
+import sqlite3
 import sys
 from pathlib import Path
 
 # Add parent directory to path to import app modules
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from chainlit_bootstrap.data_layer import (  # noqa: E402
+    INDEXES,
+    SCHEMA_VERSION,
+    TABLES,
+    ensure_schema,
+)
+
 
 def init_database():
-    """Initialize database tables using SQLAlchemy."""
+    """Create or migrate the database schema."""
     data_dir = Path(__file__).parent.parent / "data"
     data_dir.mkdir(exist_ok=True)
 
@@ -17,151 +29,35 @@ def init_database():
     print(f"Initializing database at {db_path}...")
 
     try:
-        from sqlalchemy import (
-            Column,
-            Integer,
-            MetaData,
-            String,
-            Table,
-            Text,
-            create_engine,
-        )
-
-        conninfo = f"sqlite:///{db_path}"
-        engine = create_engine(conninfo, echo=False)
-        metadata = MetaData()
-
-        # Define Chainlit tables schema based on Chainlit's data layer
-        users_table = Table(
-            'users',
-            metadata,
-            Column('id', String, primary_key=True),
-            Column('identifier', String, nullable=False, unique=True),
-            Column('createdAt', String),
-            Column('metadata', Text),
-        )
-
-        # Threads table
-        threads_table = Table(
-            'threads',
-            metadata,
-            Column('id', String, primary_key=True),
-            Column('createdAt', String),
-            Column('name', String),
-            Column('userId', String),
-            Column('userIdentifier', String),
-            Column('tags', Text),
-            Column('metadata', Text),
-        )
-
-        # Steps table
-        steps_table = Table(
-            'steps',
-            metadata,
-            Column('id', String, primary_key=True),
-            Column('name', String, nullable=False),
-            Column('type', String, nullable=False),
-            Column('threadId', String, nullable=False),
-            Column('parentId', String),
-            Column('streaming', Integer),
-            Column('waitForAnswer', Integer),
-            Column('isError', Integer),
-            Column('metadata', Text),
-            Column('tags', Text),
-            Column('input', Text),
-            Column('output', Text),
-            Column('createdAt', String),
-            Column('start', String),
-            Column('end', String),
-            Column('generation', Text),
-            Column('showInput', String),
-            Column('defaultOpen', Integer),
-            Column('language', String),
-            Column('indent', Integer),
-        )
-
-        # Elements table
-        elements_table = Table(
-            'elements',
-            metadata,
-            Column('id', String, primary_key=True),
-            Column('threadId', String),
-            Column('type', String),
-            Column('url', String),
-            Column('chainlitKey', String),
-            Column('name', String, nullable=False),
-            Column('display', String),
-            Column('objectKey', String),
-            Column('size', String),
-            Column('page', Integer),
-            Column('language', String),
-            Column('forId', String),
-            Column('mime', String),
-            Column('autoPlay', Integer),  # Boolean stored as INTEGER (0/1)
-            Column('props', Text),
-        )
-
-        # Feedbacks table
-        feedbacks_table = Table(
-            'feedbacks',
-            metadata,
-            Column('id', String, primary_key=True),
-            Column('forId', String, nullable=False),
-            Column('threadId', String, nullable=False),
-            Column('value', Integer, nullable=False),
-            Column('comment', String),
-        )
-
-        # Create all tables
-        metadata.create_all(engine)
-
-        # Verify tables were created and add missing columns
-        import sqlite3
-
-        def ensure_column(conn, table, column, sql_type):
-            """Add column to table if missing."""
-            cursor = conn.cursor()
-            cursor.execute(f"PRAGMA table_info({table});")
-            existing = {col[1] for col in cursor.fetchall()}
-            if column not in existing:
-                print(f"Adding missing '{column}' column to {table} table...")
-                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {sql_type};")
-                conn.commit()
-                print(f"✓ Added '{column}' column to {table} table")
+        migrated = ensure_schema(db_path)
 
         conn = sqlite3.connect(str(db_path))
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-        tables = cursor.fetchall()
-
         try:
-            ensure_column(conn, "elements", "props", "TEXT")
-        except Exception as e:
-            print(f"⚠ Warning: Could not add props column: {e}")
-
-        try:
-            ensure_column(conn, "elements", "autoPlay", "INTEGER")
-        except Exception as e:
-            print(f"⚠ Warning: Could not add autoPlay column: {e}")
-
-        try:
-            ensure_column(conn, "steps", "defaultOpen", "INTEGER")
-        except Exception as e:
-            print(f"⚠ Warning: Could not add defaultOpen column: {e}")
-
-        conn.close()
-
-        if tables:
-            print(f"✓ Created tables: {[t[0] for t in tables]}")
-        else:
-            print("⚠ Warning: No tables found after initialization")
+            found = {
+                row[0]: row[1]
+                for row in conn.execute("SELECT name, type FROM sqlite_master")
+            }
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        finally:
+            conn.close()
+
+        missing = [name for name in [*TABLES, *INDEXES] if name not in found]
+        if missing:
+            print(f"⚠ Warning: Missing after initialization: {missing}")
             sys.exit(1)
 
-        engine.dispose()
+        print(f"✓ Tables: {list(TABLES)}")
+        print(f"✓ Indexes: {list(INDEXES)}")
+        print(f"✓ Journal mode: {journal_mode}")
+        print(
+            f"✓ Schema version {SCHEMA_VERSION}"
+            + (" (migrated)" if migrated else " (already current)")
+        )
         print("✓ Database initialization completed successfully")
 
     except Exception as e:
         import traceback
+
         print(f"✗ Error initializing database: {e}")
         print(f"  Traceback: {traceback.format_exc()}")
         sys.exit(1)
@@ -169,4 +65,3 @@ def init_database():
 
 if __name__ == "__main__":
     init_database()
-
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""Concurrent-session load generator for a running Chainlit app.
+
+Opens N websocket sessions the way the browser client does and has each one
+replay a weighted mix of flows until the run ends:
+
+- ``chat``: a general chat question, answered with streaming
+- ``docqa``: upload ``transcripts/transcript_1.txt`` with a question about it
+- ``audio``: upload a bundled ATC recording and wait for the parsed transcript
+- ``search``: a ``/search`` web search
+
+Reports throughput, p50/p95/p99 latency and time to first token per flow, and
+samples the server's RSS and CPU from ``/proc`` when ``--server-pid`` is given.
+Run it against the local stand-in (``scripts/fake_openai_server.py``) for
+reproducible numbers.
+
+Usage:
+    python scripts/fake_openai_server.py &
+    OPENAI_BASE_URL=http://127.0.0.1:8787/v1 TAVILY_BASE_URL=http://127.0.0.1:8787 \\
+        OPENAI_API_KEY=fake TAVILY_API_KEY=fake CHAINLIT_NO_LOGIN=1 chainlit run app.py &
+    python scripts/load_test.py --sessions 20 --duration 120 --server-pid $(pgrep -f "chainlit run")
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+
+import httpx
+import socketio
+
+REPO_ROOT = Path(__file__).parent.parent
+
+DEFAULT_MIX = "chat=5,docqa=2,audio=1,search=2"
+
+CHAT_PROMPTS = [
+    "What does 'line up and wait' mean?",
+    "Explain the difference between a clearance and an instruction.",
+    "How do pilots read back a frequency change?",
+    "What is a squawk code used for?",
+    "Summarize the phraseology for a go-around.",
+]
+
+DOC_QUESTIONS = [
+    "What was reported near the parking garage?",
+    "Which runway were arrivals cleared to land on?",
+    "How high was the drone operating?",
+]
+
+SEARCH_QUERIES = [
+    "KSAN drone sighting",
+    "FAA phraseology updates",
+    "ATC radar outage Newark",
+]
+
+# Markers in the messages that end an audio flow
+AUDIO_DONE_MARKERS = ("Audio Transcription Complete", "❌")
+
+
+def _now_iso() -> str:
+    return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0 for no values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class FlowResult:
+    flow: str
+    started: float
+    latency: float
+    ttft: float | None
+    ok: bool
+    error: str | None = None
+
+
+@dataclass
+class ResourceSample:
+    elapsed: float
+    rss_mb: float
+    cpu_percent: float
+
+
+class ChainlitSession:
+    """One simulated browser tab: a websocket session plus the upload endpoint."""
+
+    def __init__(self, base_url: str, cookie: str | None, timeout: float) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.cookie = cookie
+        self.timeout = timeout
+        self.session_id = str(uuid.uuid4())
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Cookie": cookie} if cookie else None,
+            timeout=timeout,
+        )
+        self._task_end = asyncio.Event()
+        self._first_token_at: float | None = None
+        self._message_event = asyncio.Event()
+        self._contents: list[str] = []
+        self._error: str | None = None
+        self._register_handlers()
+
+    def _register_handlers(self) -> None:
+        @self.sio.on("task_end")
+        async def on_task_end(_data=None):
+            self._task_end.set()
+
+        @self.sio.on("stream_token")
+        async def on_stream_token(_data=None):
+            self._mark_first_token()
+
+        @self.sio.on("new_message")
+        async def on_new_message(step):
+            self._record(step)
+
+        @self.sio.on("update_message")
+        async def on_update_message(step):
+            self._record(step)
+
+    def _mark_first_token(self) -> None:
+        if self._first_token_at is None:
+            self._first_token_at = time.perf_counter()
+
+    def _record(self, step: dict) -> None:
+        if step.get("type") == "user_message":
+            return
+        if step.get("isError"):
+            self._error = step.get("output") or "error message"
+        if step.get("output"):
+            self._mark_first_token()
+        self._contents.append(step.get("output") or "")
+        self._message_event.set()
+
+    async def connect(self) -> None:
+        await self.sio.connect(
+            self.base_url,
+            socketio_path="/ws/socket.io",
+            transports=["websocket"],
+            headers={"Cookie": self.cookie} if self.cookie else None,
+            auth={
+                "clientType": "webapp",
+                "sessionId": self.session_id,
+                "threadId": None,
+                "userEnv": "{}",
+                "chatProfile": None,
+            },
+            wait_timeout=self.timeout,
+        )
+        self._message_event.clear()
+        await self.sio.emit("connection_successful")
+        # on_chat_start posts a welcome message
+        try:
+            await asyncio.wait_for(self._message_event.wait(), self.timeout)
+        except TimeoutError:
+            pass
+
+    async def close(self) -> None:
+        if self.sio.connected:
+            await self.sio.disconnect()
+        await self.http.aclose()
+
+    async def upload(self, path: Path, mime: str) -> dict:
+        response = await self.http.post(
+            "/project/file",
+            params={"session_id": self.session_id},
+            files={"file": (path.name, path.read_bytes(), mime)},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def send(
+        self,
+        content: str,
+        files: list[dict] | None = None,
+        done_markers: tuple[str, ...] = (),
+    ) -> float | None:
+        """Send a message and wait until it is answered; returns time to first token."""
+        self._task_end.clear()
+        self._contents.clear()
+        self._error = None
+        self._first_token_at = None
+        started = time.perf_counter()
+        message = {
+            "id": str(uuid.uuid4()),
+            "name": "User",
+            "type": "user_message",
+            "output": content,
+            "createdAt": _now_iso(),
+        }
+        await self.sio.emit(
+            "client_message",
+            {
+                "message": message,
+                "fileReferences": [{"id": f["id"]} for f in files or []],
+            },
+        )
+        async with asyncio.timeout(self.timeout):
+            await self._task_end.wait()
+            # Background work (audio jobs) reports after the handler returns
+            while done_markers and not any(
+                marker in text for text in self._contents for marker in done_markers
+            ):
+                self._message_event.clear()
+                await self._message_event.wait()
+        if self._error is not None:
+            raise RuntimeError(f"Server replied with an error: {self._error[:200]}")
+        return None if self._first_token_at is None else self._first_token_at - started
+
+
+async def run_flow(
+    session: ChainlitSession, flow: str, rng: random.Random
+) -> float | None:
+    if flow == "chat":
+        return await session.send(rng.choice(CHAT_PROMPTS))
+    if flow == "docqa":
+        uploaded = await session.upload(
+            REPO_ROOT / "transcripts" / "transcript_1.txt", "text/plain"
+        )
+        return await session.send(rng.choice(DOC_QUESTIONS), files=[uploaded])
+    if flow == "audio":
+        recordings = sorted(
+            (REPO_ROOT / "audio_files" / "ATC_recordings").glob("*.mp3")
+        )
+        uploaded = await session.upload(rng.choice(recordings), "audio/mpeg")
+        return await session.send("", files=[uploaded], done_markers=AUDIO_DONE_MARKERS)
+    if flow == "search":
+        return await session.send(f"/search {rng.choice(SEARCH_QUERIES)}")
+    raise ValueError(f"Unknown flow '{flow}'")
+
+
+async def session_worker(
+    index: int,
+    args: argparse.Namespace,
+    flows: list[str],
+    weights: list[float],
+    deadline: float,
+    results: list[FlowResult],
+) -> None:
+    rng = random.Random(args.seed + index)
+    # Stagger connections so the server is not hit by N handshakes at once
+    await asyncio.sleep(rng.uniform(0, args.ramp_up))
+    session = ChainlitSession(args.url, args.cookie, args.timeout)
+    try:
+        await session.connect()
+    except Exception as e:
+        results.append(
+            FlowResult("connect", time.perf_counter(), 0.0, None, False, str(e))
+        )
+        await session.close()
+        return
+    try:
+        iterations = 0
+        while time.perf_counter() < deadline and (
+            not args.iterations or iterations < args.iterations
+        ):
+            flow = rng.choices(flows, weights)[0]
+            started = time.perf_counter()
+            try:
+                ttft = await run_flow(session, flow, rng)
+                results.append(
+                    FlowResult(flow, started, time.perf_counter() - started, ttft, True)
+                )
+            except Exception as e:
+                results.append(
+                    FlowResult(
+                        flow,
+                        started,
+                        time.perf_counter() - started,
+                        None,
+                        False,
+                        f"{type(e).__name__}: {e}",
+                    )
+                )
+            iterations += 1
+            await asyncio.sleep(
+                rng.expovariate(1.0 / args.think_time) if args.think_time else 0
+            )
+    finally:
+        await session.close()
+
+
+def _read_proc(pid: int) -> tuple[float, float]:
+    """Return (RSS in MB, CPU seconds) of a process from /proc."""
+    with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+        rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat", encoding="utf-8") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    ticks = os.sysconf("SC_CLK_TCK")
+    return rss_kb / 1024, (int(fields[11]) + int(fields[12])) / ticks
+
+
+async def sample_resources(
+    pid: int, interval: float, started: float, samples: list[ResourceSample]
+) -> None:
+    previous_cpu, previous_time = None, None
+    while True:
+        try:
+            rss_mb, cpu = _read_proc(pid)
+        except (OSError, StopIteration):
+            return
+        now = time.perf_counter()
+        cpu_percent = (
+            100 * (cpu - previous_cpu) / (now - previous_time)
+            if previous_cpu is not None
+            else 0.0
+        )
+        samples.append(
+            ResourceSample(
+                round(now - started, 2), round(rss_mb, 1), round(cpu_percent, 1)
+            )
+        )
+        previous_cpu, previous_time = cpu, now
+        await asyncio.sleep(interval)
+
+
+def parse_mix(spec: str) -> tuple[list[str], list[float]]:
+    flows, weights = [], []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        flows.append(name.strip())
+        weights.append(float(weight or 1))
+    return flows, weights
+
+
+def build_report(
+    results: list[FlowResult], samples: list[ResourceSample], elapsed: float, args
+) -> dict:
+    flows = {}
+    for flow in sorted({r.flow for r in results}):
+        runs = [r for r in results if r.flow == flow]
+        ok = [r for r in runs if r.ok]
+        latencies = [r.latency for r in ok]
+        ttfts = [r.ttft for r in ok if r.ttft is not None]
+        flows[flow] = {
+            "count": len(runs),
+            "errors": len(runs) - len(ok),
+            "throughput_per_min": round(60 * len(ok) / elapsed, 2),
+            "latency_p50": round(percentile(latencies, 50), 3),
+            "latency_p95": round(percentile(latencies, 95), 3),
+            "latency_p99": round(percentile(latencies, 99), 3),
+            "ttft_p50": round(percentile(ttfts, 50), 3),
+            "ttft_p95": round(percentile(ttfts, 95), 3),
+            "sample_errors": sorted({r.error for r in runs if r.error})[:5],
+        }
+    completed = sum(1 for r in results if r.ok)
+    report = {
+        "sessions": args.sessions,
+        "duration_seconds": round(elapsed, 1),
+        "completed_flows": completed,
+        "throughput_per_second": round(completed / elapsed, 3) if elapsed else 0.0,
+        "flows": flows,
+    }
+    if samples:
+        report["server"] = {
+            "rss_mb_max": max(s.rss_mb for s in samples),
+            "rss_mb_mean": round(statistics.fmean(s.rss_mb for s in samples), 1),
+            "cpu_percent_max": max(s.cpu_percent for s in samples),
+            "cpu_percent_mean": round(
+                statistics.fmean(s.cpu_percent for s in samples[1:] or samples), 1
+            ),
+            "timeline": [asdict(s) for s in samples],
+        }
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\n{report['sessions']} sessions, {report['duration_seconds']}s, "
+        f"{report['completed_flows']} flows completed "
+        f"({report['throughput_per_second']}/s)\n"
+    )
+    header = f"{'flow':<8} {'count':>6} {'errors':>6} {'/min':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'ttft50':>7} {'ttft95':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, flow in report["flows"].items():
+        print(
+            f"{name:<8} {flow['count']:>6} {flow['errors']:>6} {flow['throughput_per_min']:>7} "
+            f"{flow['latency_p50']:>7} {flow['latency_p95']:>7} {flow['latency_p99']:>7} "
+            f"{flow['ttft_p50']:>7} {flow['ttft_p95']:>7}"
+        )
+        for error in flow["sample_errors"]:
+            print(f"         ! {error}")
+    if "server" in report:
+        server = report["server"]
+        print(
+            f"\nServer RSS max {server['rss_mb_max']} MB (mean {server['rss_mb_mean']}), "
+            f"CPU max {server['cpu_percent_max']}% (mean {server['cpu_percent_mean']}%)"
+        )
+
+
+async def main_async(args: argparse.Namespace) -> dict:
+    flows, weights = parse_mix(args.mix)
+    results: list[FlowResult] = []
+    samples: list[ResourceSample] = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    sampler = (
+        asyncio.create_task(
+            sample_resources(args.server_pid, args.sample_interval, started, samples)
+        )
+        if args.server_pid
+        else None
+    )
+    await asyncio.gather(
+        *(
+            session_worker(i, args, flows, weights, deadline, results)
+            for i in range(args.sessions)
+        )
+    )
+    if sampler is not None:
+        sampler.cancel()
+    return build_report(results, samples, time.perf_counter() - started, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--url", default="http://127.0.0.1:8000", help="Chainlit server URL"
+    )
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=0,
+        help="flows per session (0 = until --duration)",
+    )
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help="flow weights, e.g. chat=5,docqa=2,audio=1,search=2",
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="mean pause between flows in seconds",
+    )
+    parser.add_argument(
+        "--ramp-up", type=float, default=5.0, help="seconds over which sessions connect"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=120.0, help="per-flow timeout in seconds"
+    )
+    parser.add_argument(
+        "--cookie",
+        default=os.getenv("LOAD_TEST_COOKIE"),
+        help="Cookie header, e.g. access_token=...",
+    )
+    parser.add_argument(
+        "--server-pid",
+        type=int,
+        help="PID of the Chainlit server to sample RSS/CPU from",
+    )
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the full report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"\nReport written to {args.output}")
+    failed = sum(flow["errors"] for flow in report["flows"].values())
+    sys.exit(1 if failed and not report["completed_flows"] else 0)
+
+
+if __name__ == "__main__":
+    main()
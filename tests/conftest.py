@@ -0,0 +1,16 @@
+import os
+import shutil
+import tempfile
+
+# The package reads these at import time: a key is required, and the data
+# directories are created on import, so keep them out of the working tree
+_data_dir = tempfile.mkdtemp(prefix="chainlit-bootstrap-tests-")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test-unused")
+os.environ.setdefault("AUDIO_PERSIST_DIR", os.path.join(_data_dir, "audio"))
+os.environ.setdefault("TRANSCRIPT_CACHE_DIR", os.path.join(_data_dir, "transcripts"))
+os.environ.setdefault("ARTIFACT_DIR", os.path.join(_data_dir, "artifacts"))
+os.environ.setdefault("INDEX_SNAPSHOT_DIR", os.path.join(_data_dir, "snapshots"))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_data_dir, ignore_errors=True)
@@ -0,0 +1,219 @@
+"""Garbage collection: what is removed, what is kept, and when orphan checks are skipped."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import pytest
+
+from chainlit_bootstrap import retention
+from chainlit_bootstrap.blob_storage import LocalFileStorageClient
+from chainlit_bootstrap.retention import RetentionPolicy, collect_garbage
+
+_DAY = 24 * 3600
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    """Empty stores under ``tmp_path``, no policy limits and no minimum age."""
+    dirs = {name: tmp_path / name for name in ("audio", "artifacts", "transcripts")}
+    for directory in dirs.values():
+        directory.mkdir()
+    monkeypatch.setattr(retention, "AUDIO_PERSIST_DIR", dirs["audio"])
+    monkeypatch.setattr(retention, "ARTIFACT_DIR", dirs["artifacts"])
+    monkeypatch.setattr(retention, "TRANSCRIPT_CACHE_DIR", dirs["transcripts"])
+    monkeypatch.setattr(retention, "_snapshot_entries", lambda: [])
+    monkeypatch.setattr(retention, "GC_MIN_AGE_SECONDS", 0.0)
+    monkeypatch.setattr(retention, "GC_BATCH_PAUSE_SECONDS", 0.0)
+    for store in retention.POLICIES:
+        monkeypatch.setitem(retention.POLICIES, store, RetentionPolicy())
+    return dirs
+
+
+def _write(path: Path, size: int, age: float = 2 * _DAY) -> Path:
+    path.write_bytes(b"x" * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def _database(
+    path: Path,
+    object_keys: list[str] = (),
+    artifacts: list[str] = (),
+    audio_paths: list[Path] = (),
+) -> Path:
+    """A Chainlit database with just the columns garbage collection reads."""
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE elements ("objectKey" TEXT, props TEXT)')
+        conn.execute("CREATE TABLE steps (metadata TEXT)")
+        conn.execute("CREATE TABLE threads (metadata TEXT)")
+        conn.executemany(
+            'INSERT INTO elements ("objectKey", props) VALUES (?, ?)',
+            [(key, "{}") for key in object_keys],
+        )
+        conn.executemany(
+            "INSERT INTO steps (metadata) VALUES (?)",
+            [(json.dumps({"transcription_ref": name}),) for name in artifacts]
+            + [(json.dumps({"audio_path": str(audio)}),) for audio in audio_paths],
+        )
+    return path
+
+
+def test_orphans_are_removed_and_references_kept(stores, tmp_path):
+    kept_artifact = _write(stores["artifacts"] / "kept.json", 10)
+    orphan_artifact = _write(stores["artifacts"] / "orphan.json", 20)
+    kept_audio = _write(stores["audio"] / "kept.wav", 30)
+    orphan_audio = _write(stores["audio"] / "orphan.wav", 40)
+    db = _database(
+        tmp_path / "chainlit.db", artifacts=["kept.json"], audio_paths=[kept_audio]
+    )
+
+    report = asyncio.run(collect_garbage(db))
+
+    assert report.orphan_detection
+    assert kept_artifact.exists() and kept_audio.exists()
+    assert not orphan_artifact.exists() and not orphan_audio.exists()
+    assert report.deleted == {"artifacts": 1, "audio": 1}
+    assert report.reclaimed_bytes == {"artifacts": 20, "audio": 40}
+
+
+def test_dry_run_removes_nothing(stores, tmp_path):
+    orphan = _write(stores["artifacts"] / "orphan.json", 20)
+    db = _database(tmp_path / "chainlit.db")
+
+    report = asyncio.run(collect_garbage(db, dry_run=True))
+
+    assert orphan.exists()
+    assert report.deleted == {"artifacts": 1}
+
+
+def test_entries_younger_than_min_age_are_kept(stores, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "GC_MIN_AGE_SECONDS", float(_DAY))
+    monkeypatch.setitem(
+        retention.POLICIES, "transcripts", RetentionPolicy(max_age_seconds=1)
+    )
+    young_orphan = _write(stores["artifacts"] / "young.json", 10, age=60)
+    old_orphan = _write(stores["artifacts"] / "old.json", 10, age=2 * _DAY)
+    young_transcript = _write(stores["transcripts"] / "young.txt", 10, age=60)
+    db = _database(tmp_path / "chainlit.db")
+
+    asyncio.run(collect_garbage(db))
+
+    assert young_orphan.exists()
+    assert young_transcript.exists()
+    assert not old_orphan.exists()
+
+
+def test_size_cap_removes_oldest_first(stores, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "GC_MIN_AGE_SECONDS", float(_DAY))
+    monkeypatch.setitem(
+        retention.POLICIES, "transcripts", RetentionPolicy(max_bytes=250)
+    )
+    oldest = _write(stores["transcripts"] / "a.txt", 100, age=5 * _DAY)
+    older = _write(stores["transcripts"] / "b.txt", 100, age=4 * _DAY)
+    newer = _write(stores["transcripts"] / "c.txt", 100, age=3 * _DAY)
+    # Counts toward the cap but is too young to remove
+    young = _write(stores["transcripts"] / "d.txt", 100, age=60)
+    db = _database(tmp_path / "chainlit.db")
+
+    report = asyncio.run(collect_garbage(db))
+
+    assert not oldest.exists() and not older.exists()
+    assert newer.exists() and young.exists()
+    assert report.reclaimed_bytes == {"transcripts": 200}
+
+
+@pytest.mark.parametrize(
+    "contents", [None, b"not a database"], ids=["missing", "corrupt"]
+)
+def test_unreadable_database_skips_orphan_checks(
+    stores, tmp_path, monkeypatch, contents
+):
+    monkeypatch.setitem(
+        retention.POLICIES, "artifacts", RetentionPolicy(max_age_seconds=_DAY)
+    )
+    unreferenced = _write(stores["artifacts"] / "unreferenced.json", 10, age=_DAY / 2)
+    expired = _write(stores["artifacts"] / "expired.json", 10, age=3 * _DAY)
+    db = tmp_path / "chainlit.db"
+    if contents is not None:
+        db.write_bytes(contents * 100)
+
+    report = asyncio.run(collect_garbage(db))
+
+    assert not report.orphan_detection
+    assert unreferenced.exists()
+    # Age and size limits still apply
+    assert not expired.exists()
+
+
+def test_shared_blob_is_freed_with_its_last_key(stores, tmp_path):
+    storage = LocalFileStorageClient(tmp_path / "blobs")
+
+    async def upload() -> None:
+        await storage.upload_file("thread-1/a.wav", b"same content")
+        await storage.upload_file("thread-2/a.wav", b"same content")
+
+    asyncio.run(upload())
+    (blob,) = {blob.path for blob in storage.list_blobs()}
+
+    db = _database(tmp_path / "chainlit.db", object_keys=["thread-2/a.wav"])
+    report = asyncio.run(collect_garbage(db, storage))
+
+    assert [blob.object_key for blob in storage.list_blobs()] == ["thread-2/a.wav"]
+    assert blob.exists()
+    assert report.deleted == {"blobs": 1}
+    assert report.reclaimed_bytes == {"blobs": 0}
+
+    db.unlink()
+    db = _database(tmp_path / "chainlit.db")
+    report = asyncio.run(collect_garbage(db, storage))
+
+    assert storage.list_blobs() == []
+    assert not blob.exists()
+    assert report.reclaimed_bytes == {"blobs": len(b"same content")}
+
+
+def test_referenced_flat_layout_blobs_are_indexed(stores, tmp_path):
+    storage = LocalFileStorageClient(tmp_path / "blobs")
+    legacy_dir = storage.base_path / "user-1" / "element-1"
+    legacy_dir.mkdir(parents=True)
+    referenced = _write(legacy_dir / "a.wav", 10)
+    orphan = _write(storage.base_path / "user-1" / "element-2.wav", 10)
+    db = _database(tmp_path / "chainlit.db", object_keys=["user-1/element-1/a.wav"])
+
+    report = asyncio.run(collect_garbage(db, storage))
+
+    (blob,) = storage.list_blobs()
+    assert blob.object_key == "user-1/element-1/a.wav"
+    assert blob.path.read_bytes() == b"x" * 10
+    assert not referenced.exists() and not legacy_dir.exists()
+    assert not orphan.exists()
+    assert report.deleted == {"blobs": 1}
+
+
+def test_referenced_flat_layout_blobs_survive_a_dry_run(stores, tmp_path):
+    storage = LocalFileStorageClient(tmp_path / "blobs")
+    (storage.base_path / "user-1" / "element-1").mkdir(parents=True)
+    referenced = _write(storage.base_path / "user-1" / "element-1" / "a.wav", 10)
+    db = _database(tmp_path / "chainlit.db", object_keys=["user-1/element-1/a.wav"])
+
+    report = asyncio.run(collect_garbage(db, storage, dry_run=True))
+
+    assert referenced.exists()
+    assert storage.list_blobs() == []
+    assert report.deleted == {}
+
+
+def test_unindexed_blob_files_are_removed(stores, tmp_path):
+    storage = LocalFileStorageClient(tmp_path / "blobs")
+    stray = _write(storage.tmp_dir / "upload.part", 10)
+    db = _database(tmp_path / "chainlit.db")
+
+    asyncio.run(collect_garbage(db, storage))
+
+    assert not stray.exists()
+    assert storage.index_path.exists()